@@ -1,29 +1,26 @@
-from typing import Generator, Optional
+from typing import AsyncGenerator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models, schemas
-from app.core import security
 from app.core.config import settings
-from app.db.session import SessionLocal
+from app.core.user_cache import CachedUser, user_cache
+from app.db.session import AsyncSessionLocal
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
 )
 
-def get_db() -> Generator:
-    try:
-        db = SessionLocal()
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-def get_current_user(
-    db: Session = Depends(get_db), token: str = Depends(reusable_oauth2)
-) -> models.User:
+async def get_current_user(
+    db: AsyncSession = Depends(get_db), token: str = Depends(reusable_oauth2)
+) -> CachedUser:
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]
@@ -34,23 +31,52 @@ def get_current_user(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Could not validate credentials",
         )
-    user = db.query(models.User).filter(models.User.id == token_data.sub).first()
-    if not user:
+    if token_data.sub is None:
         raise HTTPException(status_code=404, detail="User not found")
+    # A verified token plus a cache hit is enough: no database round trip, no hashing
+    user = user_cache.get(token_data.sub)
+    if user is None:
+        db_user = await db.get(models.User, token_data.sub)
+        if not db_user:
+            raise HTTPException(status_code=404, detail="User not found")
+        user = user_cache.put(db_user)
+        # End the read so the connection goes back to the pool: chat and quiz requests
+        # would otherwise hold one for the whole LLM call. The session reconnects on next use.
+        await db.commit()
     return user
 
-def get_current_active_user(
-    current_user: models.User = Depends(get_current_user),
-) -> models.User:
-    if not security.verify_password(current_user.hashed_password, current_user.hashed_password): # This check is redundant but kept for structure, actual check is is_active
-         pass
+async def get_current_active_user(
+    current_user: CachedUser = Depends(get_current_user),
+) -> CachedUser:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
 
+# Services are built on first use rather than at import time: their modules pull in
+# LangChain, chromadb and the LLM / embedding clients, which startup shouldn't pay for.
+def get_ingestion_service():
+    from app.services import ingestion_service
+    return ingestion_service.get_ingestion_service()
+
+def get_rag_service():
+    from app.services import rag_service
+    return rag_service.get_rag_service()
+
+def get_chat_memory():
+    from app.services import chat_memory
+    return chat_memory.get_chat_memory()
+
+def get_quiz_service():
+    from app.services import quiz_service
+    return quiz_service.get_quiz_service()
+
+def get_quiz_bank():
+    from app.services import quiz_bank
+    return quiz_bank.get_quiz_bank()
+
 def get_current_active_superuser(
-    current_user: models.User = Depends(get_current_user),
-) -> models.User:
+    current_user: CachedUser = Depends(get_current_user),
+) -> CachedUser:
     if not current_user.is_superuser:
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
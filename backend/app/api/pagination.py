@@ -0,0 +1,53 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+
+from fastapi import HTTPException, Response
+from sqlalchemy import DateTime, Select, tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("wrong number of values")
+        return [
+            datetime.fromisoformat(value) if isinstance(column.type, DateTime) and value is not None else value
+            for column, value in zip(columns, values)
+        ]
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def keyset(query: Select, columns: Sequence, cursor: Optional[str], limit: int) -> Select:
+    """
+    ``query`` ordered by ``columns`` descending, starting after ``cursor``.
+
+    The last column must be unique (the primary key) so every row has one place in the
+    order. Fetches one row more than ``limit`` to tell whether there is a next page.
+    With an index on the query's filter followed by ``columns``, every page costs the
+    same however deep it is, where OFFSET reads and discards all the rows before it.
+    """
+    if cursor:
+        query = query.where(tuple_(*columns) < tuple_(*decode_cursor(cursor, columns)))
+    return query.order_by(*(column.desc() for column in columns)).limit(min(max(limit, 1), MAX_PAGE_SIZE) + 1)
+
+
+def page(rows: Sequence, columns: Sequence, limit: int, response: Response) -> List:
+    """The first ``limit`` rows, with the cursor for the next page in the ``X-Next-Cursor`` header."""
+    limit = min(max(limit, 1), MAX_PAGE_SIZE)
+    rows = list(rows)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([getattr(rows[-1], column.key) for column in columns])
+    return rows
@@ -0,0 +1,21 @@
+import json
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # stop nginx from buffering the stream
+}
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+def sse_response(events, background: BackgroundTask = None) -> StreamingResponse:
+    """``background`` runs once the stream has ended, without holding the client."""
+    return StreamingResponse(events, media_type="text/event-stream", headers=SSE_HEADERS, background=background)
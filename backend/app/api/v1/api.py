@@ -1,4 +1,4 @@
-from app.api.v1.endpoints import auth, users, documents, chat, quizzes
+from app.api.v1.endpoints import auth, users, documents, chat, quizzes, dashboard
 from fastapi import APIRouter
 
 api_router = APIRouter()
@@ -7,3 +7,4 @@ api_router.include_router(users.router, prefix="/users", tags=["users"])
 api_router.include_router(documents.router, prefix="/documents", tags=["documents"])
 api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
 api_router.include_router(quizzes.router, prefix="/quizzes", tags=["quizzes"])
+api_router.include_router(dashboard.router, prefix="/dashboard", tags=["dashboard"])
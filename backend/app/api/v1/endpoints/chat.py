@@ -1,35 +1,208 @@
-from typing import Any
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import logging
+from typing import Any, List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response
+from sqlalchemy import delete, select
+from sqlalchemy.orm import load_only
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.background import BackgroundTask
 
-from app import schemas
+from app import models, schemas
 from app.api import deps
-from app.services.rag_service import rag_service
+from app.api.pagination import keyset, page
+from app.api.streaming import sse_event, sse_response
+from app.core.user_cache import CachedUser
+from app.db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+async def _get_session(db: AsyncSession, session_id: int, current_user: CachedUser) -> models.ChatSession:
+    chat_session = (await db.scalars(select(models.ChatSession).where(
+        models.ChatSession.id == session_id,
+        models.ChatSession.owner_id == current_user.id
+    ))).first()
+    if not chat_session:
+        raise HTTPException(status_code=404, detail="Chat session not found")
+    return chat_session
+
 @router.post("/", response_model=schemas.ChatResponse)
-def chat(
+async def chat(
     request: schemas.ChatRequest,
-    current_user: Any = Depends(deps.get_current_active_user),
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: CachedUser = Depends(deps.get_current_active_user),
+    rag_service: Any = Depends(deps.get_rag_service),
+    chat_memory: Any = Depends(deps.get_chat_memory),
 ) -> Any:
     """
     Ask a question to the AI assistant based on uploaded documents.
+
+    With a `session_id` the question is answered as the next turn of that chat session,
+    so follow-ups can refer to earlier questions and answers.
     """
+    # We could use user-specific collection names here provided by the frontend or derived from user ID
+    # For now, sticking to "user_docs" as used in ingestion or request.collection_name
+    collection = "user_docs"
+    chat_session = None
+    if request.session_id is not None:
+        chat_session = await _get_session(db, request.session_id, current_user)
     try:
-        # We could use user-specific collection names here provided by the frontend or derived from user ID
-        # For now, sticking to "user_docs" as used in ingestion or request.collection_name
-        collection = "user_docs" 
-        answer, sources = rag_service.ask_question(
-            request.question, 
-            user_id=current_user.id,
-            collection_name=collection
-        )
-        
+        if chat_session is None:
+            answer, sources = await rag_service.aask_question(
+                request.question,
+                user_id=current_user.id,
+                collection_name=collection
+            )
+        else:
+            turn = await chat_memory.aprepare(db, chat_session, request.question, rag_service, collection)
+            if turn.docs is None:
+                answer, sources = await rag_service.aask_question(
+                    request.question,
+                    user_id=current_user.id,
+                    collection_name=collection
+                )
+            else:
+                answer, sources = await rag_service.aanswer_in_conversation(request.question, turn.history, turn.docs)
+            await chat_memory.arecord(chat_session.id, turn, answer, sources)
+            background_tasks.add_task(chat_memory.asummarize, chat_session.id)
+
         return {
             "answer": answer,
-            "sources": sources
+            "sources": sources,
+            "session_id": chat_session.id if chat_session else None
         }
     except Exception as e:
-        print(f"Chat error: {e}")
+        logger.exception("Chat error")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/stream")
+async def chat_stream(
+    request: schemas.ChatRequest,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: CachedUser = Depends(deps.get_current_active_user),
+    rag_service: Any = Depends(deps.get_rag_service),
+    chat_memory: Any = Depends(deps.get_chat_memory),
+) -> Any:
+    """
+    Ask a question and stream the answer as Server-Sent Events.
+
+    Emits one `sources` event with the retrieved documents, a `token` event per answer
+    chunk, then `done` (or `error`). A `session_id` continues that chat session, as in `POST /chat`.
+    """
+    user_id = current_user.id
+    session_id = None
+    if request.session_id is not None:
+        session_id = (await _get_session(db, request.session_id, current_user)).id
+        await db.commit()
+
+    async def events():
+        try:
+            if session_id is None:
+                async for event, data in rag_service.astream_answer(
+                    request.question,
+                    user_id=user_id,
+                    collection_name="user_docs"
+                ):
+                    yield sse_event(event, data)
+            else:
+                # The request's session may already be closed once the body streams
+                async with AsyncSessionLocal() as session:
+                    chat_session = await session.get(models.ChatSession, session_id)
+                    turn = await chat_memory.aprepare(session, chat_session, request.question, rag_service, "user_docs")
+                if turn.docs is None:
+                    answer = rag_service.astream_answer(request.question, user_id=user_id, collection_name="user_docs")
+                else:
+                    answer = rag_service.astream_answer_in_conversation(request.question, turn.history, turn.docs)
+                sources, tokens = [], []
+                async for event, data in answer:
+                    if event == "sources":
+                        sources = data
+                    else:
+                        tokens.append(data)
+                    yield sse_event(event, data)
+                await chat_memory.arecord(session_id, turn, "".join(tokens), sources)
+            yield sse_event("done", {})
+        except Exception as e:
+            logger.exception("Chat stream error")
+            yield sse_event("error", {"detail": str(e)})
+
+    background = BackgroundTask(chat_memory.asummarize, session_id) if session_id is not None else None
+    return sse_response(events(), background=background)
+
+@router.post("/sessions", response_model=schemas.ChatSession)
+async def create_session(
+    session_in: schemas.ChatSessionCreate,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: CachedUser = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Start a chat session. Its title defaults to the first question.
+    """
+    chat_session = models.ChatSession(owner_id=current_user.id, title=session_in.title)
+    db.add(chat_session)
+    await db.commit()
+    await db.refresh(chat_session)
+    return chat_session
+
+SESSION_ORDER = (models.ChatSession.updated_at, models.ChatSession.id)
+
+@router.get("/sessions", response_model=List[schemas.ChatSession])
+async def list_sessions(
+    response: Response,
+    db: AsyncSession = Depends(deps.get_db),
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    current_user: CachedUser = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Get user's chat sessions, most recently active first.
+
+    When there are more, the `X-Next-Cursor` response header holds the `cursor` for the next page.
+    """
+    sessions = await db.scalars(keyset(
+        # Leave the summary and the cached retrieval behind
+        select(models.ChatSession).options(load_only(
+            models.ChatSession.id, models.ChatSession.title, models.ChatSession.created_at, models.ChatSession.updated_at,
+            raiseload=True
+        )).where(models.ChatSession.owner_id == current_user.id),
+        SESSION_ORDER, cursor, limit
+    ))
+    return page(sessions.all(), SESSION_ORDER, limit, response)
+
+@router.get("/sessions/{session_id}", response_model=schemas.ChatSessionDetail)
+async def read_session(
+    session_id: int,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: CachedUser = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Get a chat session with its messages.
+    """
+    chat_session = await _get_session(db, session_id, current_user)
+    messages = await db.scalars(
+        select(models.ChatMessage).where(models.ChatMessage.session_id == session_id).order_by(models.ChatMessage.id)
+    )
+    return {
+        "id": chat_session.id,
+        "title": chat_session.title,
+        "created_at": chat_session.created_at,
+        "updated_at": chat_session.updated_at,
+        "summary": chat_session.summary,
+        "messages": messages.all(),
+    }
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(
+    session_id: int,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: CachedUser = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Delete a chat session and its messages.
+    """
+    chat_session = await _get_session(db, session_id, current_user)
+    await db.execute(delete(models.ChatMessage).where(models.ChatMessage.session_id == session_id))
+    await db.delete(chat_session)
+    await db.commit()
+    return {"message": "Chat session deleted successfully"}
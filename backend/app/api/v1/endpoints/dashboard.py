@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+from typing import Any
+from fastapi import APIRouter, Depends
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+
+from app import models, schemas
+from app.api import deps
+from app.core.user_cache import CachedUser
+
+router = APIRouter()
+
+@router.get("/", response_model=schemas.Dashboard)
+async def read_dashboard(
+    db: AsyncSession = Depends(deps.get_db),
+    documents: int = 10,
+    quizzes: int = 5,
+    topics: int = 5,
+    days: int = 30,
+    current_user: CachedUser = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Everything the dashboard shows, in one round trip: recent documents and quizzes,
+    overall progress, recent and weakest topics, weakest documents and the daily trend
+    over the last `days` days.
+
+    Progress comes from the aggregates `POST /quizzes/attempt` maintains, so the cost
+    doesn't grow with the number of attempts.
+    """
+    user_id = current_user.id
+    overall = await db.get(models.UserProgress, user_id)
+
+    recent_documents = (await db.scalars(
+        select(models.Document).where(models.Document.owner_id == user_id)
+        .order_by(models.Document.upload_date.desc()).limit(documents)
+    )).all()
+    document_count = await db.scalar(
+        select(func.count()).select_from(models.Document).where(models.Document.owner_id == user_id)
+    )
+    # The questions blob isn't needed for a summary
+    recent_quizzes = (await db.scalars(
+        select(models.Quiz)
+        .options(load_only(models.Quiz.id, models.Quiz.topic, models.Quiz.coverage, models.Quiz.document_id, models.Quiz.created_at))
+        .where(models.Quiz.owner_id == user_id)
+        .order_by(models.Quiz.created_at.desc()).limit(quizzes)
+    )).all()
+
+    topic_rows = select(models.TopicProgress).where(models.TopicProgress.user_id == user_id)
+    recent_topics = (await db.scalars(
+        topic_rows.order_by(models.TopicProgress.last_attempt_at.desc()).limit(topics)
+    )).all()
+    weakest_topics = (await db.scalars(
+        topic_rows.where(models.TopicProgress.questions > 0)
+        .order_by((models.TopicProgress.correct / models.TopicProgress.questions).asc()).limit(topics)
+    )).all()
+    weakest_documents = (await db.execute(
+        select(models.DocumentProgress, models.Document.title)
+        .join(models.Document, models.Document.id == models.DocumentProgress.document_id)
+        .where(models.DocumentProgress.user_id == user_id, models.DocumentProgress.questions > 0)
+        .order_by((models.DocumentProgress.correct / models.DocumentProgress.questions).asc()).limit(topics)
+    )).all()
+    first_day = datetime.utcnow().date() - timedelta(days=max(days, 1) - 1)
+    trend = (await db.scalars(
+        select(models.DailyProgress)
+        .where(models.DailyProgress.user_id == user_id, models.DailyProgress.day >= first_day)
+        .order_by(models.DailyProgress.day)
+    )).all()
+
+    return schemas.Dashboard(
+        progress=schemas.ProgressStats.from_row(overall),
+        documents=[schemas.Document.model_validate(document) for document in recent_documents],
+        document_count=document_count,
+        recent_quizzes=[schemas.QuizSummary.model_validate(quiz) for quiz in recent_quizzes],
+        recent_topics=[schemas.TopicProgress.from_row(row, topic=row.topic) for row in recent_topics],
+        weakest_topics=[schemas.TopicProgress.from_row(row, topic=row.topic) for row in weakest_topics],
+        weakest_documents=[
+            schemas.DocumentProgress.from_row(row, document_id=row.document_id, title=title)
+            for row, title in weakest_documents
+        ],
+        trend=[schemas.DailyProgress.from_row(row, day=row.day) for row in trend],
+    )
@@ -1,91 +1,253 @@
+import logging
 import os
-import shutil
-from typing import Any, List
+from typing import Any, List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Response, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models, schemas
 from app.api import deps
-from app.services.ingestion_service import ingestion_service
+from app.api.pagination import keyset, page
+from app.core import storage
+from app.core.user_cache import CachedUser
+from app.models.document import STATUS_FAILED, STATUS_PENDING, STATUS_READY
+from app.services.ingestion_queue import ingestion_queue
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-UPLOAD_DIR = "uploads"
+UPLOAD_DIR = storage.UPLOAD_DIR
 if not os.path.exists(UPLOAD_DIR):
     os.makedirs(UPLOAD_DIR)
 
+DOCUMENT_ORDER = (models.Document.upload_date, models.Document.id)
+
+def _blob_in_use(db: AsyncSession, path: str):
+    """For ``storage.remove_unused``: does any document still refer to ``path``?"""
+    async def in_use() -> bool:
+        return (await db.execute(select(models.Document.id).where(models.Document.file_path == path))).first() is not None
+    return in_use
+
 @router.get("/", response_model=List[schemas.Document])
-def read_documents(
-    db: Session = Depends(deps.get_db),
-    skip: int = 0,
+async def read_documents(
+    response: Response,
+    db: AsyncSession = Depends(deps.get_db),
+    cursor: Optional[str] = None,
     limit: int = 100,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: CachedUser = Depends(deps.get_current_active_user),
 ) -> Any:
     """
-    Retrieve documents.
+    Retrieve documents, newest first.
+
+    When there are more, the `X-Next-Cursor` response header holds the `cursor` for the next page.
     """
-    documents = db.query(models.Document).filter(models.Document.owner_id == current_user.id).offset(skip).limit(limit).all()
-    return documents
+    documents = await db.scalars(keyset(
+        select(models.Document).where(models.Document.owner_id == current_user.id),
+        DOCUMENT_ORDER, cursor, limit
+    ))
+    return page(documents.all(), DOCUMENT_ORDER, limit, response)
 
 @router.post("/upload", response_model=schemas.Document)
 async def upload_document(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db),
     file: UploadFile = File(...),
     description: str = Form(None),
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: CachedUser = Depends(deps.get_current_active_user),
+    ingestion_service: Any = Depends(deps.get_ingestion_service),
+    quiz_bank: Any = Depends(deps.get_quiz_bank),
 ) -> Any:
     """
-    Upload a document and ingest it.
+    Upload a document and queue it for ingestion.
     """
     if not file.filename.endswith((".pdf", ".txt")):
         raise HTTPException(status_code=400, detail="Only PDF and TXT files are supported")
 
-    # Save file to disk
-    file_location = f"{UPLOAD_DIR}/{current_user.id}_{file.filename}"
-    with open(file_location, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
-    # Database Entry
-    db_document = models.Document(
-        title=file.filename,
-        description=description,
-        file_path=file_location,
-        file_type=file.content_type or "text/plain",
-        owner_id=current_user.id
-    )
-    db.add(db_document)
-    db.commit()
-    db.refresh(db_document)
-
-    # Trigger Ingestion
+    # Stream to content-addressed storage, hashing and size-checking as we write
     try:
-        ingestion_service.process_document(
-            file_location, 
-            document_id=db_document.id, 
-            user_id=current_user.id,
-            collection_name="user_docs"
-        ) 
-    except Exception as e:
-        print(f"Ingestion failed: {e}")
+        stored = await storage.save_upload(file)
+    except storage.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    try:
+        # Same user, same bytes: hand back the document they already have
+        existing = (await db.scalars(select(models.Document).where(
+            models.Document.owner_id == current_user.id,
+            models.Document.content_hash == stored.sha256
+        ))).first()
+        if existing:
+            if existing.status == STATUS_FAILED:
+                existing.status = STATUS_PENDING
+                await db.commit()
+                ingestion_queue.enqueue(existing.id)
+            return existing
+
+        # Database Entry
+        db_document = models.Document(
+            title=file.filename,
+            description=description,
+            file_path=stored.path,
+            file_type=file.content_type or "text/plain",
+            owner_id=current_user.id,
+            content_hash=stored.sha256,
+            size_bytes=stored.size,
+            status=STATUS_PENDING
+        )
+        db.add(db_document)
+        await db.commit()
+        await db.refresh(db_document)
+    finally:
+        # The blob is referenced now, so it is safe from deletes; restore it if one raced us
+        storage.settle(stored)
+
+    # Someone else already ingested these bytes: copy their vectors instead of re-ingesting
+    source = (await db.scalars(select(models.Document).where(
+        models.Document.content_hash == stored.sha256,
+        models.Document.status == STATUS_READY,
+        models.Document.id != db_document.id
+    ))).first()
+    if source:
+        try:
+            chunk_count = await run_in_threadpool(
+                ingestion_service.clone_document_chunks,
+                source_document_id=source.id,
+                source_user_id=source.owner_id,
+                document_id=db_document.id,
+                user_id=current_user.id,
+                collection_name="user_docs"
+            )
+        except Exception as e:
+            logger.warning("Vector copy from document %s failed, re-ingesting: %s", source.id, e)
+        else:
+            db_document.status = STATUS_READY
+            db_document.chunk_count = chunk_count
+            user_id = current_user.id
+            # The quiz bank is shared with the sync ingestion workers
+            await db.run_sync(lambda session: quiz_bank.copy(session, source.id, db_document.id, user_id))
+            await db.commit()
+            await db.refresh(db_document)
+            return db_document
+
+    # Ingestion runs on the background worker pool; poll /documents/{id}/status
+    ingestion_queue.enqueue(db_document.id)
 
     return db_document
 
+@router.get("/{document_id}/status", response_model=schemas.DocumentStatus)
+async def read_document_status(
+    document_id: int,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: CachedUser = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Get the ingestion status of a document.
+    """
+    document = (await db.scalars(select(models.Document).where(
+        models.Document.id == document_id,
+        models.Document.owner_id == current_user.id
+    ))).first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    queue_seconds = None
+    processing_seconds = None
+    if document.processing_started_at and document.upload_date:
+        queue_seconds = (document.processing_started_at - document.upload_date).total_seconds()
+    if document.processing_started_at and document.processing_finished_at:
+        processing_seconds = (document.processing_finished_at - document.processing_started_at).total_seconds()
+
+    return {
+        "id": document.id,
+        # Documents uploaded before the job queue existed were ingested inline
+        "status": document.status or STATUS_READY,
+        "chunk_count": document.chunk_count,
+        "chunks_embedded": document.chunks_embedded,
+        "chunks_reused": document.chunks_reused,
+        "chunks_removed": document.chunks_removed,
+        "error": document.error,
+        "upload_date": document.upload_date,
+        "processing_started_at": document.processing_started_at,
+        "processing_finished_at": document.processing_finished_at,
+        "queue_seconds": queue_seconds,
+        "processing_seconds": processing_seconds,
+    }
+
+@router.put("/{document_id}", response_model=schemas.Document)
+async def update_document(
+    document_id: int,
+    *,
+    db: AsyncSession = Depends(deps.get_db),
+    file: UploadFile = File(...),
+    description: str = Form(None),
+    current_user: CachedUser = Depends(deps.get_current_active_user),
+    quiz_bank: Any = Depends(deps.get_quiz_bank),
+) -> Any:
+    """
+    Replace a document's file and re-ingest only the chunks that changed.
+
+    Poll /documents/{id}/status for how many chunks were reused, re-embedded and removed.
+    """
+    document = (await db.scalars(select(models.Document).where(
+        models.Document.id == document_id,
+        models.Document.owner_id == current_user.id
+    ))).first()
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    if not file.filename.endswith((".pdf", ".txt")):
+        raise HTTPException(status_code=400, detail="Only PDF and TXT files are supported")
+
+    try:
+        stored = await storage.save_upload(file)
+    except storage.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    try:
+        if description is not None:
+            document.description = description
+        if stored.sha256 == document.content_hash:
+            await db.commit()
+            await db.refresh(document)
+            return document
+
+        old_path = document.file_path
+        document.title = file.filename
+        document.file_path = stored.path
+        document.file_type = file.content_type or "text/plain"
+        document.content_hash = stored.sha256
+        document.size_bytes = stored.size
+        document.status = STATUS_PENDING
+        # The bank describes the old content; the worker rebuilds it after re-ingestion
+        await db.run_sync(lambda session: quiz_bank.drop(session, document_id))
+        await db.commit()
+        await db.refresh(document)
+    finally:
+        storage.settle(stored)
+
+    # Unless another document shares the old blob
+    await storage.remove_unused(old_path, _blob_in_use(db, old_path))
+
+    ingestion_queue.enqueue(document.id)
+    return document
+
 @router.delete("/{document_id}")
-def delete_document(
+async def delete_document(
     document_id: int,
-    db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: CachedUser = Depends(deps.get_current_active_user),
+    ingestion_service: Any = Depends(deps.get_ingestion_service),
+    quiz_bank: Any = Depends(deps.get_quiz_bank),
 ) -> Any:
     """
     Delete a document.
     """
     # Find document and verify ownership
-    document = db.query(models.Document).filter(
+    document = (await db.scalars(select(models.Document).where(
         models.Document.id == document_id,
         models.Document.owner_id == current_user.id
-    ).first()
+    ))).first()
     
     if not document:
         raise HTTPException(
@@ -95,23 +257,30 @@ def delete_document(
     
     # 1. Cleanup ChromaDB Vector Data
     try:
-        ingestion_service.delete_document_chunks(
+        await run_in_threadpool(
+            ingestion_service.delete_document_chunks,
             document_id=document_id, 
-            file_path=document.file_path,
-            collection_name="user_docs"
+            # Content-addressed blobs may back other users' documents, so only
+            # legacy per-user uploads are also matched by source path
+            file_path=document.file_path if not document.content_hash else None,
+            collection_name="user_docs",
+            user_id=current_user.id
         )
-    except Exception as e:
-        print(f"Vector cleanup failed: {e}")
+    except Exception:
+        logger.exception("Vector cleanup failed for document %s", document.id)
     
-    # 2. Delete file from disk
+    # 2. Delete from database, along with the document's quiz bank and progress
+    file_path = document.file_path
+    await db.run_sync(lambda session: quiz_bank.drop(session, document_id))
+    await db.execute(delete(models.DocumentProgress).where(models.DocumentProgress.document_id == document_id))
+    await db.delete(document)
+    await db.commit()
+
+    # 3. Delete file from disk, unless another document shares the blob. After the
+    # commit, so the check sees this document gone and any new upload of the same bytes
     try:
-        if os.path.exists(document.file_path):
-            os.remove(document.file_path)
+        await storage.remove_unused(file_path, _blob_in_use(db, file_path))
     except Exception as e:
-        print(f"Error deleting file from disk: {e}")
-    
-    # 3. Delete from database
-    db.delete(document)
-    db.commit()
-    
+        logger.warning("Error deleting file from disk: %s", e)
+
     return {"message": "Document deleted successfully"}
@@ -1,42 +1,97 @@
-from typing import Any, List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import logging
+from datetime import datetime
+from typing import Any, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.orm import defer
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models, schemas
 from app.api import deps
-from app.services.quiz_service import quiz_service
+from app.api.pagination import keyset, page
+from app.api.streaming import sse_event, sse_response
+from app.core.user_cache import CachedUser
+from app.db.session import AsyncSessionLocal
+from app.models.document import STATUS_READY
+from app.services import progress
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.post("/generate", response_model=schemas.Quiz)
-def generate_quiz(
-    request: schemas.QuizGenerateRequest,
-    db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
-) -> Any:
-    """
-    Generate a quiz based on a topic and optionally from a specific document.
-    """
+async def _check_request(request: schemas.QuizGenerateRequest, db: AsyncSession, current_user: CachedUser) -> Optional[models.Document]:
     # Validate document ownership if document_id is provided
+    document = None
     if request.document_id:
-        document = db.query(models.Document).filter(
+        document = (await db.scalars(select(models.Document).where(
             models.Document.id == request.document_id,
             models.Document.owner_id == current_user.id
-        ).first()
+        ))).first()
         
         if not document:
             raise HTTPException(
                 status_code=404, 
                 detail="Document not found or you don't have permission to access it"
             )
+        # Documents from before ingestion tracked a status have none, and are ready
+        if (document.status or STATUS_READY) != STATUS_READY:
+            raise HTTPException(status_code=409, detail="Document is not ready yet")
+    elif request.mode == "coverage":
+        raise HTTPException(status_code=400, detail="Coverage mode requires a document_id")
+    return document
+
+async def _from_bank(quiz_bank, request: schemas.QuizGenerateRequest, db: AsyncSession, document: Optional[models.Document]):
+    """Questions sampled from the document's precomputed bank, or None to generate live."""
+    if document is None:
+        return None
+    banked = await db.run_sync(
+        lambda session: quiz_bank.sample(session, document, request.topic, request.num_questions, mode=request.mode)
+    )
+    # Hand the connection back before any live generation
+    await db.commit()
+    return banked
+
+@router.post("/generate", response_model=schemas.Quiz)
+async def generate_quiz(
+    request: schemas.QuizGenerateRequest,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: CachedUser = Depends(deps.get_current_active_user),
+    quiz_service: Any = Depends(deps.get_quiz_service),
+    quiz_bank: Any = Depends(deps.get_quiz_bank),
+) -> Any:
+    """
+    Generate a quiz based on a topic and optionally from a specific document.
+
+    With `mode="coverage"` the questions are drawn from every section of the document
+    rather than the chunks closest to the topic, and the quiz reports its coverage.
+    Documents with a precomputed quiz bank are served from it when it covers the topic.
+    """
+    document = await _check_request(request, db, current_user)
     
     # Generate quiz with optional document context and user isolation
-    questions = quiz_service.generate_quiz(
-        request.topic, 
-        user_id=current_user.id,
-        num_questions=request.num_questions,
-        document_id=request.document_id
-    )
+    coverage = None
+    banked = await _from_bank(quiz_bank, request, db, document)
+    if banked:
+        questions, coverage = banked
+    elif request.mode == "coverage":
+        # Imported here: quiz_service loads lazily, through its dependency
+        from app.services.quiz_service import DocumentHasNoContent
+        try:
+            questions, coverage = await quiz_service.agenerate_coverage_quiz(
+                request.topic,
+                user_id=current_user.id,
+                document_id=request.document_id,
+                num_questions=request.num_questions
+            )
+        except DocumentHasNoContent as e:
+            raise HTTPException(status_code=409, detail=str(e))
+    else:
+        questions = await quiz_service.agenerate_quiz(
+            request.topic, 
+            user_id=current_user.id,
+            num_questions=request.num_questions,
+            document_id=request.document_id
+        )
     
     if not questions:
         raise HTTPException(status_code=500, detail="Failed to generate quiz")
@@ -45,43 +100,172 @@ def generate_quiz(
     db_quiz = models.Quiz(
         topic=request.topic,
         questions=questions,
-        owner_id=current_user.id
+        coverage=coverage,
+        owner_id=current_user.id,
+        document_id=request.document_id
     )
     db.add(db_quiz)
-    db.commit()
-    db.refresh(db_quiz)
+    await db.commit()
+    await db.refresh(db_quiz)
     
     return db_quiz
 
+@router.post("/generate/stream")
+async def generate_quiz_stream(
+    request: schemas.QuizGenerateRequest,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: CachedUser = Depends(deps.get_current_active_user),
+    quiz_service: Any = Depends(deps.get_quiz_service),
+    quiz_bank: Any = Depends(deps.get_quiz_bank),
+) -> Any:
+    """
+    Generate a quiz and stream it as Server-Sent Events.
+
+    Emits a `question` event (`{index, question}`) as soon as each question is parsed and
+    validated, then `quiz` with the saved quiz and `done` (or `error`). Coverage mode
+    merges its sections before emitting, so its questions arrive together.
+    """
+    document = await _check_request(request, db, current_user)
+    banked = await _from_bank(quiz_bank, request, db, document)
+    user_id = current_user.id
+
+    async def events():
+        questions, coverage = [], None
+        try:
+            if banked:
+                questions, coverage = banked
+                for index, question in enumerate(questions):
+                    yield sse_event("question", {"index": index, "question": question})
+            elif request.mode == "coverage":
+                questions, coverage = await quiz_service.agenerate_coverage_quiz(
+                    request.topic,
+                    user_id=user_id,
+                    document_id=request.document_id,
+                    num_questions=request.num_questions
+                )
+                for index, question in enumerate(questions):
+                    yield sse_event("question", {"index": index, "question": question})
+            else:
+                async for question in quiz_service.astream_quiz(
+                    request.topic,
+                    user_id=user_id,
+                    num_questions=request.num_questions,
+                    document_id=request.document_id
+                ):
+                    yield sse_event("question", {"index": len(questions), "question": question})
+                    questions.append(question)
+
+            if not questions:
+                yield sse_event("error", {"detail": "Failed to generate quiz"})
+                return
+
+            # The request's session may already be closed once the body streams
+            async with AsyncSessionLocal() as session:
+                db_quiz = models.Quiz(
+                    topic=request.topic,
+                    questions=questions,
+                    coverage=coverage,
+                    owner_id=user_id,
+                    document_id=request.document_id
+                )
+                session.add(db_quiz)
+                await session.commit()
+                await session.refresh(db_quiz)
+            yield sse_event("quiz", schemas.Quiz.model_validate(db_quiz))
+            yield sse_event("done", {})
+        except Exception as e:
+            logger.exception("Quiz stream error")
+            yield sse_event("error", {"detail": str(e)})
+
+    return sse_response(events())
+
 @router.post("/attempt", response_model=schemas.QuizAttempt)
-def submit_attempt(
+async def submit_attempt(
     result: schemas.QuizAttemptCreate,
-    db: Session = Depends(deps.get_db),
-    current_user: models.User = Depends(deps.get_current_active_user),
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: CachedUser = Depends(deps.get_current_active_user),
 ) -> Any:
     """
     Submit a quiz attempt.
+
+    The user's progress aggregates (overall, per topic, per document and per day) are
+    updated in the same transaction.
     """
+    quiz = (await db.scalars(select(models.Quiz).where(
+        models.Quiz.id == result.quiz_id,
+        models.Quiz.owner_id == current_user.id
+    ))).first()
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+
     db_attempt = models.QuizAttempt(
         quiz_id=result.quiz_id,
         user_id=current_user.id,
         score=result.score,
-        total_questions=result.total_questions
+        total_questions=result.total_questions,
+        completed_at=datetime.utcnow()
     )
     db.add(db_attempt)
-    db.commit()
-    db.refresh(db_attempt)
+    await progress.record_attempt(db, db_attempt, quiz)
+    await db.commit()
+    await db.refresh(db_attempt)
     return db_attempt
 
+ATTEMPT_ORDER = (models.QuizAttempt.completed_at, models.QuizAttempt.id)
+QUIZ_ORDER = (models.Quiz.created_at, models.Quiz.id)
+
 @router.get("/attempts", response_model=List[schemas.QuizAttempt])
-def get_attempts(
-    db: Session = Depends(deps.get_db),
-    skip: int = 0,
+async def get_attempts(
+    response: Response,
+    db: AsyncSession = Depends(deps.get_db),
+    cursor: Optional[str] = None,
     limit: int = 100,
-    current_user: models.User = Depends(deps.get_current_active_user),
+    current_user: CachedUser = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Get user's quiz attempts, newest first.
+
+    When there are more, the `X-Next-Cursor` response header holds the `cursor` for the next page.
+    """
+    attempts = await db.scalars(keyset(
+        select(models.QuizAttempt).where(models.QuizAttempt.user_id == current_user.id),
+        ATTEMPT_ORDER, cursor, limit
+    ))
+    return page(attempts.all(), ATTEMPT_ORDER, limit, response)
+
+@router.get("/", response_model=List[schemas.QuizSummary])
+async def read_quizzes(
+    response: Response,
+    db: AsyncSession = Depends(deps.get_db),
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    current_user: CachedUser = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Get user's quizzes without their questions, newest first.
+
+    When there are more, the `X-Next-Cursor` response header holds the `cursor` for the next page.
+    """
+    quizzes = await db.scalars(keyset(
+        # The questions are most of a quiz's row; GET /quizzes/{id} has them
+        select(models.Quiz).options(defer(models.Quiz.questions, raiseload=True)).where(models.Quiz.owner_id == current_user.id),
+        QUIZ_ORDER, cursor, limit
+    ))
+    return page(quizzes.all(), QUIZ_ORDER, limit, response)
+
+@router.get("/{quiz_id}", response_model=schemas.Quiz)
+async def read_quiz(
+    quiz_id: int,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: CachedUser = Depends(deps.get_current_active_user),
 ) -> Any:
     """
-    Get user's quiz attempts.
+    Get a quiz with its questions.
     """
-    attempts = db.query(models.QuizAttempt).filter(models.QuizAttempt.user_id == current_user.id).offset(skip).limit(limit).all()
-    return attempts
+    quiz = (await db.scalars(select(models.Quiz).where(
+        models.Quiz.id == quiz_id,
+        models.Quiz.owner_id == current_user.id
+    ))).first()
+    if not quiz:
+        raise HTTPException(status_code=404, detail="Quiz not found")
+    return quiz
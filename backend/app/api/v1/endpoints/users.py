@@ -1,24 +1,27 @@
 from typing import Any, List
 from fastapi import APIRouter, Body, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models, schemas
 from app.api import deps
 from app.core import security
+from app.core.user_cache import CachedUser, user_cache
 
 router = APIRouter()
 
 @router.post("/", response_model=schemas.User)
-def create_user(
+async def create_user(
     *,
-    db: Session = Depends(deps.get_db),
+    db: AsyncSession = Depends(deps.get_db),
     user_in: schemas.UserCreate,
 ) -> Any:
     """
     Create new user.
     """
-    user = db.query(models.User).filter(models.User.email == user_in.email).first()
+    user = (await db.execute(select(models.User).where(models.User.email == user_in.email))).scalars().first()
     if user:
         raise HTTPException(
             status_code=400,
@@ -26,11 +29,32 @@ def create_user(
         )
     user = models.User(
         email=user_in.email,
-        hashed_password=security.get_password_hash(user_in.password),
+        # Argon2 is deliberately slow; keep it off the event loop
+        hashed_password=await run_in_threadpool(security.get_password_hash, user_in.password),
         full_name=user_in.full_name,
-        is_superuser=user_in.is_superuser,
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+@router.post("/{user_id}/deactivate", response_model=schemas.User)
+async def deactivate_user(
+    user_id: int,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user: CachedUser = Depends(deps.get_current_active_user),
+) -> Any:
+    """
+    Deactivate a user: themselves, or anyone for a superuser.
+    Their tokens are refused from the next request on.
+    """
+    if user_id != current_user.id and not current_user.is_superuser:
+        raise HTTPException(status_code=400, detail="The user doesn't have enough privileges")
+    user = await db.get(models.User, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    user.is_active = False
+    await db.commit()
+    # Other processes pick this up when their entry expires (USER_CACHE_TTL_SECONDS)
+    user_cache.invalidate(user_id)
     return user
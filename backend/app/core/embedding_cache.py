@@ -0,0 +1,185 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def text_key(model: str, text: str) -> str:
+    """Cache key for a text under a given embedding model."""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{model}:{digest}"
+
+
+class EmbeddingCache:
+    """
+    Two-tier embedding cache keyed by (model, sha256 of text).
+
+    An in-memory LRU sits in front of an on-disk tier where each vector is stored as a
+    raw float32 ``.npy`` file. The disk tier is bounded by ``max_disk_items``; when it
+    is full the least recently used files (by mtime, refreshed on every disk hit) are
+    evicted.
+    """
+    def __init__(self, directory: str, max_memory_items: int = 10000, max_disk_items: int = 200000):
+        self.directory = directory
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._disk_count = sum(1 for _ in self._iter_disk_files())
+
+    def _path(self, key: str) -> str:
+        model, digest = key.rsplit(":", 1)
+        model_dir = model.replace("/", "_")
+        return os.path.join(self.directory, model_dir, digest[:2], f"{digest}.npy")
+
+    def _iter_disk_files(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".npy"):
+                    yield os.path.join(root, name)
+
+    def _remember(self, key: str, vector: np.ndarray):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vector
+
+        path = self._path(key)
+        try:
+            vector = np.load(path, allow_pickle=False)
+            os.utime(path)
+        except (FileNotFoundError, ValueError, OSError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self._remember(key, vector)
+            self.disk_hits += 1
+        return vector
+
+    def put(self, key: str, vector: List[float]):
+        array = np.asarray(vector, dtype=np.float32)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        is_new = not os.path.exists(path)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, array, allow_pickle=False)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._remember(key, array)
+            if is_new:
+                self._disk_count += 1
+            over_limit = self._disk_count > self.max_disk_items
+        if over_limit:
+            self._evict()
+
+    def _evict(self):
+        """Drop the least recently used disk entries down to 90% of the limit."""
+        files = []
+        for path in self._iter_disk_files():
+            try:
+                files.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+        target = int(self.max_disk_items * 0.9)
+        excess = len(files) - target
+        if excess <= 0:
+            with self._lock:
+                self._disk_count = len(files)
+            return
+        files.sort()
+        removed = 0
+        for _, path in files[:excess]:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                continue
+        with self._lock:
+            self._disk_count = len(files) - removed
+            self.evictions += removed
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_items": len(self._memory),
+                "disk_items": self._disk_count,
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    LangChain ``Embeddings`` wrapper that consults an ``EmbeddingCache`` first and only
+    sends cache misses (deduplicated) to the underlying model. With ``flights``,
+    concurrent misses for the same query share one call.
+    """
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model: str, flights=None):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+        self.flights = flights
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed search docs."""
+        keys = [text_key(self.model, text) for text in texts]
+        results: List[Optional[List[float]]] = [None] * len(texts)
+        missing: Dict[str, List[int]] = {}
+        for i, key in enumerate(keys):
+            vector = self.cache.get(key)
+            if vector is not None:
+                results[i] = vector.tolist()
+            else:
+                missing.setdefault(key, []).append(i)
+
+        if missing:
+            miss_keys = list(missing)
+            miss_texts = [texts[missing[key][0]] for key in miss_keys]
+            vectors = self.embeddings.embed_documents(miss_texts)
+            for key, vector in zip(miss_keys, vectors):
+                self.cache.put(key, vector)
+                for i in missing[key]:
+                    results[i] = list(vector)
+        return results
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed query text."""
+        key = text_key(self.model, text)
+        vector = self.cache.get(key)
+        if vector is not None:
+            return vector.tolist()
+        if self.flights is None:
+            return self._embed_query(key, text)
+        # The same question asked at once by many users is embedded once
+        return self.flights.do(key, lambda: self._embed_query(key, text))
+
+    def _embed_query(self, key: str, text: str) -> List[float]:
+        vector = self.embeddings.embed_query(text)
+        self.cache.put(key, vector)
+        return list(vector)
@@ -0,0 +1,55 @@
+from functools import lru_cache
+
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import settings
+from app.core.embedding_cache import CachedEmbeddings, EmbeddingCache
+from app.core.observability import register_stats
+from app.core.single_flight import embedding_flights
+
+EMBEDDING_MODEL = "models/text-embedding-004"
+EMBEDDING_BACKENDS = ("gemini", "onnx")
+
+
+def embedding_model_name(backend: str = None) -> str:
+    """Model identifier of a backend; also keys the embedding cache."""
+    backend = backend or settings.EMBEDDING_BACKEND
+    if backend == "gemini":
+        return EMBEDDING_MODEL
+    if backend == "onnx":
+        return f"onnx/{settings.ONNX_EMBEDDING_MODEL}"
+    raise ValueError(f"Unknown EMBEDDING_BACKEND '{backend}', expected one of {EMBEDDING_BACKENDS}")
+
+
+@lru_cache()
+def get_embedding_cache() -> EmbeddingCache:
+    cache = EmbeddingCache(
+        directory=settings.EMBEDDING_CACHE_DIR,
+        max_memory_items=settings.EMBEDDING_CACHE_MEMORY_ITEMS,
+        max_disk_items=settings.EMBEDDING_CACHE_MAX_DISK_ITEMS,
+    )
+    register_stats("embedding_cache", cache.stats)
+    return cache
+
+
+def build_embeddings(backend: str = None, cached: bool = True) -> Embeddings:
+    """A new embedding model for ``backend`` (default ``EMBEDDING_BACKEND``)."""
+    backend = backend or settings.EMBEDDING_BACKEND
+    model = embedding_model_name(backend)
+    # Each backend's dependencies are only imported when it is selected
+    if backend == "onnx":
+        from app.core.onnx_embeddings import OnnxEmbeddings
+        embeddings = OnnxEmbeddings()
+    else:
+        from app.core.gemini_embeddings import GoogleGenAIEmbeddings
+        embeddings = GoogleGenAIEmbeddings(model=model)
+    if not cached:
+        return embeddings
+    flights = embedding_flights if settings.SINGLE_FLIGHT_ENABLED else None
+    return CachedEmbeddings(embeddings, cache=get_embedding_cache(), model=model, flights=flights)
+
+
+@lru_cache()
+def get_embeddings() -> Embeddings:
+    """Process-wide embedding model shared by ingestion, chat and quizzes."""
+    return build_embeddings()
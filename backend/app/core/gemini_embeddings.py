@@ -1,58 +1,99 @@
-from typing import List
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
 from langchain_core.embeddings import Embeddings
 from google import genai
+from google.genai import types
 from app.core.config import settings
+from app.core.observability import bind_context
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingError(RuntimeError):
+    """Raised when a batch of texts could not be embedded."""
+
 
 class GoogleGenAIEmbeddings(Embeddings):
     """
     Custom wrapper for the new google-genai SDK to be compatible with LangChain.
+
+    Texts are sent in batches of ``batch_size`` per ``embed_content`` call and up to
+    ``max_concurrency`` batches are in flight at once. Each batch is retried with
+    exponential backoff; a batch that still fails raises ``EmbeddingError`` instead of
+    producing empty vectors.
     """
-    def __init__(self, model: str = "models/text-embedding-004"):
-        self.client = genai.Client(api_key=settings.GEMINI_API_KEY)
+    def __init__(
+        self,
+        model: str = "models/text-embedding-004",
+        client: Optional[Any] = None,
+        batch_size: int = None,
+        max_concurrency: int = None,
+        max_retries: int = None,
+        backoff_seconds: float = None,
+    ):
+        self.client = client or genai.Client(
+            api_key=settings.GEMINI_API_KEY,
+            http_options=types.HttpOptions(base_url=settings.GEMINI_BASE_URL) if settings.GEMINI_BASE_URL else None
+        )
         self.model = model
+        self.batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        self.max_concurrency = max_concurrency or settings.EMBEDDING_MAX_CONCURRENCY
+        self.max_retries = max_retries if max_retries is not None else settings.EMBEDDING_MAX_RETRIES
+        self.backoff_seconds = backoff_seconds if backoff_seconds is not None else settings.EMBEDDING_BACKOFF_SECONDS
 
+    def _extract_values(self, response, expected: int) -> List[List[float]]:
+        embeddings = getattr(response, "embeddings", None)
+        if not embeddings or len(embeddings) != expected:
+            got = len(embeddings) if embeddings else 0
+            raise EmbeddingError(f"Expected {expected} embeddings, got {got}")
+        vectors = []
+        for embedding_obj in embeddings:
+            values = getattr(embedding_obj, "values", None)
+            if not values:
+                raise EmbeddingError(f"Embedding response has no values: {embedding_obj}")
+            vectors.append(list(values))
+        return vectors
 
-    def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        """Embed search docs."""
-        results = []
-        print(f"DEBUG: embed_documents called with {len(texts)} texts")
-        for i, text in enumerate(texts):
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed one batch, retrying with exponential backoff."""
+        attempt = 0
+        while True:
             try:
-                # print(f"DEBUG: Embedding text {i}: {text[:50]}...")
                 response = self.client.models.embed_content(
                     model=self.model,
-                    contents=text
+                    contents=texts
                 )
-                if hasattr(response, 'embeddings'):
-                    embedding_obj = response.embeddings[0]
-                    if hasattr(embedding_obj, 'values'):
-                        results.append(embedding_obj.values)
-                    else:
-                        print(f"DEBUG: No values in embedding object: {embedding_obj}")
-                        results.append(embedding_obj) # Attempt fallback
-                else:
-                     print(f"DEBUG: Unexpected embedding response structure: {response}")
-                     results.append([])
+                return self._extract_values(response, len(texts))
             except Exception as e:
-                print(f"DEBUG: Embedding error for text {i}: {e}")
-                results.append([])
-        print(f"DEBUG: Generated {len(results)} embeddings")
+                if attempt >= self.max_retries:
+                    raise EmbeddingError(
+                        f"Embedding batch of {len(texts)} texts failed after {attempt + 1} attempts: {e}"
+                    ) from e
+                delay = self.backoff_seconds * (2 ** attempt)
+                logger.warning("Embedding batch failed (%s), retrying in %.2fs", e, delay)
+                time.sleep(delay)
+                attempt += 1
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed search docs."""
+        if not texts:
+            return []
+        logger.debug("embed_documents called with %d texts", len(texts))
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        if len(batches) == 1 or self.max_concurrency == 1:
+            batch_results = [self._embed_batch(batch) for batch in batches]
+        else:
+            workers = min(self.max_concurrency, len(batches))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # map preserves input order, and re-raises the first batch failure
+                batch_results = list(executor.map(bind_context(self._embed_batch), batches))
+
+        results = [vector for batch in batch_results for vector in batch]
+        logger.debug("Generated %d embeddings", len(results))
         return results
 
     def embed_query(self, text: str) -> List[float]:
         """Embed query text."""
-        try:
-            response = self.client.models.embed_content(
-                model=self.model,
-                contents=text
-            )
-            if hasattr(response, 'embeddings'):
-                # Same logic as above
-                embedding_obj = response.embeddings[0]
-                if hasattr(embedding_obj, 'values'):
-                    return embedding_obj.values
-                return embedding_obj
-            return []
-        except Exception as e:
-            print(f"Embedding query error: {e}")
-            return []
+        return self._embed_batch([text])[0]
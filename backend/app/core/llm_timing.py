@@ -0,0 +1,77 @@
+import logging
+import time
+from typing import Any, Dict, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import Runnable
+
+from app.core.observability import observe_stage, observe_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class LLMTimingCallback(BaseCallbackHandler):
+    """
+    Records every LLM call as the ``llm`` stage of the current pipeline and, when the
+    call streams, the time to its first token as ``llm_first_token``. The prompt and
+    completion token counts the provider reports go to ``app_llm_tokens`` and the log.
+    """
+    # Only reads the clock; running inline keeps it in the caller's context
+    run_inline = True
+
+    def __init__(self):
+        self._starts: Dict[UUID, float] = {}
+        self._streaming: set = set()
+
+    def _start(self, run_id: UUID):
+        self._starts[run_id] = time.perf_counter()
+
+    def _end(self, run_id: UUID, outcome: str, usage: Optional[Tuple[int, int]] = None):
+        start = self._starts.pop(run_id, None)
+        self._streaming.discard(run_id)
+        elapsed = time.perf_counter() - start if start is not None else None
+        if elapsed is not None:
+            observe_stage("llm", elapsed, outcome=outcome)
+        if usage is not None:
+            observe_tokens(*usage)
+            logger.info("LLM call: %d prompt tokens, %d completion tokens in %.2fs", usage[0], usage[1], elapsed or 0.0)
+
+    @staticmethod
+    def _usage(response) -> Optional[Tuple[int, int]]:
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+        token_usage = (response.llm_output or {}).get("token_usage")
+        if token_usage:
+            return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+        return None
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any):
+        self._start(run_id)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any):
+        self._start(run_id)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any):
+        start = self._starts.get(run_id)
+        if start is not None and run_id not in self._streaming:
+            self._streaming.add(run_id)
+            observe_stage("llm_first_token", time.perf_counter() - start)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id, "ok", self._usage(response))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        self._end(run_id, "error")
+
+
+llm_timing_callback = LLMTimingCallback()
+
+
+def timed(llm: BaseChatModel) -> Runnable:
+    """``llm`` with its calls recorded on the stage histogram."""
+    return llm.with_config(callbacks=[llm_timing_callback])
@@ -0,0 +1,286 @@
+import atexit
+import contextvars
+import logging
+import logging.handlers
+import math
+import queue
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from opentelemetry.sdk.metrics import Histogram, MeterProvider
+from opentelemetry.sdk.metrics.export import (
+    Gauge as GaugeData,
+    Histogram as HistogramData,
+    InMemoryMetricReader,
+    Sum as SumData,
+)
+from opentelemetry.sdk.metrics.view import ExplicitBucketHistogramAggregation, View
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Request id of the HTTP request (or background job) being served, for log lines
+request_id_var: contextvars.ContextVar = contextvars.ContextVar("request_id", default="-")
+# Which pipeline ("chat", "quiz", "ingest", ...) the current stage timings belong to
+pipeline_var: contextvars.ContextVar = contextvars.ContextVar("pipeline", default="other")
+
+# OTel's default buckets are in milliseconds; these are seconds, from a cached
+# embedding lookup up to a long LLM generation or a big ingestion
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+# Prompt and completion sizes, from a short follow-up to a full coverage section
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+_reader = InMemoryMetricReader()
+_provider = MeterProvider(
+    metric_readers=[_reader],
+    views=[
+        View(instrument_type=Histogram, instrument_name="*_seconds", aggregation=ExplicitBucketHistogramAggregation(LATENCY_BUCKETS)),
+        View(instrument_type=Histogram, instrument_name="*_tokens", aggregation=ExplicitBucketHistogramAggregation(TOKEN_BUCKETS)),
+    ],
+)
+meter = _provider.get_meter("ai_study_assistant")
+
+STAGE_DURATION = meter.create_histogram(
+    "app_stage_duration_seconds", unit="s",
+    description="Time spent in each pipeline stage (load, split, embed, upsert, retrieve, llm, parse)"
+)
+REQUEST_DURATION = meter.create_histogram(
+    "app_http_request_duration_seconds", unit="s", description="HTTP request duration by route"
+)
+LLM_TOKENS = meter.create_histogram(
+    "app_llm_tokens", unit="{token}", description="Tokens per LLM call by pipeline and kind (prompt, completion)"
+)
+
+_stats_providers: Dict[str, Callable[[], Dict[str, float]]] = {}
+
+
+def get_request_id() -> str:
+    return request_id_var.get()
+
+
+def set_request_id(request_id: str) -> contextvars.Token:
+    return request_id_var.set(request_id)
+
+
+def set_pipeline(name: str) -> contextvars.Token:
+    return pipeline_var.set(name)
+
+
+def bind_context(fn: Callable) -> Callable:
+    """Wrap ``fn`` to run in a copy of the caller's context, e.g. on a thread pool."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+
+def observe_stage(name: str, seconds: float, pipeline: str = None, outcome: str = "ok"):
+    STAGE_DURATION.record(seconds, {"stage": name, "pipeline": pipeline or pipeline_var.get(), "outcome": outcome})
+
+
+def observe_tokens(prompt: int, completion: int, pipeline: str = None):
+    pipeline = pipeline or pipeline_var.get()
+    LLM_TOKENS.record(prompt, {"pipeline": pipeline, "kind": "prompt"})
+    LLM_TOKENS.record(completion, {"pipeline": pipeline, "kind": "completion"})
+
+
+@contextmanager
+def stage(name: str, pipeline: str = None):
+    """Time the enclosed block as one ``name`` stage of the current pipeline."""
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        observe_stage(name, elapsed, pipeline, outcome)
+        logger.debug("%s.%s took %.1f ms (%s)", pipeline or pipeline_var.get(), name, elapsed * 1000, outcome)
+
+
+class StageTimer:
+    """
+    Accumulates time per stage across many small steps (pages, batches) and records
+    each total once, so a whole ingestion shows up as one observation per stage.
+    Safe to use from several threads.
+    """
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.totals: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self.totals[name] = self.totals.get(name, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def record(self, outcome: str = "ok"):
+        with self._lock:
+            totals = dict(self.totals)
+        for name, seconds in totals.items():
+            observe_stage(name, seconds, self.pipeline, outcome)
+        return totals
+
+
+def register_stats(name: str, provider: Callable[[], Dict[str, float]]):
+    """Export ``provider()``'s numeric values as ``app_<name>_<key>`` gauges on /metrics."""
+    _stats_providers[name] = provider
+
+
+# --- Logging -----------------------------------------------------------------
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id_var.get()
+        return True
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging(level: str = None):
+    """
+    Send the ``app`` loggers through a queue to stderr at ``LOG_LEVEL``.
+
+    Callers only enqueue the record; a listener thread does the formatting and I/O.
+    The request id is stamped on the record before it is queued.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    app_logger = logging.getLogger("app")
+    app_logger.setLevel((level or settings.LOG_LEVEL).upper())
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)-7s [%(request_id)s] %(name)s: %(message)s"))
+    records: "queue.SimpleQueue" = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(records)
+    queue_handler.addFilter(RequestIdFilter())
+    app_logger.addHandler(queue_handler)
+    app_logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(records, handler)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+# --- HTTP --------------------------------------------------------------------
+
+class RequestIdMiddleware:
+    """
+    Gives every HTTP request an id (the client's ``X-Request-ID`` or a new one),
+    makes it visible to logging for the duration of the request, echoes it back in
+    the response, and records the request duration by route.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = ""
+        for key, value in scope["headers"]:
+            if key == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+        token = request_id_var.set(request_id)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            route = scope.get("route")
+            REQUEST_DURATION.record(time.perf_counter() - start, {
+                "method": scope["method"],
+                # The route template, so ids in paths don't explode the label set
+                "route": getattr(route, "path", "unmatched"),
+                "status": str(status),
+            })
+            request_id_var.reset(token)
+
+
+# --- Prometheus exposition ---------------------------------------------------
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(attributes: dict, extra: dict = None) -> str:
+    items = dict(attributes or {})
+    if extra:
+        items.update(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in items.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    data = _reader.get_metrics_data()
+    for resource_metrics in (data.resource_metrics if data else []):
+        for scope_metrics in resource_metrics.scope_metrics:
+            for metric in scope_metrics.metrics:
+                name = metric.name.replace(".", "_")
+                points = metric.data.data_points
+                if isinstance(metric.data, HistogramData):
+                    lines += [f"# HELP {name} {metric.description}", f"# TYPE {name} histogram"]
+                    for point in points:
+                        cumulative = 0
+                        for bound, count in zip(list(point.explicit_bounds) + [math.inf], point.bucket_counts):
+                            cumulative += count
+                            lines.append(f"{name}_bucket{_labels(point.attributes, {'le': _number(float(bound))})} {cumulative}")
+                        lines.append(f"{name}_sum{_labels(point.attributes)} {_number(point.sum)}")
+                        lines.append(f"{name}_count{_labels(point.attributes)} {point.count}")
+                elif isinstance(metric.data, (SumData, GaugeData)):
+                    counter = isinstance(metric.data, SumData) and metric.data.is_monotonic
+                    if counter and not name.endswith("_total"):
+                        name += "_total"
+                    lines += [f"# HELP {name} {metric.description}", f"# TYPE {name} {'counter' if counter else 'gauge'}"]
+                    for point in points:
+                        lines.append(f"{name}{_labels(point.attributes)} {_number(point.value)}")
+
+    for provider_name, provider in sorted(_stats_providers.items()):
+        try:
+            stats = provider()
+        except Exception:
+            logger.exception("Stats provider %s failed", provider_name)
+            continue
+        for key, value in sorted(stats.items()):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"app_{provider_name}_{key}"
+            lines += [f"# TYPE {name} gauge", f"{name} {_number(value)}"]
+    return "\n".join(lines) + "\n"
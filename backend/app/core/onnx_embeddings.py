@@ -0,0 +1,94 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import numpy as np
+import onnxruntime as ort
+from langchain_core.embeddings import Embeddings
+from tokenizers import Tokenizer
+
+from app.core.config import settings
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Local sentence embeddings from an ONNX transformer model, run on CPU.
+
+    ``model_dir`` holds ``model.onnx`` (a sentence-transformers export such as
+    all-MiniLM-L6-v2, whose first output is the token embeddings) and the matching
+    ``tokenizer.json``. Texts are tokenized and run in batches of ``batch_size``; up to
+    ``max_concurrency`` batches run at once on one shared session, each using
+    ``threads`` intra-op threads. Vectors are mean-pooled over the attention mask and
+    L2-normalised.
+    """
+    def __init__(
+        self,
+        model_dir: str = None,
+        batch_size: int = None,
+        max_concurrency: int = None,
+        threads: int = None,
+        max_length: int = None,
+    ):
+        self.model_dir = model_dir or settings.ONNX_EMBEDDING_MODEL_DIR
+        model_path = os.path.join(self.model_dir, "model.onnx")
+        tokenizer_path = os.path.join(self.model_dir, "tokenizer.json")
+        if not (os.path.exists(model_path) and os.path.exists(tokenizer_path)):
+            raise FileNotFoundError(
+                f"No ONNX embedding model in '{self.model_dir}' (need model.onnx and tokenizer.json); "
+                "run 'python manage.py download-embedding-model'"
+            )
+
+        self.batch_size = batch_size or settings.EMBEDDING_BATCH_SIZE
+        self.max_concurrency = max_concurrency or settings.EMBEDDING_MAX_CONCURRENCY
+        threads = threads if threads is not None else settings.ONNX_EMBEDDING_THREADS
+        if not threads:
+            # Share the cores between the concurrent batches instead of oversubscribing
+            threads = max(1, (os.cpu_count() or 1) // self.max_concurrency)
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_length or settings.ONNX_EMBEDDING_MAX_LENGTH)
+        self.tokenizer.enable_padding()  # pad each batch to its longest text
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_names = {node.name for node in self.session.get_inputs()}
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        output = self.session.run(None, inputs)[0]
+        if output.ndim == 3:
+            mask = attention_mask[:, :, None].astype(np.float32)
+            output = (output * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        norms = np.linalg.norm(output, axis=1, keepdims=True)
+        return output / np.clip(norms, 1e-12, None)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        # Batch texts of similar length together so little of each batch is padding
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        batches = [
+            [texts[i] for i in order[start:start + self.batch_size]]
+            for start in range(0, len(order), self.batch_size)
+        ]
+        if len(batches) == 1 or self.max_concurrency <= 1:
+            results = [self._embed_batch(batch) for batch in batches]
+        else:
+            # onnxruntime releases the GIL while running, so batches overlap
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+                results = list(pool.map(self._embed_batch, batches))
+        vectors = np.empty((len(texts), results[0].shape[1]), dtype=np.float32)
+        vectors[order] = np.concatenate(results)
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_batch([text])[0].tolist()
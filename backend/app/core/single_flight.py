@@ -0,0 +1,245 @@
+import asyncio
+import hashlib
+import json
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.runnables import Runnable, RunnableConfig
+
+from app.core.config import settings
+from app.core.llm_timing import timed
+from app.core.observability import register_stats
+
+T = TypeVar("T")
+
+
+def flight_key(*parts: Any) -> str:
+    """Stable digest of ``parts``; dict keys are sorted, so argument order doesn't matter."""
+    payload = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    """A sync call in flight: followers wait on ``done`` for its result or error."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class _Stream:
+    """
+    An async call in flight. Its task pushes each output (one for a plain call, one
+    per chunk for a stream) so callers that join late replay what they missed.
+    """
+    def __init__(self):
+        self.chunks: List[Any] = []
+        self.finished = False
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def push(self, chunk: Any):
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, error: BaseException = None):
+        self.finished = True
+        self.error = error
+        self._notify()
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def result(self) -> Any:
+        while not self.finished:
+            await self._changed.wait()
+        if self.error is not None:
+            raise self.error
+        return self.chunks[0]
+
+    async def follow(self) -> AsyncIterator[Any]:
+        position = 0
+        while True:
+            if position < len(self.chunks):
+                position += 1
+                yield self.chunks[position - 1]
+            elif self.finished:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                await self._changed.wait()
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one upstream call.
+
+    The first caller for a key starts the call; callers that arrive while it is in
+    flight wait for it and get the same result, or the same exception. Nothing is
+    kept afterwards: the next call with that key, once the first has returned, goes
+    upstream again. Caching finished results is left to the caches in front.
+
+    ``do`` is for threads, ``ado`` and ``astream`` for coroutines; the two sides
+    don't share calls. An async call runs in its own task, so a caller that goes away
+    (a closed connection) doesn't cancel it for the others. It is only cancelled when
+    every caller has gone.
+    """
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[Tuple[asyncio.AbstractEventLoop, str], _Stream] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.upstream_calls = 0
+        self.saved_calls = 0
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        with self._lock:
+            self.requests += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.upstream_calls += 1
+            else:
+                self.saved_calls += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _join(self, key: str, start: Callable[[_Stream], Awaitable[None]]) -> _Stream:
+        flight_key = (asyncio.get_running_loop(), key)
+        with self._lock:
+            self.requests += 1
+            stream = self._streams.get(flight_key)
+            if stream is not None and not stream.finished:
+                self.saved_calls += 1
+            else:
+                stream = self._streams[flight_key] = _Stream()
+                self.upstream_calls += 1
+                stream.task = asyncio.ensure_future(start(stream))
+                stream.task.add_done_callback(lambda _: self._forget(flight_key, stream))
+            stream.waiters += 1
+        return stream
+
+    def _forget(self, flight_key, stream: _Stream):
+        with self._lock:
+            if self._streams.get(flight_key) is stream:
+                del self._streams[flight_key]
+
+    def _leave(self, stream: _Stream):
+        with self._lock:
+            stream.waiters -= 1
+            abandoned = stream.waiters == 0 and not stream.finished
+        if abandoned:
+            stream.task.cancel()
+
+    async def ado(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        async def start(stream: _Stream):
+            try:
+                stream.push(await fn())
+                stream.finish()
+            except BaseException as e:
+                stream.finish(e)
+
+        stream = self._join(key, start)
+        try:
+            return await stream.result()
+        finally:
+            self._leave(stream)
+
+    async def astream(self, key: str, fn: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """Like ``ado`` for a stream: each caller gets every chunk, including those sent before it joined."""
+        async def start(stream: _Stream):
+            try:
+                async for chunk in fn():
+                    stream.push(chunk)
+                stream.finish()
+            except BaseException as e:
+                stream.finish(e)
+
+        stream = self._join(key, start)
+        try:
+            async for chunk in stream.follow():
+                yield chunk
+        finally:
+            self._leave(stream)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "upstream_calls": self.upstream_calls,
+                "saved_calls": self.saved_calls,
+                "saved_rate": self.saved_calls / self.requests if self.requests else 0.0,
+                "in_flight": len(self._calls) + len(self._streams),
+            }
+
+
+llm_flights = SingleFlight()
+embedding_flights = SingleFlight()
+register_stats("llm_single_flight", llm_flights.stats)
+register_stats("embedding_single_flight", embedding_flights.stats)
+
+
+class SingleFlightLLM(Runnable):
+    """
+    A chat model step whose concurrent identical calls share one request.
+
+    Calls are identical when the model's class and parameters (model, temperature,
+    ...) and the prompt messages match, whitespace aside. The messages carry the
+    prompt template and the context filled into it, so the key covers both.
+    Streamed calls are shared chunk by chunk.
+    """
+    def __init__(self, llm: BaseChatModel, runnable: Runnable = None, flights: SingleFlight = None):
+        self.llm = llm
+        self.runnable = runnable or llm
+        self.flights = flights or llm_flights
+        params = getattr(llm, "_default_params", None) or llm._identifying_params
+        self._params = {"model_class": type(llm).__name__, **params}
+
+    def _key(self, input: Any, kwargs: dict) -> str:
+        messages = [
+            (message.type, " ".join(message.content.split()) if isinstance(message.content, str) else message.content)
+            for message in self.llm._convert_input(input).to_messages()
+        ]
+        return flight_key(self._params, kwargs, messages)
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return self.flights.do(self._key(input, kwargs), lambda: self.runnable.invoke(input, config, **kwargs))
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        return await self.flights.ado(self._key(input, kwargs), lambda: self.runnable.ainvoke(input, config, **kwargs))
+
+    def stream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Iterator[Any]:
+        # Nothing streams from a worker thread; not worth a threaded broadcast
+        yield from self.runnable.stream(input, config, **kwargs)
+
+    async def astream(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> AsyncIterator[Any]:
+        async for chunk in self.flights.astream(self._key(input, kwargs), lambda: self.runnable.astream(input, config, **kwargs)):
+            yield chunk
+
+
+def coalesced(llm: BaseChatModel) -> Runnable:
+    """``timed(llm)`` behind the shared single-flight layer, unless ``SINGLE_FLIGHT_ENABLED`` is off."""
+    if not settings.SINGLE_FLIGHT_ENABLED:
+        return timed(llm)
+    return SingleFlightLLM(llm, timed(llm))
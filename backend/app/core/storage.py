@@ -0,0 +1,116 @@
+import hashlib
+import os
+import uuid
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+import aiofiles
+from fastapi import UploadFile
+
+from app.core.config import settings
+
+UPLOAD_DIR = "uploads"
+BLOB_DIR = os.path.join(UPLOAD_DIR, "blobs")
+TMP_DIR = os.path.join(UPLOAD_DIR, "tmp")
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload exceeds ``settings.MAX_UPLOAD_BYTES``."""
+
+
+class StoredFile(NamedTuple):
+    path: str
+    sha256: str
+    size: int
+    spare: Optional[str] = None  # our copy of a blob that already existed; see settle()
+
+
+def blob_path(sha256: str, extension: str) -> str:
+    """Content-addressed location of a blob, sharded by the first two hex digits."""
+    return os.path.join(BLOB_DIR, sha256[:2], f"{sha256}{extension.lower()}")
+
+
+async def save_upload(file: UploadFile, max_bytes: int = None, chunk_size: int = None) -> StoredFile:
+    """
+    Stream an upload to disk, hashing it as it is written.
+
+    The file is written to a temporary name and moved to its content-addressed blob path
+    once the hash is known. If an identical blob already exists the temporary copy is
+    kept as ``spare`` until ``settle``, since the blob may yet be removed along with
+    the last document that used it. Uploads larger than ``max_bytes`` are aborted as
+    soon as the limit is crossed.
+    """
+    max_bytes = max_bytes or settings.MAX_UPLOAD_BYTES
+    chunk_size = chunk_size or settings.UPLOAD_CHUNK_BYTES
+    if file.size is not None and file.size > max_bytes:
+        raise UploadTooLarge(f"File exceeds the {max_bytes} byte upload limit")
+
+    os.makedirs(TMP_DIR, exist_ok=True)
+    tmp_path = os.path.join(TMP_DIR, uuid.uuid4().hex)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(tmp_path, "wb") as out:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"File exceeds the {max_bytes} byte upload limit")
+                digest.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    sha256 = digest.hexdigest()
+    extension = os.path.splitext(file.filename or "")[1]
+    path = blob_path(sha256, extension)
+    if os.path.exists(path):
+        return StoredFile(path=path, sha256=sha256, size=size, spare=tmp_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(tmp_path, path)
+    return StoredFile(path=path, sha256=sha256, size=size)
+
+
+def settle(stored: StoredFile):
+    """
+    Drop the spare copy once a committed row refers to ``stored.path`` (or the upload
+    failed). If a concurrent ``remove_unused`` took the blob away in the meantime,
+    the spare takes its place instead.
+    """
+    if stored.spare is None or not os.path.exists(stored.spare):
+        return
+    if os.path.exists(stored.path):
+        os.remove(stored.spare)
+    else:
+        os.makedirs(os.path.dirname(stored.path), exist_ok=True)
+        os.replace(stored.spare, stored.path)
+
+
+async def remove_unused(path: str, in_use: Callable[[], Awaitable[bool]]):
+    """
+    Remove a stored file unless ``in_use()`` finds a committed row still referring to it.
+
+    The file is moved aside before a second check, so an upload that found it earlier
+    has either committed its row by then (and the file is put back) or settles
+    afterwards (and restores it from its spare). The first check keeps files in use
+    where they are.
+    """
+    if await in_use():
+        return
+    aside = f"{path}.{uuid.uuid4().hex}.removing"
+    try:
+        os.rename(path, aside)
+    except FileNotFoundError:
+        return
+    try:
+        used = await in_use()
+    except BaseException:
+        os.replace(aside, path)
+        raise
+    if used:
+        os.replace(aside, path)
+    else:
+        os.remove(aside)
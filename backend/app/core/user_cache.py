@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from app.core.config import settings
+from app.core.observability import register_stats
+
+
+class CachedUser(NamedTuple):
+    """What authorisation needs from a ``User`` row, detached from any session."""
+    id: int
+    email: str
+    full_name: Optional[str]
+    is_active: bool
+    is_superuser: bool
+
+    @classmethod
+    def from_model(cls, user) -> "CachedUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            full_name=user.full_name,
+            is_active=bool(user.is_active),
+            is_superuser=bool(user.is_superuser),
+        )
+
+
+class UserCache:
+    """
+    In-process cache of authenticated users, so a request with a valid token doesn't
+    need a database round trip to find out who it is from.
+
+    Entries live for ``ttl_seconds``. Changes made through this process (such as
+    deactivation) call ``invalidate`` and take effect at once. Changes made elsewhere
+    (another worker, ``manage.py``) show up once the entry expires. At most
+    ``max_entries`` users are kept, and the least recently used is evicted first.
+    """
+    def __init__(self, ttl_seconds: float = None, max_entries: int = None):
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.USER_CACHE_TTL_SECONDS
+        self.max_entries = max_entries or settings.USER_CACHE_MAX_ENTRIES
+        self._entries: "OrderedDict[int, Tuple[CachedUser, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, user_id: int) -> Optional[CachedUser]:
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None or time.monotonic() - entry[1] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[user_id]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, user) -> CachedUser:
+        cached = user if isinstance(user, CachedUser) else CachedUser.from_model(user)
+        if self.ttl_seconds <= 0:
+            return cached
+        with self._lock:
+            self._entries[cached.id] = (cached, time.monotonic())
+            self._entries.move_to_end(cached.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return cached
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "invalidations": self.invalidations,
+            }
+
+
+user_cache = UserCache()
+register_stats("user_cache", user_cache.stats)
@@ -1,2 +1,6 @@
 from app.db.base_class import Base  # noqa
 from app.models.user import User  # noqa
+from app.models.document import Document  # noqa
+from app.models.quiz import Quiz, QuizAttempt, QuizBankQuestion  # noqa
+from app.models.chat import ChatSession, ChatMessage  # noqa
+from app.models.progress import UserProgress, TopicProgress, DocumentProgress, DailyProgress  # noqa
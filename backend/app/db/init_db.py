@@ -0,0 +1,27 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from app.db.base import Base
+
+
+def init_db(engine: Engine) -> None:
+    """
+    Create missing tables, and add columns and indexes introduced after a table was
+    first created.
+
+    ``create_all`` never alters existing tables, so databases created by an older
+    version would otherwise miss new nullable columns and their indexes.
+    """
+    Base.metadata.create_all(bind=engine)
+
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {col["name"] for col in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {col_type}'))
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
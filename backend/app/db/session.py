@@ -1,9 +1,75 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
 
-engine = create_engine(
-    settings.DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# Driver each backend uses for request handling (async) and for worker threads (sync)
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+SYNC_DRIVERS = {"sqlite": "sqlite+pysqlite", "postgresql": "postgresql+psycopg2"}
+
+
+def _with_driver(url: str, drivers: dict) -> str:
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in drivers:
+        return url
+    return parsed.set(drivername=drivers[backend]).render_as_string(hide_password=False)
+
+
+def async_database_url(url: str = None) -> str:
+    return _with_driver(url or settings.DATABASE_URL, ASYNC_DRIVERS)
+
+
+def sync_database_url(url: str = None) -> str:
+    return _with_driver(url or settings.DATABASE_URL, SYNC_DRIVERS)
+
+
+def _engine_options(url: str) -> dict:
+    if make_url(url).get_backend_name() == "sqlite":
+        # One file, one writer at a time: WAL (below) lets readers carry on meanwhile,
+        # and the busy timeout makes a second writer wait instead of failing
+        return {
+            "connect_args": {"check_same_thread": False, "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000},
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+        }
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+def _configure_sqlite(engine: Engine):
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")  # safe with WAL; fsyncs at checkpoints only
+        cursor.execute(f"PRAGMA busy_timeout={settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.close()
+
+
+def create_engines(url: str = None):
+    """The sync and async engines for ``url`` (default ``DATABASE_URL``)."""
+    sync_url, async_url = sync_database_url(url), async_database_url(url)
+    sync_engine = create_engine(sync_url, **_engine_options(sync_url))
+    async_engine = create_async_engine(async_url, **_engine_options(async_url))
+    _configure_sqlite(sync_engine)
+    _configure_sqlite(async_engine.sync_engine)
+    return sync_engine, async_engine
+
+
+# Sync engine: startup migrations, ingestion workers and manage.py. Requests use the
+# async engine, so waiting on the database never blocks the event loop.
+engine, async_engine = create_engines()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
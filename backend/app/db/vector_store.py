@@ -0,0 +1,160 @@
+import logging
+import re
+import threading
+from typing import Dict, Tuple
+
+import chromadb
+from chromadb.config import Settings as ChromaSettings
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PARTITION_RE = re.compile(r"__u\d+$")
+
+
+class VectorStore:
+    """
+    Process-wide owner of the Chroma client, shared by ingestion, chat and quizzes.
+
+    ``CHROMA_MODE=embedded`` opens a local ``PersistentClient``; ``CHROMA_MODE=http``
+    talks to a Chroma server over a keep-alive connection pool, so several uvicorn
+    workers can share one server. Collection handles and LangChain wrappers are built
+    once per collection and reused across requests.
+
+    With ``VECTOR_PARTITIONING=user`` each logical collection is split into one physical
+    collection per user (``<name>__u<user_id>``), so a user's searches never scan other
+    users' vectors. ``shared`` keeps everyone in one collection, filtered by metadata.
+    A store written before partitioning existed (vectors in shared collections, no
+    partitions yet) keeps being used as ``shared`` until ``manage.py partition`` has
+    moved its chunks, so upgrading doesn't hide anyone's documents.
+
+    Vectors from different embedding backends are not comparable (nor, usually, the same
+    size), so every backend but the original Gemini one gets its own namespace:
+    ``<name>__<backend>[__u<user_id>]``. ``manage.py reindex`` copies chunks across.
+    """
+    def __init__(self, mode: str = None, path: str = None, host: str = None, port: int = None):
+        self.mode = mode or settings.CHROMA_MODE
+        self.path = path or settings.CHROMA_PERSIST_DIR
+        self.host = host or settings.CHROMA_DB_HOST
+        self.port = port or settings.CHROMA_DB_PORT
+        self.partitioning = settings.VECTOR_PARTITIONING
+        self._shared_fallback = None  # decided on first use, see partitioned
+        self.backend = settings.EMBEDDING_BACKEND
+        self._client = None
+        self._collections: Dict[str, object] = {}
+        self._wrappers: Dict[Tuple[str, int], Chroma] = {}
+        self._lock = threading.RLock()
+
+    def _connect(self):
+        chroma_settings = ChromaSettings(anonymized_telemetry=False)
+        if self.mode == "http":
+            chroma_settings = ChromaSettings(
+                anonymized_telemetry=False,
+                chroma_http_keepalive_secs=settings.CHROMA_HTTP_KEEPALIVE_SECONDS,
+                chroma_http_max_connections=settings.CHROMA_HTTP_MAX_CONNECTIONS,
+                chroma_http_max_keepalive_connections=settings.CHROMA_HTTP_MAX_CONNECTIONS,
+            )
+            logger.info("Connecting to Chroma server at %s:%s", self.host, self.port)
+            return chromadb.HttpClient(host=self.host, port=self.port, settings=chroma_settings)
+        if self.mode == "embedded":
+            return chromadb.PersistentClient(path=self.path, settings=chroma_settings)
+        raise ValueError(f"Unknown CHROMA_MODE '{self.mode}', expected 'embedded' or 'http'")
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._connect()
+        return self._client
+
+    @property
+    def partitioned(self) -> bool:
+        """Whether users' chunks are in their own collections."""
+        if self.partitioning != "user":
+            return False
+        if self._shared_fallback is None:
+            with self._lock:
+                if self._shared_fallback is None:
+                    self._shared_fallback = self._unpartitioned()
+        return not self._shared_fallback
+
+    def use_partitions(self):
+        """Write to and read from per-user collections even if the store is still unpartitioned (``manage.py partition``)."""
+        self._shared_fallback = False
+
+    def _unpartitioned(self) -> bool:
+        """True when the store holds only shared, pre-partitioning collections with chunks in them."""
+        collections = self.client.list_collections()
+        if any(PARTITION_RE.search(col.name) for col in collections):
+            return False
+        legacy = [col.name for col in collections if col.count()]
+        if legacy:
+            logger.warning(
+                "VECTOR_PARTITIONING=user, but the chunks are still in shared collections (%s); "
+                "searching those until `python manage.py partition` moves them", ", ".join(legacy)
+            )
+        return bool(legacy)
+
+    def collection(self, name: str):
+        """Cached handle to a collection, created on first use."""
+        col = self._collections.get(name)
+        if col is None:
+            with self._lock:
+                col = self._collections.get(name)
+                if col is None:
+                    col = self.client.get_or_create_collection(name)
+                    self._collections[name] = col
+        return col
+
+    def namespaced(self, collection_name: str, backend: str = None) -> str:
+        """Logical collection name under an embedding backend's namespace."""
+        backend = backend or self.backend
+        if backend == "gemini":
+            return collection_name
+        return f"{collection_name}__{backend}"
+
+    def partition_name(self, collection_name: str, user_id: int = None, backend: str = None) -> str:
+        """Physical collection holding ``user_id``'s chunks of a logical collection."""
+        name = self.namespaced(collection_name, backend)
+        if user_id is not None and self.partitioned:
+            return f"{name}__u{user_id}"
+        return name
+
+    def user_collection(self, collection_name: str, user_id: int = None, backend: str = None):
+        return self.collection(self.partition_name(collection_name, user_id, backend))
+
+    def langchain(self, name: str, embeddings: Embeddings) -> Chroma:
+        """Cached LangChain ``Chroma`` wrapper for a collection and embedding model."""
+        key = (name, id(embeddings))
+        wrapper = self._wrappers.get(key)
+        if wrapper is None:
+            with self._lock:
+                wrapper = self._wrappers.get(key)
+                if wrapper is None:
+                    wrapper = Chroma(
+                        client=self.client,
+                        collection_name=name,
+                        embedding_function=embeddings
+                    )
+                    self._wrappers[key] = wrapper
+        return wrapper
+
+    def list_collections(self):
+        return self.client.list_collections()
+
+    def delete_collection(self, name: str):
+        with self._lock:
+            self.client.delete_collection(name)
+            self._forget(name)
+
+    def _forget(self, name: str):
+        self._collections.pop(name, None)
+        for key in [key for key in self._wrappers if key[0] == name]:
+            del self._wrappers[key]
+
+
+vector_store = VectorStore()
@@ -1,9 +1,20 @@
+import logging
+import threading
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from app.api import deps
 from app.api.v1.api import api_router
 
-from app.db.base import Base
-from app.db.session import engine
+from app.core.config import settings
+from app.core.observability import RequestIdMiddleware, configure_logging, render_prometheus
+from app.db.init_db import init_db
+from app.db.session import async_engine, engine
+from app.services.ingestion_queue import ingestion_queue
+
+configure_logging()
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="AI Study Assistant API",
@@ -12,7 +23,35 @@ app = FastAPI(
 
 @app.on_event("startup")
 def create_tables():
-    Base.metadata.create_all(bind=engine)
+    init_db(engine)
+
+@app.on_event("startup")
+def start_ingestion_workers():
+    ingestion_queue.start()
+    ingestion_queue.resume()
+
+@app.on_event("shutdown")
+def stop_ingestion_workers():
+    ingestion_queue.stop()
+
+@app.on_event("shutdown")
+async def close_database():
+    # Pooled aiosqlite connections each own a thread that would keep the process alive
+    await async_engine.dispose()
+
+def _warm_services():
+    # Import LangChain / chromadb and build the clients off the request path, so the
+    # first chat or quiz request doesn't pay for them
+    for getter in (deps.get_rag_service, deps.get_chat_memory, deps.get_quiz_service, deps.get_ingestion_service):
+        try:
+            getter()
+        except Exception as e:
+            logger.warning("Service warm-up skipped %s: %s", getter.__name__, e)
+
+@app.on_event("startup")
+def warm_services():
+    if settings.WARM_SERVICES_ON_STARTUP:
+        threading.Thread(target=_warm_services, name="service-warmup", daemon=True).start()
 
 # Set all CORS enabled origins
 # Set all CORS enabled origins
@@ -22,10 +61,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "X-Next-Cursor"],
 )
+# Outermost, so the request id is set before anything else logs
+app.add_middleware(RequestIdMiddleware)
 
 @app.get("/")
 def root():
     return {"message": "Welcome to AI Study Assistant API"}
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 app.include_router(api_router, prefix="/api/v1")
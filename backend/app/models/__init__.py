@@ -1,3 +1,5 @@
 from .user import User
 from .document import Document
-from .quiz import Quiz, QuizAttempt
+from .quiz import Quiz, QuizAttempt, QuizBankQuestion
+from .chat import ChatSession, ChatMessage
+from .progress import UserProgress, TopicProgress, DocumentProgress, DailyProgress
@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, JSON, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.db.base_class import Base
+
+class ChatSession(Base):
+    """A conversation with the assistant, and the memory that keeps its prompts bounded."""
+    # Matches the session list: one owner's sessions, most recently active first
+    __table_args__ = (Index("ix_chatsession_owner_id_updated_at", "owner_id", "updated_at", "id"),)
+    id = Column(Integer, primary_key=True, index=True)
+    owner_id = Column(Integer, ForeignKey("user.id"))
+    title = Column(String, nullable=True)  # the first question, shortened
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    # Rolling summary of every message up to and including summarized_through
+    summary = Column(Text, nullable=True)
+    summarized_through = Column(Integer, nullable=True)  # ChatMessage.id
+
+    # Last retrieval, reused while follow-ups condense to nearly the same query
+    last_query = Column(Text, nullable=True)
+    last_chunks = Column(JSON, nullable=True)  # [{page_content, metadata}]
+    last_retrieved_at = Column(DateTime, nullable=True)
+
+    owner = relationship("User", backref="chat_sessions")
+
+class ChatMessage(Base):
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(Integer, ForeignKey("chatsession.id"), index=True)
+    role = Column(String)  # "user" or "assistant"
+    content = Column(Text)
+    tokens = Column(Integer)
+    query = Column(Text, nullable=True)  # user messages: the standalone query retrieval used
+    sources = Column(JSON, nullable=True)  # assistant messages: [{page_content, source}]
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,9 +1,17 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.base_class import Base
 
+# Ingestion lifecycle of a Document
+STATUS_PENDING = "pending"
+STATUS_PROCESSING = "processing"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
 class Document(Base):
+    # Matches the document list: one owner's documents, newest first
+    __table_args__ = (Index("ix_document_owner_id_upload_date", "owner_id", "upload_date", "id"),)
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
     description = Column(String, nullable=True)
@@ -11,5 +19,18 @@ class Document(Base):
     file_type = Column(String, nullable=False)
     upload_date = Column(DateTime, default=datetime.utcnow)
     owner_id = Column(Integer, ForeignKey("user.id"))
+    content_hash = Column(String, nullable=True, index=True)  # sha256 of the stored blob
+    size_bytes = Column(Integer, nullable=True)
+
+    # Ingestion job state
+    status = Column(String, default=STATUS_PENDING, index=True)
+    chunk_count = Column(Integer, nullable=True)
+    chunks_embedded = Column(Integer, nullable=True)  # last run: newly embedded
+    chunks_reused = Column(Integer, nullable=True)  # last run: kept from the previous version
+    chunks_removed = Column(Integer, nullable=True)  # last run: dropped from the previous version
+    error = Column(String, nullable=True)
+    processing_started_at = Column(DateTime, nullable=True)
+    processing_finished_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)  # refreshed while a worker holds the job; see IngestionQueue
 
     owner = relationship("User", backref="documents")
@@ -0,0 +1,38 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, Date, UniqueConstraint
+from app.db.base_class import Base
+
+# Study-progress aggregates, kept up to date by submit_attempt in the attempt's
+# transaction, so progress views never scan QuizAttempt.
+# `python manage.py rebuild-progress` recomputes them from the attempts.
+
+class ProgressCounts:
+    attempts = Column(Integer, default=0, nullable=False)
+    questions = Column(Integer, default=0, nullable=False)
+    correct = Column(Float, default=0, nullable=False)
+    score_sum = Column(Float, default=0, nullable=False)  # sum of each attempt's correct / questions
+    best_score = Column(Float, nullable=True)
+    last_score = Column(Float, nullable=True)
+    last_attempt_at = Column(DateTime, nullable=True)
+
+class UserProgress(ProgressCounts, Base):
+    user_id = Column(Integer, ForeignKey("user.id"), primary_key=True)
+    first_attempt_at = Column(DateTime, nullable=True)
+
+class TopicProgress(ProgressCounts, Base):
+    __table_args__ = (UniqueConstraint("user_id", "topic_key"),)
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("user.id"))
+    topic_key = Column(String)  # lowercased, whitespace collapsed
+    topic = Column(String)  # as last asked
+
+class DocumentProgress(ProgressCounts, Base):
+    __table_args__ = (UniqueConstraint("user_id", "document_id"),)
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("user.id"))
+    document_id = Column(Integer)  # no foreign key: rows go with the document in delete_document
+
+class DailyProgress(ProgressCounts, Base):
+    __table_args__ = (UniqueConstraint("user_id", "day"),)
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("user.id"))
+    day = Column(Date)  # UTC
@@ -1,18 +1,24 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, JSON
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, JSON, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.db.base_class import Base
 
 class Quiz(Base):
+    # Matches the quiz list: one owner's quizzes, newest first
+    __table_args__ = (Index("ix_quiz_owner_id_created_at", "owner_id", "created_at", "id"),)
     id = Column(Integer, primary_key=True, index=True)
     topic = Column(String)
     questions = Column(JSON) # List of questions [{question, options, correct_answer}]
+    coverage = Column(Float, nullable=True) # Fraction of the document's chunks behind the questions (coverage mode)
     created_at = Column(DateTime, default=datetime.utcnow)
     owner_id = Column(Integer, ForeignKey("user.id"))
+    document_id = Column(Integer, nullable=True)  # the document it was generated from, if any (kept after the document is deleted)
     
     owner = relationship("User", backref="quizzes")
 
 class QuizAttempt(Base):
+    # Matches the attempt list: one user's attempts, newest first
+    __table_args__ = (Index("ix_quizattempt_user_id_completed_at", "user_id", "completed_at", "id"),)
     id = Column(Integer, primary_key=True, index=True)
     quiz_id = Column(Integer, ForeignKey("quiz.id"))
     user_id = Column(Integer, ForeignKey("user.id"))
@@ -22,3 +28,13 @@ class QuizAttempt(Base):
     
     user = relationship("User", backref="attempts")
     quiz = relationship("Quiz", backref="attempts")
+
+class QuizBankQuestion(Base):
+    """A question precomputed for one section of a document after ingestion."""
+    id = Column(Integer, primary_key=True, index=True)
+    document_id = Column(Integer, ForeignKey("document.id"), index=True)
+    owner_id = Column(Integer, ForeignKey("user.id"), index=True)
+    section = Column(Integer)  # position of the section in the document
+    chunk_ids = Column(JSON)  # chunks the question was generated from
+    question = Column(JSON)  # {question, options, correct_answer}
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -8,3 +8,4 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean(), default=True)
     is_superuser = Column(Boolean(), default=False)
+    documents_version = Column(Integer, default=0)  # bumped when the user's documents change; see SemanticAnswerCache
@@ -1,5 +1,6 @@
 from .user import User, UserCreate, UserUpdate, UserInDB
 from .token import Token, TokenPayload
-from .document import Document, DocumentCreate
-from .chat import ChatRequest, ChatResponse, SourceDocument
-from .quiz import Quiz, QuizGenerateRequest, QuizAttempt, QuizAttemptCreate
+from .document import Document, DocumentCreate, DocumentStatus
+from .chat import ChatRequest, ChatResponse, SourceDocument, ChatSession, ChatSessionCreate, ChatSessionDetail, ChatMessage
+from .quiz import Quiz, QuizGenerateRequest, QuizQuestion, QuizAttempt, QuizAttemptCreate, QuizSummary
+from .progress import ProgressStats, TopicProgress, DocumentProgress, DailyProgress, Dashboard
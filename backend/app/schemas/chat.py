@@ -1,9 +1,11 @@
+from datetime import datetime
 from typing import List, Optional
 from pydantic import BaseModel
 
 class ChatRequest(BaseModel):
     question: str
     collection_name: Optional[str] = "documents" # default collection
+    session_id: Optional[int] = None  # continue a chat session; without one the question stands alone
 
 class SourceDocument(BaseModel):
     page_content: str
@@ -12,3 +14,30 @@ class SourceDocument(BaseModel):
 class ChatResponse(BaseModel):
     answer: str
     sources: List[SourceDocument]
+    session_id: Optional[int] = None
+
+class ChatSessionCreate(BaseModel):
+    title: Optional[str] = None
+
+class ChatSession(BaseModel):
+    id: int
+    title: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class ChatMessage(BaseModel):
+    id: int
+    role: str
+    content: str
+    sources: Optional[List[SourceDocument]] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class ChatSessionDetail(ChatSession):
+    summary: Optional[str] = None
+    messages: List[ChatMessage]
@@ -15,6 +15,24 @@ class Document(DocumentBase):
     file_type: str
     upload_date: datetime
     owner_id: int
+    content_hash: Optional[str] = None
+    size_bytes: Optional[int] = None
+    status: Optional[str] = None
+    chunk_count: Optional[int] = None
 
     class Config:
         from_attributes = True
+
+class DocumentStatus(BaseModel):
+    id: int
+    status: str  # pending | processing | ready | failed
+    chunk_count: Optional[int] = None
+    chunks_embedded: Optional[int] = None
+    chunks_reused: Optional[int] = None
+    chunks_removed: Optional[int] = None
+    error: Optional[str] = None
+    upload_date: datetime
+    processing_started_at: Optional[datetime] = None
+    processing_finished_at: Optional[datetime] = None
+    queue_seconds: Optional[float] = None
+    processing_seconds: Optional[float] = None
@@ -0,0 +1,52 @@
+from datetime import date, datetime
+from typing import List, Optional
+from pydantic import BaseModel
+
+from .document import Document
+from .quiz import QuizSummary
+
+class ProgressStats(BaseModel):
+    attempts: int = 0
+    questions: int = 0
+    correct: float = 0
+    accuracy: Optional[float] = None  # correct / questions
+    average_score: Optional[float] = None  # mean of each attempt's correct / questions
+    best_score: Optional[float] = None
+    last_score: Optional[float] = None
+    last_attempt_at: Optional[datetime] = None
+
+    @classmethod
+    def from_row(cls, row, **extra):
+        if row is None:
+            return cls(**extra)
+        return cls(
+            attempts=row.attempts,
+            questions=row.questions,
+            correct=row.correct,
+            accuracy=row.correct / row.questions if row.questions else None,
+            average_score=row.score_sum / row.attempts if row.attempts else None,
+            best_score=row.best_score,
+            last_score=row.last_score,
+            last_attempt_at=row.last_attempt_at,
+            **extra
+        )
+
+class TopicProgress(ProgressStats):
+    topic: str
+
+class DocumentProgress(ProgressStats):
+    document_id: int
+    title: Optional[str] = None
+
+class DailyProgress(ProgressStats):
+    day: date
+
+class Dashboard(BaseModel):
+    progress: ProgressStats
+    documents: List[Document]  # most recently uploaded first
+    document_count: int
+    recent_quizzes: List[QuizSummary]
+    recent_topics: List[TopicProgress]  # most recently practised first
+    weakest_topics: List[TopicProgress]  # lowest accuracy first
+    weakest_documents: List[DocumentProgress]
+    trend: List[DailyProgress]  # oldest day first, days with attempts only
@@ -1,5 +1,5 @@
-from typing import List, Optional
-from pydantic import BaseModel
+from typing import List, Literal, Optional
+from pydantic import BaseModel, field_validator, model_validator
 from datetime import datetime
 
 class Question(BaseModel):
@@ -7,11 +7,46 @@ class Question(BaseModel):
     text: str
     options: List[str]
     # correct_answer should be hidden in frontend response typically, but for simplicity sending it or handling it in backend
-    
+
+class QuizQuestion(BaseModel):
+    """One generated multiple choice question, as stored in ``Quiz.questions``."""
+    question: str
+    options: List[str]
+    correct_answer: str
+
+    @field_validator("question", "correct_answer")
+    @classmethod
+    def not_blank(cls, value: str) -> str:
+        value = value.strip()
+        if not value:
+            raise ValueError("must not be empty")
+        return value
+
+    @field_validator("options")
+    @classmethod
+    def four_distinct_options(cls, options: List[str]) -> List[str]:
+        options = [str(option).strip() for option in options]
+        if len(options) != 4 or any(not option for option in options):
+            raise ValueError("expected exactly 4 non-empty options")
+        if len({option.lower() for option in options}) != 4:
+            raise ValueError("options must be distinct")
+        return options
+
+    @model_validator(mode="after")
+    def answer_in_options(self):
+        if self.correct_answer not in self.options:
+            # Accept a case/whitespace variant of one option, stored as that option
+            matches = [option for option in self.options if option.lower() == self.correct_answer.lower()]
+            if not matches:
+                raise ValueError("correct_answer must be one of the options")
+            self.correct_answer = matches[0]
+        return self
+
 class QuizGenerateRequest(BaseModel):
     topic: str
     num_questions: int = 5
     document_id: Optional[int] = None  # Optional: Generate quiz from specific document
+    mode: Literal["topic", "coverage"] = "topic"  # "coverage" draws questions from every section of the document
 
 class QuizCreate(BaseModel):
     topic: str
@@ -21,11 +56,24 @@ class Quiz(BaseModel):
     id: int
     topic: str
     questions: List[dict]
+    coverage: Optional[float] = None
+    document_id: Optional[int] = None
     created_at: datetime
     
     class Config:
         from_attributes = True
 
+class QuizSummary(BaseModel):
+    """A quiz without its questions, for lists."""
+    id: int
+    topic: str
+    coverage: Optional[float] = None
+    document_id: Optional[int] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
 class QuizAttemptCreate(BaseModel):
     quiz_id: int
     score: float
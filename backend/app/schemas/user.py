@@ -5,7 +5,6 @@ from pydantic import BaseModel, EmailStr
 class UserBase(BaseModel):
     email: Optional[EmailStr] = None
     is_active: Optional[bool] = True
-    is_superuser: bool = False
     full_name: Optional[str] = None
 
 # Properties to receive via API on creation
@@ -17,8 +16,10 @@ class UserCreate(UserBase):
 class UserUpdate(UserBase):
     password: Optional[str] = None
 
+# Read-only: granted with `manage.py make-superuser`, never through the API
 class UserInDBBase(UserBase):
     id: Optional[int] = None
+    is_superuser: bool = False
 
     class Config:
         from_attributes = True
@@ -0,0 +1,174 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import func, select, update
+
+from app import models
+from app.core.config import settings
+from app.core.observability import register_stats
+from app.db.session import AsyncSessionLocal, SessionLocal
+
+
+class CachedAnswer(NamedTuple):
+    answer: str
+    sources: list
+    vector: np.ndarray  # unit-normalised query embedding
+    partition: Tuple[int, str]
+    document_ids: Set[int]
+    version: Optional[int]  # the owner's documents_version when the answer was built
+    created_at: float
+
+
+class SemanticAnswerCache:
+    """
+    Per-user answer cache matched on query embedding similarity.
+
+    Entries are partitioned by (user_id, collection). A lookup returns the closest
+    cached answer in the partition if its cosine distance to the new query is at most
+    ``max_distance`` and it is younger than ``ttl_seconds``. The cache holds at most
+    ``max_entries`` answers overall and evicts the least recently used.
+
+    Ingestion calls ``documents_changed`` whenever a user's document set changes, so
+    answers never outlive the material they were built from. That drops the user's
+    answers here and bumps ``User.documents_version``. Callers read the version before
+    retrieval (``version``/``aversion``) and pass it to ``lookup`` and ``store``, so
+    answers cached by other processes are dropped too.
+    """
+    def __init__(self, max_distance: float = None, ttl_seconds: float = None, max_entries: int = None):
+        self.max_distance = max_distance if max_distance is not None else settings.ANSWER_CACHE_MAX_DISTANCE
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else settings.ANSWER_CACHE_TTL_SECONDS
+        self.max_entries = max_entries or settings.ANSWER_CACHE_MAX_ENTRIES
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+        self._partitions: Dict[Tuple[int, str], List[int]] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalise(vector) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        ids = self._partitions.get(entry.partition)
+        if ids is not None:
+            ids.remove(entry_id)
+            if not ids:
+                del self._partitions[entry.partition]
+
+    def version(self, user_id: int) -> int:
+        """The user's ``documents_version``, for ``lookup`` and ``store``."""
+        with SessionLocal() as db:
+            return db.scalar(self._version_query(user_id)) or 0
+
+    async def aversion(self, user_id: int) -> int:
+        async with AsyncSessionLocal() as db:
+            return await db.scalar(self._version_query(user_id)) or 0
+
+    @staticmethod
+    def _version_query(user_id: int):
+        return select(models.User.documents_version).where(models.User.id == user_id)
+
+    def documents_changed(self, user_id: int):
+        """Drop the user's answers in every process: here directly, elsewhere through the version."""
+        self.invalidate_user(user_id)
+        with SessionLocal() as db:
+            db.execute(
+                update(models.User).where(models.User.id == user_id)
+                .values(documents_version=func.coalesce(models.User.documents_version, 0) + 1)
+            )
+            db.commit()
+
+    def lookup(self, user_id: int, collection_name: str, query_vector, version: int = None) -> Optional[Tuple[str, list]]:
+        """Return ``(answer, sources)`` for a close enough cached query, or None."""
+        vector = self._normalise(query_vector)
+        now = time.monotonic()
+        with self._lock:
+            ids = list(self._partitions.get((user_id, collection_name), []))
+            for entry_id in ids:
+                entry = self._entries[entry_id]
+                if version is not None and entry.version != version:
+                    self._remove(entry_id)
+                    self.invalidations += 1
+                elif now - entry.created_at > self.ttl_seconds:
+                    self._remove(entry_id)
+            ids = self._partitions.get((user_id, collection_name), [])
+            if not ids:
+                self.misses += 1
+                return None
+
+            matrix = np.stack([self._entries[entry_id].vector for entry_id in ids])
+            similarities = matrix @ vector
+            best = int(np.argmax(similarities))
+            if 1.0 - float(similarities[best]) > self.max_distance:
+                self.misses += 1
+                return None
+
+            entry_id = ids[best]
+            self._entries.move_to_end(entry_id)
+            self.hits += 1
+            entry = self._entries[entry_id]
+            return entry.answer, entry.sources
+
+    def store(self, user_id: int, collection_name: str, query_vector, answer: str, sources: list, document_ids: Iterable[int], version: int = None):
+        partition = (user_id, collection_name)
+        entry = CachedAnswer(
+            answer=answer,
+            sources=sources,
+            vector=self._normalise(query_vector),
+            partition=partition,
+            document_ids=set(document_ids),
+            version=version,
+            created_at=time.monotonic(),
+        )
+        with self._lock:
+            entry_id = next(self._ids)
+            self._entries[entry_id] = entry
+            self._partitions.setdefault(partition, []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int):
+        """Drop every answer for a user, e.g. after their document set changed."""
+        with self._lock:
+            for partition in [p for p in self._partitions if p[0] == user_id]:
+                for entry_id in list(self._partitions.get(partition, [])):
+                    self._remove(entry_id)
+                    self.invalidations += 1
+
+    def invalidate_document(self, document_id: int):
+        """Drop every answer that cited a document."""
+        with self._lock:
+            stale = [entry_id for entry_id, entry in self._entries.items() if document_id in entry.document_ids]
+            for entry_id in stale:
+                self._remove(entry_id)
+                self.invalidations += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+answer_cache = SemanticAnswerCache()
+register_stats("answer_cache", answer_cache.stats)
@@ -0,0 +1,284 @@
+import logging
+import re
+import threading
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from langchain_groq import ChatGroq
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+from app.core.config import settings
+from app.core.single_flight import coalesced
+from app.core.observability import register_stats, set_pipeline, stage
+from app.db.session import AsyncSessionLocal
+from app.services.context_builder import TokenCounter, get_token_counter
+
+logger = logging.getLogger(__name__)
+
+ROLE_LABELS = {"user": "Student", "assistant": "Assistant"}
+LABEL_TOKENS = 4  # "Assistant: " and the newline
+MAX_LOADED_MESSAGES = 50  # more never fit in CHAT_HISTORY_TOKENS
+TITLE_CHARS = 80
+WORD_RE = re.compile(r"\w+")
+
+CONDENSE_PROMPT = ChatPromptTemplate.from_template(
+    """Given the conversation below and a follow-up question, rewrite the follow-up as a
+    standalone question that can be understood without the conversation. Keep the
+    student's wording where possible. Return only the question.
+
+    Conversation:
+    {history}
+
+    Follow-up question: {question}
+
+    Standalone question:"""
+)
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_template(
+    """Update the summary of a study conversation with the new messages below. Keep the
+    topics, facts and definitions discussed and any open questions, in at most {max_words} words.
+
+    Current summary:
+    {summary}
+
+    New messages:
+    {messages}
+
+    Updated summary:"""
+)
+
+
+class Turn(NamedTuple):
+    question: str
+    query: str  # standalone query used for retrieval
+    history: str  # summary and recent messages, as prompt text
+    docs: Optional[List[Document]]  # None on a first turn, see ChatMemory.aprepare
+    reused: bool  # docs are the previous turn's retrieval
+    retrieved_at: datetime
+
+
+def query_similarity(a: str, b: str) -> float:
+    """Jaccard overlap of the two queries' words."""
+    words_a, words_b = set(WORD_RE.findall(a.lower())), set(WORD_RE.findall(b.lower()))
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / len(words_a | words_b)
+
+
+def _chunk(doc: Document) -> dict:
+    metadata = {key: value for key, value in doc.metadata.items() if value is None or isinstance(value, (str, int, float, bool))}
+    return {"page_content": doc.page_content, "metadata": metadata}
+
+
+class ChatMemory:
+    """
+    Keeps a chat session's prompts bounded however long the conversation runs.
+
+    - History is the rolling summary plus the newest unsummarized messages, up to
+      ``CHAT_HISTORY_TOKENS``.
+    - A follow-up is condensed with that history into a standalone query before
+      retrieval, so "explain the second point" searches for the point itself.
+    - If the condensed query is nearly the same as the last one (``CHAT_REUSE_SIMILARITY``)
+      and none of the user's documents changed since, the last retrieval is reused.
+    - Once the unsummarized messages outgrow ``CHAT_HISTORY_TOKENS``, the oldest are
+      folded into the summary (at most ``CHAT_SUMMARY_TOKENS``) until the rest fit in half of it.
+    """
+    def __init__(self, llm: BaseChatModel = None, counter: TokenCounter = None):
+        self.counter = counter or get_token_counter()
+        self.llm = llm or ChatGroq(
+            temperature=0,
+            groq_api_key=settings.GROQ_API_KEY,
+            base_url=settings.GROQ_BASE_URL or None,
+            model_name="openai/gpt-oss-120b"
+        )
+        self.condense_chain = CONDENSE_PROMPT | coalesced(self.llm) | StrOutputParser()
+        self.summary_chain = SUMMARY_PROMPT | coalesced(self.llm) | StrOutputParser()
+        self._summarizing: Set[int] = set()
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.condensed = 0
+        self.reused = 0
+        self.summaries = 0
+
+    def _unsummarized(self, chat_session: models.ChatSession):
+        query = select(models.ChatMessage).where(models.ChatMessage.session_id == chat_session.id)
+        if chat_session.summarized_through is not None:
+            query = query.where(models.ChatMessage.id > chat_session.summarized_through)
+        return query
+
+    def render_history(self, summary: Optional[str], messages: List[models.ChatMessage]) -> str:
+        """The summary and as many of the newest ``messages`` (oldest first) as fit in ``CHAT_HISTORY_TOKENS``."""
+        budget = settings.CHAT_HISTORY_TOKENS
+        lines: List[str] = []
+        for message in reversed(messages):
+            line = f"{ROLE_LABELS.get(message.role, message.role)}: {message.content}"
+            cost = (message.tokens or self.counter.count(message.content)) + LABEL_TOKENS
+            if cost > budget:
+                if not lines:
+                    # The latest message alone is over budget: quote its beginning
+                    lines.append(self.counter.truncate(line, budget))
+                break
+            lines.append(line)
+            budget -= cost
+        lines.reverse()
+        if summary:
+            lines.insert(0, f"Summary of the earlier conversation: {summary}")
+        return "\n".join(lines)
+
+    async def _fresh_chunks(self, db: AsyncSession, chat_session: models.ChatSession) -> Optional[List[Document]]:
+        """The last retrieval, unless a document it came from, or any of the owner's, changed since."""
+        if not chat_session.last_chunks or not chat_session.last_query or chat_session.last_retrieved_at is None:
+            return None
+        document_ids = {chunk["metadata"].get("document_id") for chunk in chat_session.last_chunks} - {None}
+        present = await db.scalar(
+            select(func.count()).select_from(models.Document).where(models.Document.id.in_(document_ids))
+        ) if document_ids else 0
+        changed = await db.scalar(
+            select(func.count()).select_from(models.Document).where(
+                models.Document.owner_id == chat_session.owner_id,
+                models.Document.processing_finished_at > chat_session.last_retrieved_at
+            )
+        )
+        if present < len(document_ids) or changed:
+            return None
+        return [Document(page_content=chunk["page_content"], metadata=chunk["metadata"]) for chunk in chat_session.last_chunks]
+
+    async def acondense(self, history: str, question: str) -> str:
+        if not history:
+            return question
+        try:
+            with stage("condense"):
+                query = (await self.condense_chain.ainvoke({"history": history, "question": question})).strip()
+        except Exception as e:
+            logger.warning("Could not condense follow-up question, retrieving with it as asked: %s", e)
+            return question
+        self.condensed += 1
+        return query or question
+
+    async def aprepare(self, db: AsyncSession, chat_session: models.ChatSession, question: str, rag_service, collection_name: str) -> Turn:
+        """
+        History, standalone query and retrieved chunks for the next turn of ``chat_session``.
+
+        A first turn has no history to condense with, so nothing is retrieved (``docs``
+        is None): it is answered as a standalone question (``RAGService.aask_question``),
+        which keeps the answer cache and the keyword-only retrieval.
+        """
+        messages = list(reversed((await db.scalars(
+            self._unsummarized(chat_session).order_by(models.ChatMessage.id.desc()).limit(MAX_LOADED_MESSAGES)
+        )).all()))
+        last_chunks = await self._fresh_chunks(db, chat_session)
+        # Hand the connection back before the LLM calls
+        await db.commit()
+
+        history = self.render_history(chat_session.summary, messages)
+        query = await self.acondense(history, question)
+        self.turns += 1
+        retrieved_at = datetime.utcnow()
+        if not history:
+            return Turn(question, query, history, None, False, retrieved_at)
+        if last_chunks is not None and query_similarity(query, chat_session.last_query) >= settings.CHAT_REUSE_SIMILARITY:
+            logger.debug("Reusing the previous retrieval for %r", query)
+            self.reused += 1
+            return Turn(question, query, history, last_chunks, True, chat_session.last_retrieved_at)
+        docs = await rag_service.aretrieve(query, chat_session.owner_id, collection_name)
+        return Turn(question, query, history, docs, False, retrieved_at)
+
+    async def arecord(self, session_id: int, turn: Turn, answer: str, sources: list):
+        """Store the turn's messages, and its retrieval for the next turn to reuse."""
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            chat_session = await db.get(models.ChatSession, session_id)
+            if chat_session is None:
+                return  # deleted mid-answer
+            db.add_all([
+                models.ChatMessage(
+                    session_id=session_id, role="user", content=turn.question,
+                    tokens=self.counter.count(turn.question), query=turn.query
+                ),
+                models.ChatMessage(
+                    session_id=session_id, role="assistant", content=answer,
+                    tokens=self.counter.count(answer), sources=[source.model_dump() for source in sources]
+                ),
+            ])
+            chat_session.updated_at = now
+            if not chat_session.title:
+                chat_session.title = turn.question[:TITLE_CHARS]
+            if turn.docs is not None and not turn.reused:
+                chat_session.last_query = turn.query
+                chat_session.last_chunks = [_chunk(doc) for doc in turn.docs]
+                chat_session.last_retrieved_at = turn.retrieved_at
+            await db.commit()
+
+    async def asummarize(self, session_id: int):
+        """Fold the oldest unsummarized messages into the summary once they outgrow ``CHAT_HISTORY_TOKENS``."""
+        with self._lock:
+            if session_id in self._summarizing:
+                return
+            self._summarizing.add(session_id)
+        set_pipeline("chat_summary")
+        try:
+            async with AsyncSessionLocal() as db:
+                chat_session = await db.get(models.ChatSession, session_id)
+                if chat_session is None:
+                    return
+                messages = (await db.scalars(self._unsummarized(chat_session).order_by(models.ChatMessage.id))).all()
+                await db.commit()
+
+                remaining = sum(message.tokens or 0 for message in messages)
+                if remaining <= settings.CHAT_HISTORY_TOKENS:
+                    return
+                folded = []
+                # Always keep the latest exchange verbatim
+                for message in messages[:-2]:
+                    if remaining <= settings.CHAT_HISTORY_TOKENS // 2:
+                        break
+                    folded.append(message)
+                    remaining -= message.tokens or 0
+                if not folded:
+                    return
+
+                transcript = self.counter.truncate(
+                    "\n".join(f"{ROLE_LABELS.get(m.role, m.role)}: {m.content}" for m in folded),
+                    settings.CHAT_HISTORY_TOKENS * 4
+                )
+                with stage("summarize"):
+                    summary = await self.summary_chain.ainvoke({
+                        "summary": chat_session.summary or "(none)",
+                        "messages": transcript,
+                        "max_words": settings.CHAT_SUMMARY_TOKENS * 3 // 4,
+                    })
+                chat_session.summary = self.counter.truncate(summary.strip(), settings.CHAT_SUMMARY_TOKENS)
+                chat_session.summarized_through = folded[-1].id
+                await db.commit()
+                self.summaries += 1
+                logger.debug("Session %d: folded %d messages into the summary", session_id, len(folded))
+        except Exception:
+            logger.exception("Could not summarize chat session %d", session_id)
+        finally:
+            with self._lock:
+                self._summarizing.discard(session_id)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "turns": self.turns,
+            "condensed": self.condensed,
+            "reused": self.reused,
+            "reuse_rate": self.reused / self.turns if self.turns else 0.0,
+            "summaries": self.summaries,
+        }
+
+
+@lru_cache()
+def get_chat_memory() -> ChatMemory:
+    return ChatMemory()
+
+
+# Through the getter: the startup warm-up and a first request can build it concurrently
+register_stats("chat_memory", lambda: get_chat_memory().stats())
@@ -0,0 +1,186 @@
+import logging
+import math
+import re
+from functools import lru_cache
+from typing import List, NamedTuple, Set
+
+from langchain_core.documents import Document
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SEPARATOR = "\n\n"
+MIN_OVERLAP_CHARS = 20  # shorter shared runs are coincidence, not splitter overlap
+MIN_PASSAGE_CHARS = 40  # what's left of a passage after trimming must still say something
+MIN_PARTIAL_TOKENS = 48  # don't end the context on a stub of the last passage
+SHINGLE_WORDS = 3
+WORD_RE = re.compile(r"\w+")
+
+
+class TokenCounter:
+    """
+    Counts and truncates text in the LLM's tokens with tiktoken.
+
+    tiktoken downloads its encoding on first use. Where that isn't possible
+    (offline hosts, no cache in ``TIKTOKEN_CACHE_DIR``), it falls back to an estimate
+    of four characters per token, so budgets still hold roughly.
+    """
+    def __init__(self, encoding_name: str = None):
+        self.encoding_name = encoding_name or settings.CONTEXT_TOKEN_ENCODING
+        self.encoding = None
+        try:
+            import tiktoken
+            self.encoding = tiktoken.get_encoding(self.encoding_name)
+        except Exception as e:
+            logger.warning("tiktoken encoding %s unavailable, estimating tokens from length: %s", self.encoding_name, e)
+
+    @property
+    def exact(self) -> bool:
+        return self.encoding is not None
+
+    def count(self, text: str) -> int:
+        if self.encoding is None:
+            return math.ceil(len(text) / 4)
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """The longest prefix of ``text`` within ``max_tokens``, cut back to a word boundary."""
+        if max_tokens <= 0:
+            return ""
+        if self.encoding is None:
+            prefix = text[:max_tokens * 4]
+        else:
+            tokens = self.encoding.encode(text, disallowed_special=())
+            if len(tokens) <= max_tokens:
+                return text
+            prefix = self.encoding.decode(tokens[:max_tokens])
+        if len(prefix) < len(text):
+            cut = prefix.rfind(" ")
+            prefix = prefix[:cut] if cut > 0 else prefix
+        return prefix.rstrip()
+
+
+class PackedContext(NamedTuple):
+    text: str
+    docs: List[Document]  # the passages that made it in, in context order
+    tokens: int
+    candidates: int
+    duplicates: int  # near-duplicate passages dropped
+    overlap_chars: int  # characters trimmed as overlap with another passage
+    over_budget: int  # passages dropped or cut short by the token budget
+
+
+def _overlap(head: str, tail: str, max_chars: int) -> int:
+    """Length of the longest suffix of ``head`` that is a prefix of ``tail`` (0 if shorter than MIN_OVERLAP_CHARS)."""
+    limit = min(len(head), len(tail), max_chars)
+    if limit < MIN_OVERLAP_CHARS:
+        return 0
+    probe = tail[:MIN_OVERLAP_CHARS]
+    start = head.find(probe, len(head) - limit)
+    while start != -1:
+        length = len(head) - start
+        if tail.startswith(head[start:]):
+            return length
+        start = head.find(probe, start + 1)
+    return 0
+
+
+def _shingles(text: str) -> Set[str]:
+    words = WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+class ContextBuilder:
+    """
+    Packs retrieved chunks into a prompt context that fits a token budget.
+
+    1. Passages are ordered by retrieval score (``metadata['score']``), best first.
+       Passages without scores, like a document's sections, keep their order.
+    2. Text a passage shares with one already taken is trimmed. This is the
+       splitter's ``chunk_overlap`` between neighbouring chunks.
+    3. A passage is dropped when at least ``near_duplicate`` of its word trigrams
+       are already in the context (repeated headers, copied paragraphs, re-uploads).
+    4. Passages are added until ``max_tokens`` is reached. The first one that
+       doesn't fit is cut short if enough budget is left for it to be useful.
+    """
+    def __init__(self, counter: TokenCounter = None, near_duplicate: float = None, max_overlap_chars: int = None):
+        self.counter = counter or get_token_counter()
+        self.near_duplicate = near_duplicate if near_duplicate is not None else settings.CONTEXT_NEAR_DUPLICATE
+        self.max_overlap_chars = max_overlap_chars or settings.CONTEXT_MAX_OVERLAP_CHARS
+
+    def _ordered(self, docs: List[Document]) -> List[Document]:
+        if any("score" in doc.metadata for doc in docs):
+            return sorted(docs, key=lambda doc: doc.metadata.get("score", 0.0), reverse=True)
+        return list(docs)
+
+    def _trim(self, text: str, kept: List[str]) -> str:
+        for other in kept:
+            # Overlap on either side: the previous chunk may have been taken first or last
+            head = _overlap(other, text, self.max_overlap_chars)
+            if head:
+                text = text[head:].lstrip()
+            tail = _overlap(text, other, self.max_overlap_chars)
+            if tail:
+                text = text[:-tail].rstrip()
+        return text
+
+    def build(self, docs: List[Document], max_tokens: int) -> PackedContext:
+        passages: List[str] = []
+        kept_docs: List[Document] = []
+        seen: Set[str] = set()
+        tokens = duplicates = overlap_chars = over_budget = 0
+        separator_tokens = self.counter.count(SEPARATOR)
+
+        for doc in self._ordered(docs):
+            text = doc.page_content.strip()
+            trimmed = self._trim(text, passages)
+            overlap_chars += len(text) - len(trimmed)
+            shingles = _shingles(trimmed)
+            if len(trimmed) < MIN_PASSAGE_CHARS or not shingles or len(shingles & seen) / len(shingles) >= self.near_duplicate:
+                duplicates += 1
+                continue
+
+            cost = self.counter.count(trimmed) + (separator_tokens if passages else 0)
+            if tokens + cost > max_tokens:
+                over_budget += 1
+                remaining = max_tokens - tokens - (separator_tokens if passages else 0)
+                if remaining < MIN_PARTIAL_TOKENS:
+                    continue
+                trimmed = self.counter.truncate(trimmed, remaining)
+                cost = self.counter.count(trimmed) + (separator_tokens if passages else 0)
+                if not trimmed or tokens + cost > max_tokens:
+                    continue
+                shingles = _shingles(trimmed)
+
+            passages.append(trimmed)
+            kept_docs.append(doc)
+            seen |= shingles
+            tokens += cost
+
+        packed = PackedContext(
+            text=SEPARATOR.join(passages),
+            docs=kept_docs,
+            tokens=tokens,
+            candidates=len(docs),
+            duplicates=duplicates,
+            overlap_chars=overlap_chars,
+            over_budget=over_budget,
+        )
+        logger.debug(
+            "Context: %d/%d passages, %d tokens (budget %d); %d near-duplicates, %d overlap chars trimmed, %d over budget",
+            len(kept_docs), len(docs), tokens, max_tokens, duplicates, overlap_chars, over_budget
+        )
+        return packed
+
+
+@lru_cache()
+def get_token_counter() -> TokenCounter:
+    return TokenCounter()
+
+
+@lru_cache()
+def get_context_builder() -> ContextBuilder:
+    return ContextBuilder()
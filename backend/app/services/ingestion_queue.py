@@ -0,0 +1,299 @@
+import logging
+import queue
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import or_
+
+from app import models
+from app.core.config import settings
+from app.core.observability import get_request_id, request_id_var, set_pipeline
+from app.db.session import SessionLocal
+from app.models.document import STATUS_FAILED, STATUS_PENDING, STATUS_PROCESSING, STATUS_READY
+
+logger = logging.getLogger(__name__)
+
+
+class IngestionQueue:
+    """
+    In-process job queue that ingests uploaded documents on a pool of worker threads.
+
+    The queue itself only holds document ids; the job state lives on ``models.Document``
+    so that ``resume()`` can re-enqueue anything left pending or processing when the
+    process stopped. A document enqueued while it is being processed is run again
+    once the current run finishes.
+
+    Every server process has its own queue, and all of them resume at startup, so a
+    worker first claims the job with one conditional UPDATE. The claim succeeds if the
+    job is waiting and nobody holds it, or if its holder stopped heartbeating for
+    ``INGESTION_LEASE_SECONDS``, e.g. because that process died. A heartbeat thread
+    keeps the claims of running jobs fresh.
+
+    A job logs under the id of the request that enqueued it, or ``ingest-<id>`` when
+    it was resumed at startup.
+
+    Quiz bank builds wait on a queue of their own, worked by a single thread with its
+    own database session, so their LLM calls never hold up the next upload.
+    """
+    def __init__(self, num_workers: int = None):
+        self.num_workers = num_workers or settings.INGESTION_WORKERS
+        self._queue: "queue.Queue[Optional[int]]" = queue.Queue()
+        self._workers: List[threading.Thread] = []
+        self._queued = set()
+        self._running = set()
+        self._rerun = set()
+        self._request_ids: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._bank_queue: "queue.Queue[Optional[int]]" = queue.Queue()
+        self._bank_worker: Optional[threading.Thread] = None
+        self._bank_jobs: Dict[int, Tuple[bool, str]] = {}  # queued builds: chunks changed, request id
+        self._heartbeat: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        if self._workers:
+            return
+        for i in range(self.num_workers):
+            worker = threading.Thread(target=self._run, name=f"ingestion-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        self._bank_worker = threading.Thread(target=self._run_bank, name="quiz-bank-worker", daemon=True)
+        self._bank_worker.start()
+        self._stopping.clear()
+        self._heartbeat = threading.Thread(target=self._run_heartbeat, name="ingestion-heartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def stop(self, timeout: float = 5.0):
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout=timeout)
+        self._workers = []
+        if self._bank_worker is not None:
+            self._bank_queue.put(None)
+            self._bank_worker.join(timeout=timeout)
+            self._bank_worker = None
+        if self._heartbeat is not None:
+            self._stopping.set()
+            self._heartbeat.join(timeout=timeout)
+            self._heartbeat = None
+
+    def enqueue(self, document_id: int):
+        with self._lock:
+            request_id = get_request_id()
+            if request_id != "-":
+                self._request_ids[document_id] = request_id
+            if document_id in self._running:
+                # Picked up again once the current run finishes, e.g. after a re-upload
+                self._rerun.add(document_id)
+                return
+            if document_id in self._queued:
+                return
+            self._queued.add(document_id)
+        self._queue.put(document_id)
+
+    def resume(self) -> int:
+        """Re-enqueue documents whose ingestion never finished."""
+        db = SessionLocal()
+        try:
+            unfinished = (
+                db.query(models.Document.id)
+                .filter(models.Document.status.in_([STATUS_PENDING, STATUS_PROCESSING]))
+                .order_by(models.Document.id)
+                .all()
+            )
+        finally:
+            db.close()
+        for (document_id,) in unfinished:
+            self.enqueue(document_id)
+        if unfinished:
+            logger.info("Resumed %d unfinished ingestion jobs", len(unfinished))
+        return len(unfinished)
+
+    def pending_count(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self):
+        while True:
+            document_id = self._queue.get()
+            if document_id is None:
+                break
+            with self._lock:
+                self._queued.discard(document_id)
+                self._running.add(document_id)
+                request_id = self._request_ids.pop(document_id, None) or f"ingest-{document_id}"
+            token = request_id_var.set(request_id)
+            set_pipeline("ingest")
+            try:
+                self._process(document_id)
+            except Exception:
+                logger.exception("Ingestion worker crashed on document %s", document_id)
+            finally:
+                request_id_var.reset(token)
+                with self._lock:
+                    self._running.discard(document_id)
+                    rerun = document_id in self._rerun
+                    self._rerun.discard(document_id)
+                if rerun:
+                    self.enqueue(document_id)
+
+    def _run_heartbeat(self):
+        while not self._stopping.wait(settings.INGESTION_LEASE_SECONDS / 3):
+            with self._lock:
+                running = list(self._running)
+            if not running:
+                continue
+            db = SessionLocal()
+            try:
+                db.query(models.Document).filter(models.Document.id.in_(running)).update(
+                    {models.Document.heartbeat_at: datetime.utcnow()}, synchronize_session=False
+                )
+                db.commit()
+            except Exception:
+                db.rollback()
+                logger.exception("Could not refresh the ingestion heartbeat")
+            finally:
+                db.close()
+
+    def _claim(self, db, document_id: int) -> bool:
+        """Take the job in one UPDATE, unless it isn't waiting or another live worker holds it."""
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=settings.INGESTION_LEASE_SECONDS)
+        claimed = db.query(models.Document).filter(
+            models.Document.id == document_id,
+            models.Document.status.in_([STATUS_PENDING, STATUS_PROCESSING]),
+            or_(models.Document.heartbeat_at.is_(None), models.Document.heartbeat_at < stale),
+        ).update({
+            models.Document.status: STATUS_PROCESSING,
+            models.Document.error: None,
+            models.Document.processing_started_at: now,
+            models.Document.processing_finished_at: None,
+            models.Document.heartbeat_at: now,
+        }, synchronize_session=False)
+        db.commit()
+        return claimed == 1
+
+    def _process(self, document_id: int):
+        # Imported here to keep the worker module free of the LangChain import tree
+        from app.services.ingestion_service import get_ingestion_service
+        ingestion_service = get_ingestion_service()
+
+        db = SessionLocal()
+        try:
+            if not self._claim(db, document_id):
+                # Deleted, already done, or running in another process, which
+                # picks up any change made meanwhile when it finishes
+                logger.debug("Document %s is not ours to ingest", document_id)
+                return
+            document = db.query(models.Document).filter(models.Document.id == document_id).first()
+            if not document:
+                return
+
+            start = time.perf_counter()
+            try:
+                # Diffing against stored chunks makes re-uploads cheap and lets an
+                # interrupted run pick up the batches it already stored
+                stats = ingestion_service.update_document(
+                    document.file_path,
+                    document_id=document.id,
+                    user_id=document.owner_id,
+                    collection_name="user_docs"
+                )
+            except Exception as e:
+                logger.error("Ingestion failed for document %s: %s", document_id, e)
+                document.status = STATUS_FAILED
+                document.error = str(e)[:1000]
+            else:
+                document.status = STATUS_READY
+                document.chunk_count = stats["total"]
+                document.chunks_embedded = stats["embedded"]
+                document.chunks_reused = stats["reused"]
+                document.chunks_removed = stats["removed"]
+
+            current = db.query(models.Document.status).filter(models.Document.id == document_id).first()
+            if current is None:
+                # Deleted while we were ingesting: don't leave orphaned vectors behind
+                ingestion_service.delete_document_chunks(
+                    document_id=document_id,
+                    collection_name="user_docs",
+                    user_id=document.owner_id
+                )
+                db.rollback()
+                return
+            if current.status == STATUS_PENDING:
+                # Replaced while we were ingesting (possibly through another process,
+                # whose claim failed): release the job and run it again
+                db.rollback()
+                db.query(models.Document).filter(models.Document.id == document_id).update(
+                    {models.Document.heartbeat_at: None}, synchronize_session=False
+                )
+                db.commit()
+                self.enqueue(document_id)
+                return
+            document.processing_finished_at = datetime.utcnow()
+            document.heartbeat_at = None
+            db.commit()
+            logger.info("Document %s %s in %.2fs", document_id, document.status, time.perf_counter() - start)
+
+            if document.status == STATUS_READY:
+                self._enqueue_bank(document_id, bool(stats["embedded"] or stats["removed"]))
+        finally:
+            db.close()
+
+    def _enqueue_bank(self, document_id: int, changed: bool):
+        """Post-ingestion stage: queue a refresh of the document's quiz bank."""
+        with self._lock:
+            queued = self._bank_jobs.get(document_id)
+            # A build still waiting covers this run too, as long as it knows the chunks changed
+            self._bank_jobs[document_id] = (changed or (queued is not None and queued[0]), get_request_id())
+        if queued is None:
+            self._bank_queue.put(document_id)
+
+    def _run_bank(self):
+        while True:
+            document_id = self._bank_queue.get()
+            if document_id is None:
+                break
+            with self._lock:
+                changed, request_id = self._bank_jobs.pop(document_id)
+            token = request_id_var.set(request_id if request_id != "-" else f"ingest-{document_id}")
+            try:
+                self._refresh_quiz_bank(document_id, changed)
+            except Exception:
+                logger.exception("Quiz bank worker crashed on document %s", document_id)
+            finally:
+                request_id_var.reset(token)
+
+    def _refresh_quiz_bank(self, document_id: int, changed: bool):
+        """Rebuild the document's quiz bank when its chunks changed, or drop it if banks are off."""
+        from app.services.quiz_bank import get_quiz_bank
+        quiz_bank = get_quiz_bank()
+
+        db = SessionLocal()
+        try:
+            document = db.query(models.Document).filter(models.Document.id == document_id).first()
+            if document is None or document.status != STATUS_READY:
+                return  # deleted, or being ingested again: that run queues its own build
+            has_bank = db.query(models.QuizBankQuestion.id).filter(
+                models.QuizBankQuestion.document_id == document_id
+            ).first() is not None
+            owner_id = document.owner_id
+            # Hand the connection back before the LLM calls
+            db.commit()
+            if has_bank and not changed:
+                return
+            if settings.QUIZ_BANK_ENABLED:
+                quiz_bank.build(db, document_id, owner_id, collection_name="user_docs")
+            elif has_bank:
+                quiz_bank.drop(db, document_id)
+                db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Quiz bank generation failed for document %s", document_id)
+        finally:
+            db.close()
+
+
+ingestion_queue = IngestionQueue()
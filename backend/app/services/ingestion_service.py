@@ -1,66 +1,326 @@
+import hashlib
+import logging
+import multiprocessing
 import os
-from typing import List
-from langchain_community.document_loaders import PyPDFLoader, TextLoader
+import queue
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import islice
+from typing import Iterable, Iterator, List
+from langchain_community.document_loaders import TextLoader
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from app.core.gemini_embeddings import GoogleGenAIEmbeddings
-from langchain_community.vectorstores import Chroma
+from app.core.embeddings import get_embeddings
 from app.core.config import settings
+from app.core.observability import StageTimer, bind_context
+from app.db.vector_store import VectorStore, vector_store as default_vector_store
+from app.services import pdf_extract
+from app.services.answer_cache import answer_cache
+from app.services.keyword_index import keyword_index
 from dotenv import load_dotenv
 load_dotenv()
 
-import chromadb
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-class IngestionService:
-    def __init__(self):
-        self.embeddings = GoogleGenAIEmbeddings(model="models/text-embedding-004")
-        self.client = chromadb.PersistentClient(path="./chroma_db")
 
-    def process_document(self, file_path: str, document_id: int, user_id: int, collection_name: str = "documents"):
-        # 1. Load Document
-        if file_path.endswith(".pdf"):
-            loader = PyPDFLoader(file_path)
-        else:
-            loader = TextLoader(file_path)
-        
-        documents = loader.load()
+logger = logging.getLogger(__name__)
+
+
+class _ProducerError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _prefetch(iterable: Iterable, maxsize: int) -> Iterator:
+    """
+    Run ``iterable`` on a background thread, buffering at most ``maxsize`` items.
+
+    Lets parsing and splitting carry on while the caller embeds and upserts.
+    """
+    buffer: "queue.Queue" = queue.Queue(maxsize=maxsize)
+    done = object()
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
 
-        # 2. Split Text
-        text_splitter = RecursiveCharacterTextSplitter(
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(_ProducerError(e))
+        finally:
+            put(done)
+
+    producer = threading.Thread(target=bind_context(produce), name="ingestion-prefetch", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                break
+            if isinstance(item, _ProducerError):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        producer.join(timeout=5)
+
+
+def _batched(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class IngestionService:
+    def __init__(self, vector_store: VectorStore = None):
+        self.embeddings = get_embeddings()
+        self.vector_store = vector_store or default_vector_store
+        self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=1000,
             chunk_overlap=200,
             separators=["\n\n", "\n", " ", ""]
         )
-        chunks = text_splitter.split_documents(documents)
+        self._pdf_pool = None
+        self._pdf_pool_lock = threading.Lock()
+
+    def _get_pdf_pool(self) -> ProcessPoolExecutor:
+        with self._pdf_pool_lock:
+            if self._pdf_pool is None:
+                # spawn: forking a process that runs worker threads is unsafe
+                self._pdf_pool = ProcessPoolExecutor(
+                    max_workers=settings.PDF_PARSE_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pdf_pool
 
-        # Add metadata
-        for chunk in chunks:
-            chunk.metadata["document_id"] = document_id
-            chunk.metadata["user_id"] = user_id
+    def iter_pdf_pages(self, file_path: str) -> Iterator[Document]:
+        """Yield PDF pages in order, parsing page ranges across the process pool."""
+        total = pdf_extract.page_count(file_path)
+        step = settings.PDF_PAGES_PER_TASK
+        ranges = [(start, min(start + step, total)) for start in range(0, total, step)]
+
+        if settings.PDF_PARSE_WORKERS <= 0:
+            results = (pdf_extract.extract_page_range(file_path, start, stop) for start, stop in ranges)
+        else:
+            results = self._iter_parallel_ranges(file_path, ranges)
 
-        # 3. Store in Chroma
-        print(f"DEBUG: Ingesting {len(chunks)} chunks for document {document_id} into collection '{collection_name}'...")
+        for pages in results:
+            for page_number, text in pages:
+                yield Document(page_content=text, metadata={"source": file_path, "page": page_number})
+
+    def _iter_parallel_ranges(self, file_path: str, ranges):
+        # Keep only a bounded number of page ranges in flight so memory stays flat
+        pool = self._get_pdf_pool()
+        window = settings.PDF_PARSE_WORKERS * 2
+        pending = []
+        for start, stop in ranges:
+            pending.append(pool.submit(pdf_extract.extract_page_range, file_path, start, stop))
+            if len(pending) >= window:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+    def iter_pages(self, file_path: str) -> Iterator[Document]:
+        if file_path.endswith(".pdf"):
+            return self.iter_pdf_pages(file_path)
+        return TextLoader(file_path).lazy_load()
+
+    def iter_chunks(self, file_path: str, document_id: int, user_id: int, timer: StageTimer = None) -> Iterator[Document]:
+        """Split pages into chunks as they are loaded, adding the time spent to ``timer``'s load and split stages."""
+        timer = timer or StageTimer("ingest")
+        chunk_index = 0
+        pages = iter(self.iter_pages(file_path))
+        while True:
+            with timer.stage("load"):
+                page = next(pages, None)
+            if page is None:
+                return
+            with timer.stage("split"):
+                chunks = self.text_splitter.split_documents([page])
+            for chunk in chunks:
+                chunk.metadata["document_id"] = document_id
+                chunk.metadata["user_id"] = user_id
+                chunk.metadata["chunk_index"] = chunk_index
+                chunk.metadata["chunk_hash"] = hashlib.sha256(chunk.page_content.encode("utf-8")).hexdigest()
+                chunk_index += 1
+                yield chunk
+
+    def process_document(self, file_path: str, document_id: int, user_id: int, collection_name: str = "documents"):
+        """Ingest a document and return its chunk count."""
+        return self.update_document(file_path, document_id, user_id, collection_name)["total"]
+
+    def update_document(self, file_path: str, document_id: int, user_id: int, collection_name: str = "documents"):
+        """
+        Load, split, embed and store a document as a streaming pipeline, diffing
+        against the chunks already stored for ``document_id``.
+
+        Chunk ids are derived from a hash of the chunk text, so chunks that are already
+        stored keep their vectors (only their position metadata is refreshed), new chunks
+        are embedded, and chunks that no longer appear are deleted. For a fresh document
+        everything is new; for an interrupted run the finished batches are reused.
+
+        Pages are parsed and split on a background thread while earlier chunks are
+        embedded and written to Chroma in batches of ``INGEST_BATCH_SIZE``. The time spent
+        loading, splitting, embedding and upserting is recorded once per document.
+        """
+        batch_size = settings.INGEST_BATCH_SIZE
+        partition = self.vector_store.partition_name(collection_name, user_id)
+        col = self.vector_store.collection(partition)
+        existing_ids = set(col.get(where={"document_id": document_id}, include=[])["ids"])
+
+        logger.info("Ingesting document %s into collection '%s' (%d chunks stored)", document_id, collection_name, len(existing_ids))
+        seen_ids = set()
+        stats = {"total": 0, "embedded": 0, "reused": 0, "removed": 0}
+        timer = StageTimer("ingest")
         try:
-            vectordb = Chroma.from_documents(
-                documents=chunks,
-                embedding=self.embeddings,
-                client=self.client,
-                collection_name=collection_name
+            chunks = _prefetch(self.iter_chunks(file_path, document_id, user_id, timer), maxsize=batch_size * 2)
+            for batch in _batched(chunks, batch_size):
+                new_chunks, new_ids = [], []
+                reused_ids, reused_metadatas = [], []
+                reused_texts = {}
+                for chunk in batch:
+                    chunk_id = f"{document_id}:{chunk.metadata['chunk_hash']}"
+                    if chunk_id in seen_ids:
+                        continue  # identical text elsewhere in the document
+                    seen_ids.add(chunk_id)
+                    if chunk_id in existing_ids:
+                        reused_ids.append(chunk_id)
+                        reused_metadatas.append(chunk.metadata)
+                        reused_texts[chunk_id] = chunk.page_content
+                    else:
+                        new_ids.append(chunk_id)
+                        new_chunks.append(chunk)
+                new_texts = [chunk.page_content for chunk in new_chunks]
+                if new_chunks:
+                    # Embedded here rather than through the LangChain wrapper so the
+                    # embedding and the Chroma write are timed separately
+                    with timer.stage("embed"):
+                        vectors = self.embeddings.embed_documents(new_texts)
+                    with timer.stage("upsert"):
+                        col.upsert(
+                            ids=new_ids,
+                            embeddings=vectors,
+                            documents=new_texts,
+                            metadatas=[chunk.metadata for chunk in new_chunks]
+                        )
+                with timer.stage("upsert"):
+                    if reused_ids:
+                        col.update(ids=reused_ids, metadatas=reused_metadatas)
+
+                    # Keep the BM25 index in step; reused chunks are only re-indexed if an
+                    # interrupted run stored their vectors without indexing them
+                    index_ids = new_ids + keyword_index.missing(user_id, reused_ids)
+                    index_texts = new_texts + [reused_texts[chunk_id] for chunk_id in index_ids[len(new_ids):]]
+                    keyword_index.add_chunks(user_id, index_ids, [document_id] * len(index_ids), index_texts)
+                stats["embedded"] += len(new_ids)
+                stats["reused"] += len(reused_ids)
+
+            removed_ids = list(existing_ids - seen_ids)
+            with timer.stage("upsert"):
+                for batch in _batched(removed_ids, batch_size):
+                    col.delete(ids=batch)
+                keyword_index.remove_chunks(user_id, removed_ids)
+            stats["removed"] = len(removed_ids)
+            stats["total"] = len(seen_ids)
+            # The user's material changed, so cached answers may be stale
+            answer_cache.documents_changed(user_id)
+            timings = timer.record()
+            logger.info(
+                "Document %s: %s; %s", document_id, stats,
+                ", ".join(f"{name} {seconds:.2f}s" for name, seconds in timings.items())
+            )
+        except Exception:
+            timer.record(outcome="error")
+            logger.exception("Ingestion of document %s failed", document_id)
+            raise
+
+        return stats
+
+    def clone_document_chunks(self, source_document_id: int, source_user_id: int, document_id: int, user_id: int, collection_name: str = "user_docs", page_size: int = 500) -> int:
+        """Copy another document's stored chunks and vectors under a new document/user id, without re-embedding."""
+        source_col = self.vector_store.user_collection(collection_name, source_user_id)
+        col = self.vector_store.user_collection(collection_name, user_id)
+        copied = 0
+        offset = 0
+        while True:
+            page = source_col.get(
+                where={"document_id": source_document_id},
+                include=["embeddings", "documents", "metadatas"],
+                limit=page_size,
+                offset=offset
             )
-            print("DEBUG: Ingestion triggered via Chroma.from_documents")
-            # Force a little check
-            col = self.client.get_collection(collection_name)
-            print(f"DEBUG: Collection '{collection_name}' count after ingestion: {col.count()}")
-        except Exception as e:
-            print(f"DEBUG: Ingestion error in Chroma: {e}")
-            raise e
-        
-        return len(chunks)
-
-    def delete_document_chunks(self, document_id: int, file_path: str = None, collection_name: str = "user_docs"):
+            if not page["ids"]:
+                break
+            metadatas = [
+                {**metadata, "document_id": document_id, "user_id": user_id}
+                for metadata in page["metadatas"]
+            ]
+            ids = [
+                f"{document_id}:{metadata['chunk_hash']}" if metadata.get("chunk_hash") else str(uuid.uuid4())
+                for metadata in page["metadatas"]
+            ]
+            col.add(
+                ids=ids,
+                embeddings=page["embeddings"],
+                documents=page["documents"],
+                metadatas=metadatas
+            )
+            keyword_index.add_chunks(user_id, ids, [document_id] * len(ids), page["documents"])
+            copied += len(page["ids"])
+            offset += page_size
+        answer_cache.documents_changed(user_id)
+        logger.info("Copied %d chunks from document %s to %s", copied, source_document_id, document_id)
+        return copied
+
+    def rebuild_keyword_index(self, user_id: int, collection_name: str = "user_docs", page_size: int = 500) -> int:
+        """Index all of a user's stored chunks, e.g. ones ingested before the keyword index existed."""
+        col = self.vector_store.user_collection(collection_name, user_id)
+        indexed = 0
+        offset = 0
+        while True:
+            page = col.get(
+                where={"user_id": user_id},
+                include=["documents", "metadatas"],
+                limit=page_size,
+                offset=offset
+            )
+            if not page["ids"]:
+                break
+            missing = set(keyword_index.missing(user_id, page["ids"]))
+            rows = [
+                (chunk_id, metadata.get("document_id", -1), text)
+                for chunk_id, metadata, text in zip(page["ids"], page["metadatas"], page["documents"])
+                if chunk_id in missing
+            ]
+            if rows:
+                ids, document_ids, texts = zip(*rows)
+                keyword_index.add_chunks(user_id, list(ids), list(document_ids), list(texts))
+                indexed += len(rows)
+            offset += page_size
+        return indexed
+
+    def delete_document_chunks(self, document_id: int, file_path: str = None, collection_name: str = "user_docs", user_id: int = None):
         """Delete all chunks associated with a specific document_id or file_path."""
-        print(f"DEBUG: Deleting chunks for document ID {document_id} (path: {file_path}) from collection '{collection_name}'...")
+        answer_cache.invalidate_document(document_id)
+        if user_id is not None:
+            keyword_index.remove_document(user_id, document_id)
+        logger.info("Deleting chunks for document %s (path: %s) from collection '%s'", document_id, file_path, collection_name)
         try:
-            col = self.client.get_collection(collection_name)
+            col = self.vector_store.user_collection(collection_name, user_id)
             
             # 1. Delete by document_id metadata (for new uploads)
             col.delete(where={"document_id": document_id})
@@ -73,9 +333,14 @@ class IngestionService:
                 if normalized_path != file_path:
                     col.delete(where={"source": normalized_path})
             
-            print(f"DEBUG: Cleanup successful for {document_id}. Current collection count: {col.count()}")
-        except Exception as e:
-            print(f"DEBUG: Error during Chroma cleanup: {e}")
+            logger.debug("Cleanup successful for %s. Current collection count: %d", document_id, col.count())
+        except Exception:
             # Non-blocking, but good to log
+            logger.exception("Error during Chroma cleanup for document %s", document_id)
+        if user_id is not None:
+            # After the chunks are gone, so no request caches an answer from them under the new version
+            answer_cache.documents_changed(user_id)
 
-ingestion_service = IngestionService()
+@lru_cache()
+def get_ingestion_service() -> IngestionService:
+    return IngestionService()
@@ -0,0 +1,384 @@
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, so run a single worker there
+    fcntl = None
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[._\-][a-z0-9]+)*")
+QUESTION_WORDS = {"what", "why", "how", "when", "where", "who", "which", "explain", "describe", "compare", "define"}
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; keeps codes like ``cs-101`` or ``3.14`` in one piece."""
+    return TOKEN_RE.findall(text.lower())
+
+
+def is_keyword_query(query: str) -> bool:
+    """Short, non-question queries (formula names, course codes) are served by BM25 alone."""
+    tokens = tokenize(query)
+    if not tokens or len(tokens) > settings.KEYWORD_QUERY_MAX_TERMS:
+        return False
+    if query.strip().endswith("?"):
+        return False
+    return not any(token in QUESTION_WORDS for token in tokens)
+
+
+class Segment:
+    """
+    Immutable slice of a user's inverted index.
+
+    On disk a segment is a directory of flat arrays: ``postings.npy`` (int32 local doc
+    numbers) and ``tfs.npy`` (uint16 term frequencies) hold every term's postings back
+    to back, ``vocab.json`` maps each term to its ``[offset, length]`` range, and
+    ``doc_lengths.npy`` / ``document_ids.npy`` / ``chunk_ids.json`` describe the chunks.
+    The arrays are memory-mapped on load.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+        with open(os.path.join(path, "vocab.json")) as f:
+            self.vocab: Dict[str, Tuple[int, int]] = json.load(f)
+        with open(os.path.join(path, "chunk_ids.json")) as f:
+            self.chunk_ids: List[str] = json.load(f)
+        self.postings = np.load(os.path.join(path, "postings.npy"), mmap_mode="r")
+        self.tfs = np.load(os.path.join(path, "tfs.npy"), mmap_mode="r")
+        self.doc_lengths = np.load(os.path.join(path, "doc_lengths.npy"), mmap_mode="r")
+        self.document_ids = np.load(os.path.join(path, "document_ids.npy"), mmap_mode="r")
+        self.live = np.ones(len(self.chunk_ids), dtype=bool)
+
+    def __len__(self):
+        return len(self.chunk_ids)
+
+    def term_postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        span = self.vocab.get(term)
+        if span is None:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.uint16)
+        offset, length = span
+        return self.postings[offset:offset + length], self.tfs[offset:offset + length]
+
+    @staticmethod
+    def write(path: str, chunk_ids: Sequence[str], document_ids: Sequence[int], term_counts: Sequence[Counter]):
+        """Write a segment from per-chunk term counts."""
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lengths = np.zeros(len(chunk_ids), dtype=np.int32)
+        for local_id, counts in enumerate(term_counts):
+            doc_lengths[local_id] = sum(counts.values())
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((local_id, tf))
+        Segment._write_postings(path, chunk_ids, document_ids, doc_lengths, postings)
+
+    @staticmethod
+    def _write_postings(path, chunk_ids, document_ids, doc_lengths, postings: Dict[str, List[Tuple[int, int]]]):
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        vocab = {}
+        total = sum(len(entries) for entries in postings.values())
+        all_docs = np.empty(total, dtype=np.int32)
+        all_tfs = np.empty(total, dtype=np.uint16)
+        offset = 0
+        for term in sorted(postings):
+            entries = postings[term]
+            vocab[term] = [offset, len(entries)]
+            for i, (local_id, tf) in enumerate(entries):
+                all_docs[offset + i] = local_id
+                all_tfs[offset + i] = min(tf, 65535)
+            offset += len(entries)
+
+        np.save(os.path.join(tmp_path, "postings.npy"), all_docs)
+        np.save(os.path.join(tmp_path, "tfs.npy"), all_tfs)
+        np.save(os.path.join(tmp_path, "doc_lengths.npy"), np.asarray(doc_lengths, dtype=np.int32))
+        np.save(os.path.join(tmp_path, "document_ids.npy"), np.asarray(document_ids, dtype=np.int64))
+        with open(os.path.join(tmp_path, "vocab.json"), "w") as f:
+            json.dump(vocab, f, separators=(",", ":"))
+        with open(os.path.join(tmp_path, "chunk_ids.json"), "w") as f:
+            json.dump(list(chunk_ids), f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def merge(path: str, segments: Sequence["Segment"]):
+        """Write the live chunks of ``segments`` as one segment, straight from their postings."""
+        remap = []
+        chunk_ids, document_ids, doc_lengths = [], [], []
+        for segment in segments:
+            mapping = np.full(len(segment), -1, dtype=np.int64)
+            for local_id in np.flatnonzero(segment.live):
+                mapping[local_id] = len(chunk_ids)
+                chunk_ids.append(segment.chunk_ids[local_id])
+                document_ids.append(int(segment.document_ids[local_id]))
+                doc_lengths.append(int(segment.doc_lengths[local_id]))
+            remap.append(mapping)
+
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        for segment, mapping in zip(segments, remap):
+            for term, (offset, length) in segment.vocab.items():
+                docs = mapping[segment.postings[offset:offset + length]]
+                tfs = segment.tfs[offset:offset + length]
+                keep = docs >= 0
+                if keep.any():
+                    postings.setdefault(term, []).extend(zip(docs[keep].tolist(), tfs[keep].tolist()))
+        Segment._write_postings(path, chunk_ids, document_ids, doc_lengths, postings)
+
+
+class UserIndex:
+    """
+    A user's BM25 index: a list of immutable segments plus per-segment tombstones.
+
+    Each ingest batch becomes a new segment; deletions only mark chunks dead in
+    ``manifest.json``. When there are too many segments, or too many dead chunks, the
+    segments are merged into one.
+
+    Several processes (uvicorn workers) may share the directory. Changes hold an
+    exclusive lock on ``manifest.lock`` while they read, modify and write the manifest.
+    Every operation first reloads the manifest if another process replaced it. Segment
+    names are random, so two processes never write the same one.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.RLock()
+        self.segments: List[Segment] = []
+        self._version = 0
+        self._stamp = None
+        self._locations: Dict[str, Tuple[Segment, int]] = {}
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            self._refresh()
+
+    def _manifest_path(self):
+        return os.path.join(self.directory, "manifest.json")
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        with open(os.path.join(self.directory, "manifest.lock"), "a") as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield  # closing the file releases the lock
+
+    @contextmanager
+    def _changing(self):
+        """Hold both locks over a change, starting from the latest manifest."""
+        with self._lock, self._file_lock(exclusive=True):
+            self._refresh(locked=True)
+            yield
+
+    def _manifest_stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self._manifest_path())
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _refresh(self, locked: bool = False):
+        """Reload the manifest if another process replaced it. Call with ``_lock`` held."""
+        if self._manifest_stamp() == self._stamp:
+            return
+        if locked:
+            self._load()
+        else:
+            # Shared: a compaction can't delete segments the manifest still lists while we open them
+            with self._file_lock(exclusive=False):
+                self._load()
+
+    def _load(self):
+        self._stamp = self._manifest_stamp()
+        manifest = {"segments": [], "deleted": {}, "version": 0}
+        if self._stamp is not None:
+            with open(self._manifest_path()) as f:
+                manifest = json.load(f)
+        self._version = manifest.get("version", 0)
+        loaded = {segment.name: segment for segment in self.segments}
+        self.segments = []
+        for name in manifest["segments"]:
+            segment = loaded.get(name) or Segment(os.path.join(self.directory, name))
+            segment.live = np.ones(len(segment), dtype=bool)
+            for local_id in manifest["deleted"].get(name, []):
+                segment.live[local_id] = False
+            self.segments.append(segment)
+        self._reindex_locations()
+
+    def _reindex_locations(self):
+        self._locations = {}
+        for segment in self.segments:
+            for local_id in np.flatnonzero(segment.live):
+                self._locations[segment.chunk_ids[local_id]] = (segment, int(local_id))
+
+    def _save_manifest(self):
+        manifest = {
+            "segments": [segment.name for segment in self.segments],
+            "deleted": {
+                segment.name: np.flatnonzero(~segment.live).tolist()
+                for segment in self.segments if not segment.live.all()
+            },
+            "version": self._version + 1,
+        }
+        tmp_path = f"{self._manifest_path()}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, separators=(",", ":"))
+        os.replace(tmp_path, self._manifest_path())
+        self._version += 1
+        self._stamp = self._manifest_stamp()
+
+    def _new_segment_path(self) -> str:
+        return os.path.join(self.directory, f"seg_{uuid.uuid4().hex[:16]}")
+
+    def live_count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._locations)
+
+    def contains(self, chunk_id: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return chunk_id in self._locations
+
+    def add(self, chunk_ids: Sequence[str], document_ids: Sequence[int], texts: Sequence[str]):
+        if not chunk_ids:
+            return
+        with self._changing():
+            self._kill([chunk_id for chunk_id in chunk_ids if chunk_id in self._locations])
+            path = self._new_segment_path()
+            Segment.write(path, chunk_ids, document_ids, [Counter(tokenize(text)) for text in texts])
+            segment = Segment(path)
+            self.segments.append(segment)
+            for local_id, chunk_id in enumerate(segment.chunk_ids):
+                self._locations[chunk_id] = (segment, local_id)
+            self._save_manifest()
+            self._maybe_compact()
+
+    def _kill(self, chunk_ids: Iterable[str]) -> int:
+        removed = 0
+        for chunk_id in chunk_ids:
+            location = self._locations.pop(chunk_id, None)
+            if location:
+                segment, local_id = location
+                segment.live[local_id] = False
+                removed += 1
+        return removed
+
+    def remove(self, chunk_ids: Iterable[str]):
+        with self._changing():
+            if self._kill(chunk_ids):
+                self._save_manifest()
+                self._maybe_compact()
+
+    def remove_document(self, document_id: int):
+        with self._changing():
+            chunk_ids = []
+            for segment in self.segments:
+                dead = np.flatnonzero(segment.live & (np.asarray(segment.document_ids) == document_id))
+                chunk_ids.extend(segment.chunk_ids[local_id] for local_id in dead)
+            if self._kill(chunk_ids):
+                self._save_manifest()
+                self._maybe_compact()
+
+    def _maybe_compact(self):
+        total = sum(len(segment) for segment in self.segments)
+        dead = total - len(self._locations)
+        if len(self.segments) <= settings.KEYWORD_INDEX_MAX_SEGMENTS and (not total or dead / total < 0.3):
+            return
+        old_segments = self.segments
+        path = self._new_segment_path()
+        Segment.merge(path, old_segments)
+        self.segments = [Segment(path)]
+        self._reindex_locations()
+        self._save_manifest()
+        for segment in old_segments:
+            shutil.rmtree(segment.path, ignore_errors=True)
+
+    def search(self, query: str, k: int, document_id: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Top ``k`` live chunks for ``query`` by BM25, as ``(chunk_id, score)``."""
+        terms = set(tokenize(query))
+        with self._lock:
+            self._refresh()
+            n_docs = len(self._locations)
+            if not terms or not n_docs:
+                return []
+            total_length = sum(float(np.asarray(segment.doc_lengths)[segment.live].sum()) for segment in self.segments)
+            avgdl = total_length / n_docs
+
+            # Document frequencies across all segments, counting live chunks only
+            df = Counter()
+            for segment in self.segments:
+                for term in terms:
+                    docs, _ = segment.term_postings(term)
+                    if len(docs):
+                        df[term] += int(segment.live[docs].sum())
+
+            results = []
+            for segment in self.segments:
+                scores = np.zeros(len(segment), dtype=np.float32)
+                doc_lengths = np.asarray(segment.doc_lengths, dtype=np.float32)
+                for term in terms:
+                    if not df[term]:
+                        continue
+                    docs, tfs = segment.term_postings(term)
+                    if not len(docs):
+                        continue
+                    idf = math.log(1 + (n_docs - df[term] + 0.5) / (df[term] + 0.5))
+                    tf = np.asarray(tfs, dtype=np.float32)
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths[docs] / avgdl)
+                    scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+                mask = segment.live & (scores > 0)
+                if document_id is not None:
+                    mask &= np.asarray(segment.document_ids) == document_id
+                candidates = np.flatnonzero(mask)
+                if len(candidates) > k:
+                    candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+                results.extend((segment.chunk_ids[i], float(scores[i])) for i in candidates)
+
+        results.sort(key=lambda item: item[1], reverse=True)
+        return results[:k]
+
+
+class KeywordIndex:
+    """Per-user BM25 indexes under ``KEYWORD_INDEX_DIR``, loaded on first use and reloaded when another process changes them."""
+    def __init__(self, directory: str = None):
+        self.directory = directory or settings.KEYWORD_INDEX_DIR
+        self._users: Dict[int, UserIndex] = {}
+        self._lock = threading.Lock()
+
+    def _user(self, user_id: int) -> UserIndex:
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is None:
+                index = UserIndex(os.path.join(self.directory, f"user_{user_id}"))
+                self._users[user_id] = index
+            return index
+
+    def add_chunks(self, user_id: int, chunk_ids: Sequence[str], document_ids: Sequence[int], texts: Sequence[str]):
+        self._user(user_id).add(chunk_ids, document_ids, texts)
+
+    def missing(self, user_id: int, chunk_ids: Iterable[str]) -> List[str]:
+        """The subset of ``chunk_ids`` not currently indexed."""
+        index = self._user(user_id)
+        return [chunk_id for chunk_id in chunk_ids if not index.contains(chunk_id)]
+
+    def remove_chunks(self, user_id: int, chunk_ids: Iterable[str]):
+        self._user(user_id).remove(chunk_ids)
+
+    def remove_document(self, user_id: int, document_id: int):
+        self._user(user_id).remove_document(document_id)
+
+    def search(self, user_id: int, query: str, k: int, document_id: Optional[int] = None) -> List[Tuple[str, float]]:
+        return self._user(user_id).search(query, k, document_id=document_id)
+
+
+keyword_index = KeywordIndex()
@@ -0,0 +1,18 @@
+"""
+PDF text extraction helpers that run inside worker processes.
+
+Kept free of application imports so spawned workers only pay for importing pypdf.
+"""
+from typing import List, Tuple
+
+from pypdf import PdfReader
+
+
+def page_count(file_path: str) -> int:
+    return len(PdfReader(file_path).pages)
+
+
+def extract_page_range(file_path: str, start: int, stop: int) -> List[Tuple[int, str]]:
+    """Extract the text of pages ``[start, stop)`` as ``(page_number, text)`` pairs."""
+    reader = PdfReader(file_path)
+    return [(i, reader.pages[i].extract_text() or "") for i in range(start, stop)]
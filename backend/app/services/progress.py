@@ -0,0 +1,140 @@
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import case, delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app import models
+
+logger = logging.getLogger(__name__)
+
+UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def topic_key(topic: str) -> str:
+    return " ".join((topic or "").lower().split())
+
+
+def attempt_counts(score: float, total_questions: int, completed_at: datetime) -> dict:
+    """One attempt as increments of the ``ProgressCounts`` columns."""
+    fraction = score / total_questions if total_questions else 0.0
+    return {
+        "attempts": 1,
+        "questions": total_questions or 0,
+        "correct": score or 0.0,
+        "score_sum": fraction,
+        "best_score": fraction,
+        "last_score": fraction,
+        "last_attempt_at": completed_at,
+    }
+
+
+def _targets(user_id: int, quiz, completed_at: datetime) -> Iterable[Tuple[type, dict, dict]]:
+    """(aggregate model, key columns, extra columns) for each aggregate an attempt at ``quiz`` counts towards."""
+    yield models.UserProgress, {"user_id": user_id}, {"first_attempt_at": completed_at}
+    yield models.TopicProgress, {"user_id": user_id, "topic_key": topic_key(quiz.topic)}, {"topic": " ".join((quiz.topic or "").split())}
+    if quiz.document_id is not None:
+        yield models.DocumentProgress, {"user_id": user_id, "document_id": quiz.document_id}, {}
+    yield models.DailyProgress, {"user_id": user_id, "day": completed_at.date()}, {}
+
+
+def _upsert(dialect: str, model, keys: dict, extra: dict, counts: dict):
+    """INSERT the attempt's counts, or add them to the existing row, in one statement."""
+    try:
+        insert = UPSERT_DIALECTS[dialect]
+    except KeyError:
+        raise ValueError(f"Progress aggregates need INSERT .. ON CONFLICT, which {dialect} lacks; use SQLite or PostgreSQL")
+    table = model.__table__
+    stmt = insert(table).values(**keys, **extra, **counts)
+    excluded = stmt.excluded
+    updates = {
+        "attempts": table.c.attempts + excluded.attempts,
+        "questions": table.c.questions + excluded.questions,
+        "correct": table.c.correct + excluded.correct,
+        "score_sum": table.c.score_sum + excluded.score_sum,
+        "best_score": case(
+            (table.c.best_score.is_(None), excluded.best_score),
+            (excluded.best_score > table.c.best_score, excluded.best_score),
+            else_=table.c.best_score,
+        ),
+        "last_score": excluded.last_score,
+        "last_attempt_at": excluded.last_attempt_at,
+    }
+    if "topic" in extra:
+        updates["topic"] = excluded.topic
+    return stmt.on_conflict_do_update(index_elements=list(keys), set_=updates)
+
+
+async def record_attempt(db: AsyncSession, attempt: models.QuizAttempt, quiz: models.Quiz):
+    """
+    Add ``attempt`` to the user's progress aggregates, in ``db``'s transaction.
+
+    Each aggregate is one atomic upsert, so concurrent attempts by the same user
+    add up instead of overwriting each other.
+    """
+    dialect = db.bind.dialect.name
+    counts = attempt_counts(attempt.score, attempt.total_questions, attempt.completed_at)
+    for model, keys, extra in _targets(attempt.user_id, quiz, attempt.completed_at):
+        await db.execute(_upsert(dialect, model, keys, extra, counts))
+
+
+def _accumulate(row: Optional[dict], counts: dict) -> dict:
+    if row is None:
+        return dict(counts)
+    row["attempts"] += counts["attempts"]
+    row["questions"] += counts["questions"]
+    row["correct"] += counts["correct"]
+    row["score_sum"] += counts["score_sum"]
+    row["best_score"] = max(row["best_score"], counts["best_score"])
+    if counts["last_attempt_at"] >= row["last_attempt_at"]:
+        row["last_score"] = counts["last_score"]
+        row["last_attempt_at"] = counts["last_attempt_at"]
+    return row
+
+
+def rebuild(db: Session, user_id: Optional[int] = None, batch_size: int = 5000) -> int:
+    """Recompute the aggregates (of one user, or everyone's) from their quiz attempts. Returns the attempts read."""
+    aggregates = (models.UserProgress, models.TopicProgress, models.DocumentProgress, models.DailyProgress)
+    for model in aggregates:
+        stmt = delete(model)
+        if user_id is not None:
+            stmt = stmt.where(model.user_id == user_id)
+        db.execute(stmt)
+
+    rows: Dict[Tuple[type, tuple], dict] = {}
+    query = select(
+        models.QuizAttempt.user_id, models.QuizAttempt.score, models.QuizAttempt.total_questions,
+        models.QuizAttempt.completed_at, models.Quiz.topic,
+        # NULL once the document is deleted, so its DocumentProgress row isn't brought back
+        models.Document.id.label("document_id")
+    ).join(models.Quiz, models.Quiz.id == models.QuizAttempt.quiz_id).outerjoin(
+        models.Document, models.Document.id == models.Quiz.document_id
+    ).order_by(models.QuizAttempt.id)
+    if user_id is not None:
+        query = query.where(models.QuizAttempt.user_id == user_id)
+
+    read = 0
+    for attempt in db.execute(query.execution_options(yield_per=batch_size)):
+        read += 1
+        completed_at = attempt.completed_at or datetime.utcnow()
+        counts = attempt_counts(attempt.score, attempt.total_questions, completed_at)
+        for model, keys, extra in _targets(attempt.user_id, attempt, completed_at):
+            key = (model, tuple(sorted(keys.items())))
+            row = _accumulate(rows.get(key), counts)
+            if key not in rows:
+                row.update(keys)
+                row.update(extra)
+                rows[key] = row
+            elif "topic" in extra:
+                row["topic"] = extra["topic"]
+
+    for model in aggregates:
+        values = [row for (row_model, _), row in rows.items() if row_model is model]
+        for start in range(0, len(values), batch_size):
+            db.execute(model.__table__.insert(), values[start:start + batch_size])
+    db.commit()
+    logger.info("Rebuilt progress aggregates from %d quiz attempts", read)
+    return read
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import math
+import random
+import time
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app import models
+from app.core.config import settings
+from app.core.observability import set_pipeline
+from app.services.keyword_index import KeywordIndex, keyword_index as default_keyword_index, tokenize
+from app.services.quiz_service import QuizService, get_quiz_service, question_key
+
+logger = logging.getLogger(__name__)
+
+BANK_TOPIC = "the key facts and concepts in this section"
+
+# Topic words that say nothing about which part of the document to quiz on
+GENERIC_TERMS = {
+    "a", "an", "and", "the", "of", "on", "in", "to", "for", "about", "with", "from", "my", "this", "that",
+    "all", "everything", "general", "overview", "summary", "basics", "intro", "introduction", "review",
+    "quiz", "test", "exam", "questions", "question", "document", "chapter", "notes", "key", "main", "concepts",
+}
+
+
+class QuizBank:
+    """
+    Per-document bank of questions, generated in the background once a document is
+    ingested and stored as ``models.QuizBankQuestion`` rows.
+
+    Each question remembers the chunks of the section it came from, so a topic can be
+    matched to bank questions through the keyword index without an LLM call. Topics the
+    bank cannot cover fall back to live generation.
+    """
+    def __init__(self, quiz_service: QuizService = None, keyword_index: KeywordIndex = None):
+        self._quiz_service = quiz_service
+        self.keyword_index = keyword_index or default_keyword_index
+
+    @property
+    def quiz_service(self) -> QuizService:
+        # Only building the bank needs the LLM; sampling and cleanup don't
+        return self._quiz_service or get_quiz_service()
+
+    def build(self, db: Session, document_id: int, user_id: int, collection_name: str = "user_docs") -> int:
+        """Replace the document's bank with freshly generated questions; returns their number."""
+        start = time.perf_counter()
+        set_pipeline("quiz_bank")
+        chunks = self.quiz_service.document_chunks(user_id, document_id, collection_name)
+        if not chunks:
+            self.drop(db, document_id)
+            db.commit()
+            return 0
+
+        total_chars = sum(len(chunk.page_content) for chunk in chunks)
+        num_sections = max(1, min(settings.QUIZ_BANK_MAX_SECTIONS, len(chunks), math.ceil(total_chars / settings.QUIZ_SECTION_MAX_CHARS)))
+        sections = self.quiz_service.sections(chunks, num_sections, settings.QUIZ_SECTION_MAX_CHARS)
+        # Runs on the quiz bank worker thread, which has no event loop of its own
+        results = asyncio.run(self.quiz_service.agenerate_sections(
+            BANK_TOPIC, chunks, sections, settings.QUIZ_BANK_QUESTIONS_PER_SECTION
+        ))
+
+        # Swap the bank in one short transaction once generation is done: a write
+        # held open across the LLM calls would lock every other writer out of SQLite
+        self.drop(db, document_id)
+        seen, count = set(), 0
+        for section_index, (positions, questions) in enumerate(zip(sections, results)):
+            chunk_ids = [chunks[i].id for i in positions]
+            for question in questions:
+                key = question_key(question)
+                if key in seen:
+                    continue
+                seen.add(key)
+                db.add(models.QuizBankQuestion(
+                    document_id=document_id,
+                    owner_id=user_id,
+                    section=section_index,
+                    chunk_ids=chunk_ids,
+                    question=question
+                ))
+                count += 1
+        db.commit()
+        logger.info(
+            "Quiz bank for document %s: %d questions from %d sections in %.2fs",
+            document_id, count, len(sections), time.perf_counter() - start
+        )
+        return count
+
+    def drop(self, db: Session, document_id: int):
+        """Delete the document's bank; the caller commits."""
+        db.query(models.QuizBankQuestion).filter(models.QuizBankQuestion.document_id == document_id).delete(synchronize_session=False)
+
+    def copy(self, db: Session, source_document_id: int, document_id: int, user_id: int) -> int:
+        """Give a deduplicated upload the bank of the document its chunks were cloned from."""
+        rows = db.query(models.QuizBankQuestion).filter(models.QuizBankQuestion.document_id == source_document_id).all()
+        prefix = f"{source_document_id}:"
+        for row in rows:
+            db.add(models.QuizBankQuestion(
+                document_id=document_id,
+                owner_id=user_id,
+                section=row.section,
+                chunk_ids=[
+                    f"{document_id}:{chunk_id[len(prefix):]}" if chunk_id.startswith(prefix) else chunk_id
+                    for chunk_id in row.chunk_ids or []
+                ],
+                question=row.question
+            ))
+        return len(rows)
+
+    def sample(
+        self, db: Session, document: models.Document, topic: str, num_questions: int, mode: str = "topic"
+    ) -> Optional[Tuple[List[dict], Optional[float]]]:
+        """
+        ``num_questions`` bank questions for ``topic``, spread across sections, with the
+        coverage they represent. ``None`` when the bank can't cover the request.
+        """
+        rows = db.query(models.QuizBankQuestion).filter(models.QuizBankQuestion.document_id == document.id).all()
+        if len(rows) < num_questions:
+            return None
+
+        terms = [term for term in tokenize(topic) if term not in GENERIC_TERMS and len(term) > 2]
+        if mode == "topic" and terms:
+            # Keep questions whose section contains a chunk matching the topic
+            hits = self.keyword_index.search(document.owner_id, " ".join(terms), num_questions * 4, document_id=document.id)
+            matched = {chunk_id for chunk_id, _ in hits}
+            rows = [row for row in rows if matched.intersection(row.chunk_ids or [])]
+            if len(rows) < num_questions:
+                return None
+
+        by_section = {}
+        for row in rows:
+            by_section.setdefault(row.section, []).append(row)
+        for section_rows in by_section.values():
+            random.shuffle(section_rows)
+
+        picked = []
+        ordered = [by_section[section] for section in sorted(by_section)]
+        while len(picked) < num_questions:
+            for section_rows in ordered:
+                if section_rows and len(picked) < num_questions:
+                    picked.append(section_rows.pop())
+
+        coverage = None
+        if mode == "coverage" and document.chunk_count:
+            covered = set()
+            for row in picked:
+                covered.update(row.chunk_ids or [])
+            coverage = round(min(1.0, len(covered) / document.chunk_count), 4)
+        return [row.question for row in picked], coverage
+
+
+@lru_cache()
+def get_quiz_bank() -> QuizBank:
+    return QuizBank()
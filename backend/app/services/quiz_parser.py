@@ -0,0 +1,76 @@
+import json
+import logging
+from typing import Iterator, List, Optional
+
+from pydantic import ValidationError
+
+from app.schemas.quiz import QuizQuestion
+
+logger = logging.getLogger(__name__)
+
+
+class QuestionStreamParser:
+    """
+    Incremental parser for an LLM's quiz reply.
+
+    Text is fed as it streams in; every JSON object is decoded as soon as its closing
+    brace arrives, so a question can be validated and shown before the rest of the reply
+    exists. Anything outside the objects (markdown fences, a wrapping ``[`` or
+    ``{"questions": [...]}``, stray prose) is ignored, and a malformed object only loses
+    that one question.
+    """
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._starts: List[int] = []  # buffer offsets of the currently open objects
+        self._in_string = False
+        self._escaped = False
+        self._length = 0
+
+    def feed(self, text: str) -> Iterator[dict]:
+        """Consume ``text`` and yield every object with a ``question`` key it completes."""
+        for char in text:
+            if not self._starts and char != "{":
+                continue  # between objects: nothing worth keeping
+            self._buffer.append(char)
+            self._length += 1
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._starts.append(self._length - 1)
+            elif char == "}":
+                start = self._starts.pop()
+                obj = self._decode("".join(self._buffer[start:]))
+                if not self._starts:
+                    self._buffer.clear()
+                    self._length = 0
+                if isinstance(obj, dict) and "question" in obj:
+                    yield obj
+
+    @staticmethod
+    def _decode(text: str) -> Optional[dict]:
+        try:
+            return json.loads(text)
+        except ValueError:
+            return None
+
+
+def parse_questions(text: str) -> List[dict]:
+    """Every question object in a complete reply, valid or not."""
+    return list(QuestionStreamParser().feed(text))
+
+
+def validate_question(raw: dict) -> Optional[dict]:
+    """The question normalised to ``QuizQuestion``, or ``None`` if it is unusable."""
+    try:
+        return QuizQuestion.model_validate(raw).model_dump()
+    except ValidationError as e:
+        logger.debug("Dropping invalid quiz question: %s", e.errors()[0]["msg"])
+        return None
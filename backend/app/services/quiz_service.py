@@ -1,109 +1,287 @@
-import json
-import chromadb
+import asyncio
+import logging
+import math
+import time
+from functools import lru_cache
+from typing import AsyncIterator, List, Optional, Tuple
 from langchain_groq import ChatGroq
+from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_community.vectorstores import Chroma
 from app.core.config import settings
-from app.core.gemini_embeddings import GoogleGenAIEmbeddings
+from app.core.single_flight import coalesced
+from app.core.observability import observe_stage, set_pipeline, stage
+from app.db.vector_store import VectorStore, vector_store as default_vector_store
+from app.core.embeddings import get_embeddings
+from app.services.context_builder import ContextBuilder, get_context_builder
+from app.services.quiz_parser import QuestionStreamParser, parse_questions, validate_question
+from app.services.retrieval_service import RetrievalService, get_retrieval_service
+
+logger = logging.getLogger(__name__)
+
+
+class DocumentHasNoContent(Exception):
+    """Raised when a document quiz is asked for but the document has no indexed chunks."""
+
+
+DOCUMENT_QUIZ_PROMPT = ChatPromptTemplate.from_template(
+    """
+    You are an expert tutor. Generate a quiz with {num_questions} multiple choice questions based on the following document content.
+
+    Document Content:
+    {context}
+
+    Topic Focus: {topic}
+
+    Generate questions that are directly based on the information in the document above.
+    {avoid}
+
+    Return the result in valid JSON format ONLY.
+    The structure should be a list of objects, where each object has:
+    - "question": string
+    - "options": list of 4 strings
+    - "correct_answer": string (must be one of the options)
+
+    Do not include any explanation or markdown formatting outside the JSON.
+    """
+)
+
+TOPIC_QUIZ_PROMPT = ChatPromptTemplate.from_template(
+    """
+    You are an expert tutor. Generate a quiz with {num_questions} multiple choice questions about "{topic}".
+    {avoid}
+
+    Return the result in valid JSON format ONLY.
+    The structure should be a list of objects, where each object has:
+    - "question": string
+    - "options": list of 4 strings
+    - "correct_answer": string (must be one of the options)
+
+    Do not include any explanation or markdown formatting outside the JSON.
+    """
+)
+
+
+def question_key(question: dict) -> str:
+    """Normalised question text, used to drop duplicates across sections."""
+    return " ".join(str(question.get("question", "")).lower().split())
+
 
 class QuizService:
-    def __init__(self):
-        self.llm = ChatGroq(
-            temperature=0.7, 
-            groq_api_key=settings.GROQ_API_KEY, 
+    def __init__(self, vector_store: VectorStore = None, retrieval: RetrievalService = None, llm=None, context_builder: ContextBuilder = None):
+        self.llm = llm or ChatGroq(
+            temperature=0.7,
+            groq_api_key=settings.GROQ_API_KEY,
+            base_url=settings.GROQ_BASE_URL or None,
             model_name="openai/gpt-oss-120b"
         )
-        self.embeddings = GoogleGenAIEmbeddings(model="models/text-embedding-004")
-        self.client = chromadb.PersistentClient(path="./chroma_db")
+        self.timed_llm = coalesced(self.llm)
+        self.embeddings = get_embeddings()
+        self.vector_store = vector_store or default_vector_store
+        self.retrieval = retrieval or get_retrieval_service()
+        self.context_builder = context_builder or get_context_builder()
 
-    def _retrieve_document_content(self, topic: str, user_id: int, collection_name: str = "user_docs", k: int = 5) -> str:
-        """Retrieve relevant document chunks from ChromaDB based on the topic."""
+    def _retrieve_document_content(self, topic: str, user_id: int, document_id: int = None, collection_name: str = "user_docs", k: int = 5) -> str:
+        """Retrieve relevant chunks of one document (hybrid dense + keyword search) based on the topic."""
         try:
-            vectordb = Chroma(
-                client=self.client,
-                collection_name=collection_name,
-                embedding_function=self.embeddings
-            )
-            
-            # Retrieve relevant chunks with user_id filter
-            docs = vectordb.similarity_search(
-                topic, 
-                k=k,
-                filter={"user_id": user_id}
-            )
-            
+            # Search only the user's partition, restricted to the requested document
+            docs = self.retrieval.search(topic, user_id, collection_name, k=k, document_id=document_id)
+
             if not docs:
                 return ""
-            
-            # Combine chunks into context
-            context = "\n\n".join([doc.page_content for doc in docs])
-            return context
-        except Exception as e:
-            print(f"Document retrieval error: {e}")
+
+            # Best chunks first, without overlap or repeats, within the prompt budget
+            return self.context_builder.build(docs, settings.QUIZ_CONTEXT_TOKENS).text
+        except Exception:
+            logger.exception("Document retrieval error")
             return ""
 
+    def _variables(self, topic: str, count: int, context: str, accepted: List[dict]) -> dict:
+        avoid = ""
+        if accepted:
+            avoid = "Do not repeat any of these questions:\n" + "\n".join(f"- {q['question']}" for q in accepted)
+        variables = {"topic": topic, "num_questions": count, "avoid": avoid}
+        if context:
+            variables["context"] = context
+        return variables
+
+    def _accept(self, raw: dict, accepted: List[dict], seen: set) -> Optional[dict]:
+        """Validate ``raw`` and append it to ``accepted`` unless it is invalid or a repeat."""
+        question = validate_question(raw)
+        if question is None or question_key(question) in seen:
+            return None
+        seen.add(question_key(question))
+        accepted.append(question)
+        return question
+
     def generate_quiz(self, topic: str, user_id: int, num_questions: int = 5, document_id: int = None):
+        set_pipeline("quiz")
         # Retrieve document content if document_id is provided
         document_context = ""
         if document_id:
-            document_context = self._retrieve_document_content(topic, user_id=user_id)
-        
-        if document_context:
-            # Generate quiz from document content
-            prompt = ChatPromptTemplate.from_template(
-                """
-                You are an expert tutor. Generate a quiz with {num_questions} multiple choice questions based on the following document content.
-                
-                Document Content:
-                {context}
-                
-                Topic Focus: {topic}
-                
-                Generate questions that are directly based on the information in the document above.
-                
-                Return the result in valid JSON format ONLY. 
-                The structure should be a list of objects, where each object has:
-                - "question": string
-                - "options": list of 4 strings
-                - "correct_answer": string (must be one of the options)
-                
-                Do not include any explanation or markdown formatting outside the JSON.
-                """
-            )
-            result = (prompt | self.llm).invoke({
-                "topic": topic, 
-                "num_questions": num_questions,
-                "context": document_context
-            })
-        else:
-            # Generate quiz from topic only (fallback)
-            prompt = ChatPromptTemplate.from_template(
-                """
-                You are an expert tutor. Generate a quiz with {num_questions} multiple choice questions about "{topic}".
-                
-                Return the result in valid JSON format ONLY. 
-                The structure should be a list of objects, where each object has:
-                - "question": string
-                - "options": list of 4 strings
-                - "correct_answer": string (must be one of the options)
-                
-                Do not include any explanation or markdown formatting outside the JSON.
-                """
+            document_context = self._retrieve_document_content(topic, user_id=user_id, document_id=document_id)
+        # Generate quiz from document content, or from the topic only (fallback)
+        prompt = DOCUMENT_QUIZ_PROMPT if document_context else TOPIC_QUIZ_PROMPT
+
+        accepted, seen = [], set()
+        for attempt in range(1 + settings.QUIZ_REPAIR_ATTEMPTS):
+            missing = num_questions - len(accepted)
+            if missing <= 0:
+                break
+            if attempt:
+                logger.info("Regenerating %d missing quiz questions (attempt %d)", missing, attempt)
+            try:
+                result = (prompt | self.timed_llm).invoke(self._variables(topic, missing, document_context, accepted))
+            except Exception:
+                logger.exception("Quiz generation error")
+                continue
+            with stage("parse"):
+                for raw in parse_questions(result.content):
+                    if len(accepted) < num_questions:
+                        self._accept(raw, accepted, seen)
+        return accepted
+
+    async def _astream_questions(self, topic: str, num_questions: int, context: str = "") -> AsyncIterator[dict]:
+        """
+        Yield validated questions as the LLM streams them. When the reply ends short
+        (malformed, invalid or duplicate questions), only the missing ones are requested
+        again, up to ``QUIZ_REPAIR_ATTEMPTS`` times.
+        """
+        prompt = DOCUMENT_QUIZ_PROMPT if context else TOPIC_QUIZ_PROMPT
+        accepted, seen = [], set()
+        for attempt in range(1 + settings.QUIZ_REPAIR_ATTEMPTS):
+            missing = num_questions - len(accepted)
+            if missing <= 0:
+                return
+            if attempt:
+                logger.info("Regenerating %d missing quiz questions (attempt %d)", missing, attempt)
+            parser = QuestionStreamParser()
+            parse_seconds = 0.0  # parsing is interleaved with the stream, so it is summed per reply
+            try:
+                async for chunk in (prompt | self.timed_llm).astream(self._variables(topic, missing, context, accepted)):
+                    parse_start = time.perf_counter()
+                    questions = []
+                    # A whole reply can arrive as one chunk: accept no more than are still needed
+                    for raw in parser.feed(chunk.content):
+                        if len(accepted) >= num_questions:
+                            break
+                        question = self._accept(raw, accepted, seen)
+                        if question is not None:
+                            questions.append(question)
+                    parse_seconds += time.perf_counter() - parse_start
+                    for question in questions:
+                        yield question
+                    if len(accepted) >= num_questions:
+                        return
+            except Exception:
+                logger.exception("Quiz generation error")
+            finally:
+                if parse_seconds:
+                    observe_stage("parse", parse_seconds)
+
+    async def astream_quiz(self, topic: str, user_id: int, num_questions: int = 5, document_id: int = None) -> AsyncIterator[dict]:
+        """Async ``generate_quiz`` that yields each question as soon as it validates."""
+        set_pipeline("quiz")
+        document_context = ""
+        if document_id:
+            document_context = await asyncio.to_thread(
+                self._retrieve_document_content, topic, user_id=user_id, document_id=document_id
             )
-            result = (prompt | self.llm).invoke({"topic": topic, "num_questions": num_questions})
-        
-        try:
-            content = result.content.strip()
-            # Clean up potential markdown code blocks
-            if content.startswith("```json"):
-                content = content[7:]
-            if content.endswith("```"):
-                content = content[:-3]
-            
-            questions = json.loads(content)
-            return questions
-        except Exception as e:
-            print(f"Quiz generation error: {e}")
-            return []
-
-quiz_service = QuizService()
+        async for question in self._astream_questions(topic, num_questions, document_context):
+            yield question
+
+    async def agenerate_quiz(self, topic: str, user_id: int, num_questions: int = 5, document_id: int = None):
+        """Async ``generate_quiz``; the LLM call does not hold a worker thread."""
+        return [question async for question in self.astream_quiz(topic, user_id, num_questions, document_id)]
+
+    def document_chunks(self, user_id: int, document_id: int, collection_name: str = "user_docs") -> List[Document]:
+        """All chunks of one document, in reading order."""
+        col = self.vector_store.user_collection(collection_name, user_id)
+        result = col.get(
+            where={"$and": [{"user_id": user_id}, {"document_id": document_id}]},
+            include=["documents", "metadatas"]
+        )
+        chunks = [
+            Document(id=chunk_id, page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(result["ids"], result["documents"], result["metadatas"])
+        ]
+        chunks.sort(key=lambda chunk: chunk.metadata.get("chunk_index", 0))
+        return chunks
+
+    def sections(self, chunks: List[Document], num_sections: int, max_chars: int) -> List[List[int]]:
+        """
+        Split chunk positions into ``num_sections`` contiguous runs. A run longer than
+        ``max_chars`` is strided so each prompt samples its whole span within the budget.
+        """
+        bounds = [round(i * len(chunks) / num_sections) for i in range(num_sections + 1)]
+        sections = []
+        for start, stop in zip(bounds, bounds[1:]):
+            positions = list(range(start, stop))
+            if not positions:
+                continue
+            chars = sum(len(chunks[i].page_content) for i in positions)
+            step = max(1, math.ceil(chars / max_chars))
+            picked, used = [], 0
+            for i in positions[::step]:
+                if picked and used + len(chunks[i].page_content) > max_chars:
+                    break
+                picked.append(i)
+                used += len(chunks[i].page_content)
+            sections.append(picked)
+        return sections
+
+    async def agenerate_sections(self, topic: str, chunks: List[Document], sections: List[List[int]], per_section: int) -> List[list]:
+        """Questions for every section, generated concurrently (at most ``QUIZ_COVERAGE_CONCURRENCY`` in flight)."""
+        semaphore = asyncio.Semaphore(max(1, settings.QUIZ_COVERAGE_CONCURRENCY))
+
+        async def generate_section(positions: List[int]) -> list:
+            context = self.context_builder.build([chunks[i] for i in positions], settings.QUIZ_CONTEXT_TOKENS).text
+            async with semaphore:
+                return [question async for question in self._astream_questions(topic, per_section, context)]
+
+        return await asyncio.gather(*(generate_section(positions) for positions in sections))
+
+    async def agenerate_coverage_quiz(
+        self, topic: str, user_id: int, document_id: int, num_questions: int = 5, collection_name: str = "user_docs"
+    ) -> Tuple[list, Optional[float]]:
+        """
+        Quiz over the whole document instead of the top-k chunks for ``topic``.
+
+        The document is split into sections, questions are generated for every section
+        concurrently, then de-duplicated and merged round-robin so each section is
+        represented. Returns the questions and the fraction of the document's chunks that
+        fed a kept question.
+        """
+        set_pipeline("quiz")
+        chunks = await asyncio.to_thread(self.document_chunks, user_id, document_id, collection_name)
+        if not chunks:
+            # A topic-only quiz here would be saved as this document's
+            raise DocumentHasNoContent(f"Document {document_id} is not ready or has no content")
+
+        num_sections = max(1, min(settings.QUIZ_COVERAGE_SECTIONS, len(chunks), num_questions))
+        sections = self.sections(chunks, num_sections, settings.QUIZ_SECTION_MAX_CHARS)
+        per_section = math.ceil(num_questions / len(sections))
+
+        logger.info("Coverage quiz for document %s: %d chunks in %d sections", document_id, len(chunks), len(sections))
+        results = await self.agenerate_sections(topic, chunks, sections, per_section)
+
+        questions, seen, covered = [], set(), set()
+        for round_index in range(max((len(r) for r in results), default=0)):
+            for section_index, section_questions in enumerate(results):
+                if len(questions) >= num_questions:
+                    break
+                if round_index >= len(section_questions):
+                    continue
+                question = section_questions[round_index]
+                key = question_key(question)
+                if not key or key in seen:
+                    continue
+                seen.add(key)
+                questions.append(question)
+                covered.update(sections[section_index])
+
+        coverage = round(len(covered) / len(chunks), 4)
+        return questions, coverage
+
+@lru_cache()
+def get_quiz_service() -> QuizService:
+    return QuizService()
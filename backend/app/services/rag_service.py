@@ -1,96 +1,245 @@
-from typing import List
-from app.core.gemini_embeddings import GoogleGenAIEmbeddings
+import logging
+from functools import lru_cache
+from typing import Any, AsyncIterator, List, Tuple
+from app.core.embeddings import get_embeddings
+from app.core.single_flight import coalesced
+from app.core.observability import set_pipeline, stage
 from langchain_groq import ChatGroq
-from langchain_community.vectorstores import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough, RunnableParallel
+from langchain_core.runnables import RunnableLambda, RunnablePassthrough, RunnableParallel
 from langchain_core.output_parsers import StrOutputParser
 from app.core.config import settings
 from app.schemas.chat import SourceDocument
-import chromadb
+from app.services.answer_cache import SemanticAnswerCache, answer_cache as default_answer_cache
+from app.services.context_builder import ContextBuilder, PackedContext, get_context_builder
+from app.services.keyword_index import is_keyword_query
+from app.services.retrieval_service import RetrievalService, get_retrieval_service
+
+logger = logging.getLogger(__name__)
+
+CHAT_PROMPT = ChatPromptTemplate.from_template(
+    """Answer the following question based only on the provided context.
+    If you cannot answer from context, say "I don't have enough information."
+
+    Context: {context}
+
+    Question: {input}
+
+    Answer:"""
+)
+
+# Chat sessions: CHAT_PROMPT plus the conversation so far (ChatMemory keeps it bounded)
+CONVERSATION_PROMPT = ChatPromptTemplate.from_template(
+    """Answer the student's latest question based only on the provided context, using the
+    conversation so far to understand what it refers to.
+    If you cannot answer from context, say "I don't have enough information."
+
+    Conversation so far:
+    {history}
+
+    Context: {context}
+
+    Question: {input}
+
+    Answer:"""
+)
 
 class RAGService:
-    def __init__(self):
-        self.embeddings = GoogleGenAIEmbeddings(model="models/text-embedding-004")
-        self.client = chromadb.PersistentClient(path="./chroma_db")
-        self.llm = ChatGroq(
+    def __init__(
+        self,
+        retrieval: RetrievalService = None,
+        llm: BaseChatModel = None,
+        embeddings: Embeddings = None,
+        answer_cache: SemanticAnswerCache = None,
+        context_builder: ContextBuilder = None,
+    ):
+        self.embeddings = embeddings or get_embeddings()
+        self.retrieval = retrieval or get_retrieval_service()
+        self.context_builder = context_builder or get_context_builder()
+        self.answer_cache = answer_cache or (default_answer_cache if settings.ANSWER_CACHE_ENABLED else None)
+        self.llm = llm or ChatGroq(
             temperature=0,
             groq_api_key=settings.GROQ_API_KEY,
+            base_url=settings.GROQ_BASE_URL or None,
             model_name="openai/gpt-oss-120b"
         )
+        self.prompt = CHAT_PROMPT
+        self.answer_chain = self.prompt | coalesced(self.llm) | StrOutputParser()
+        self.conversation_chain = CONVERSATION_PROMPT | coalesced(self.llm) | StrOutputParser()
 
-    def format_docs(self, docs):
-        return "\n\n".join(doc.page_content for doc in docs)
+    def pack(self, docs) -> PackedContext:
+        """Retrieved chunks as prompt context within ``CHAT_CONTEXT_TOKENS``."""
+        return self.context_builder.build(docs, settings.CHAT_CONTEXT_TOKENS)
 
-    def ask_question(self, query: str, user_id: int, collection_name: str = "documents"):
-        # 1. Initialize Vector Store
-        vectordb = Chroma(
-            client=self.client,
-            embedding_function=self.embeddings,
-            collection_name=collection_name
-        )
-        
-        # 2. Setup Retriever with user_id filter
-        retriever = vectordb.as_retriever(
-            search_kwargs={
-                "k": 4,
-                "filter": {"user_id": user_id}
-            }
-        )
-        
-        # 3. Define Prompt
-        prompt = ChatPromptTemplate.from_template(
-            """Answer the following question based only on the provided context.
-            If you cannot answer from context, say "I don't have enough information."
+    def format_sources(self, docs) -> List[SourceDocument]:
+        return [
+            SourceDocument(
+                page_content=doc.page_content,
+                source=doc.metadata.get("source", "Unknown")
+            )
+            for doc in docs
+        ]
 
-            Context: {context}
+    def _retriever(self, user_id: int, collection_name: str, query_vector: List[float] = None):
+        """Hybrid (dense + BM25) retrieval over the user's chunks as a runnable."""
+        def search(query: str):
+            return self.retrieval.search(query, user_id, collection_name, k=4, query_vector=query_vector)
 
-            Question: {input}
+        async def asearch(query: str):
+            return await self.retrieval.asearch(query, user_id, collection_name, k=4, query_vector=query_vector)
 
-            Answer:"""
-        )
-        
-        # 4. Define LCEL Chain (Retrieval + Generation + Source Preservation)
-        chain = (
-            RunnableParallel({"context": retriever, "input": RunnablePassthrough()})
+        return RunnableLambda(search, afunc=asearch)
+
+    def _build_chain(self, user_id: int, collection_name: str, query_vector: List[float] = None):
+        """LCEL chain: retrieval + generation, keeping the retrieved docs as sources."""
+        return (
+            RunnableParallel({"context": self._retriever(user_id, collection_name, query_vector), "input": RunnablePassthrough()})
+            | RunnablePassthrough.assign(context=lambda x: self.pack(x["context"]))
             | RunnableParallel({
                 "answer": (
-                    RunnablePassthrough.assign(context=lambda x: self.format_docs(x["context"]))
-                    | prompt 
-                    | self.llm 
-                    | StrOutputParser()
+                    RunnablePassthrough.assign(context=lambda x: x["context"].text)
+                    | self.answer_chain
                 ),
-                "context": lambda x: x["context"]
+                # Only the passages the answer could have used are cited
+                "context": lambda x: x["context"].docs
             })
         )
-        
-        # 5. Invoke
+
+    def _log_result(self, result):
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        retrieved_docs = result.get("context", [])
+        logger.debug("Retrieved %d documents", len(retrieved_docs))
+        for i, doc in enumerate(retrieved_docs):
+            logger.debug("Doc %d source: %s; preamble: %s...", i + 1, doc.metadata.get("source", "Unknown"), doc.page_content[:100])
+
+    def _uses_answer_cache(self, query: str) -> bool:
+        # Keyword queries are served by BM25 alone; embedding them for the cache lookup
+        # would add back the round trip retrieval skips
+        return self.answer_cache is not None and not is_keyword_query(query)
+
+    def _cache_answer(self, user_id: int, collection_name: str, query_vector, version, answer: str, docs, sources):
+        if self.answer_cache is None or query_vector is None or not docs:
+            return
+        document_ids = {doc.metadata["document_id"] for doc in docs if "document_id" in doc.metadata}
+        self.answer_cache.store(user_id, collection_name, query_vector, answer, sources, document_ids, version)
+
+    def ask_question(self, query: str, user_id: int, collection_name: str = "documents"):
+        set_pipeline("chat")
+        query_vector = version = None
+        if self._uses_answer_cache(query):
+            # Read before retrieval: an answer is only as fresh as the documents it saw
+            version = self.answer_cache.version(user_id)
+            # Retrieval reuses the vector for its dense search
+            with stage("embed"):
+                query_vector = self.embeddings.embed_query(query)
+            cached = self.answer_cache.lookup(user_id, collection_name, query_vector, version)
+            if cached:
+                logger.debug("Semantic answer cache hit")
+                return cached
+
+        chain = self._build_chain(user_id, collection_name, query_vector)
         try:
-            print(f"Invoking RAG chain for query: {query}")
+            logger.debug("Invoking RAG chain for query: %s", query)
             result = chain.invoke(query)
-            print("RAG chain invoked successfully.")
-            
-            # Debug: Print retrieved context
-            retrieved_docs = result.get("context", [])
-            print(f"DEBUG: Retrieved {len(retrieved_docs)} documents.")
-            for i, doc in enumerate(retrieved_docs):
-                print(f"DEBUG: Doc {i+1} Source: {doc.metadata.get('source', 'Unknown')}")
-                print(f"DEBUG: Doc {i+1} Preamble: {doc.page_content[:100]}...")
-        except Exception as e:
-            print(f"Error invoking RAG chain: {e}")
-            import traceback
-            traceback.print_exc()
-            raise e
-        
-        # 6. Format Output
-        answer = result["answer"]
-        source_docs = []
-        for doc in result["context"]:
-            source_docs.append(SourceDocument(
-                page_content=doc.page_content,
-                source=doc.metadata.get("source", "Unknown")
-            ))
-        
-        return answer, source_docs
+            self._log_result(result)
+        except Exception:
+            logger.exception("Error invoking RAG chain")
+            raise
+
+        sources = self.format_sources(result["context"])
+        self._cache_answer(user_id, collection_name, query_vector, version, result["answer"], result["context"], sources)
+        return result["answer"], sources
+
+    async def aask_question(self, query: str, user_id: int, collection_name: str = "documents"):
+        """Async variant of ``ask_question``; does not hold a threadpool worker during the LLM call."""
+        set_pipeline("chat")
+        query_vector = version = None
+        if self._uses_answer_cache(query):
+            version = await self.answer_cache.aversion(user_id)
+            with stage("embed"):
+                query_vector = await self.embeddings.aembed_query(query)
+            cached = self.answer_cache.lookup(user_id, collection_name, query_vector, version)
+            if cached:
+                logger.debug("Semantic answer cache hit")
+                return cached
+
+        chain = self._build_chain(user_id, collection_name, query_vector)
+        try:
+            logger.debug("Invoking RAG chain for query: %s", query)
+            result = await chain.ainvoke(query)
+            self._log_result(result)
+        except Exception:
+            logger.exception("Error invoking RAG chain")
+            raise
+
+        sources = self.format_sources(result["context"])
+        self._cache_answer(user_id, collection_name, query_vector, version, result["answer"], result["context"], sources)
+        return result["answer"], sources
+
+    async def astream_answer(self, query: str, user_id: int, collection_name: str = "documents") -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Stream a RAG answer as ``(event, data)`` pairs.
+
+        Yields ``("sources", [SourceDocument, ...])`` once retrieval finishes, then
+        ``("token", str)`` for each chunk of the answer as the LLM produces it.
+        A semantic cache hit yields the cached answer as a single token.
+        """
+        set_pipeline("chat")
+        query_vector = version = None
+        if self._uses_answer_cache(query):
+            version = await self.answer_cache.aversion(user_id)
+            with stage("embed"):
+                query_vector = await self.embeddings.aembed_query(query)
+            cached = self.answer_cache.lookup(user_id, collection_name, query_vector, version)
+            if cached:
+                answer, sources = cached
+                yield "sources", sources
+                yield "token", answer
+                return
+
+        packed = self.pack(await self._retriever(user_id, collection_name, query_vector).ainvoke(query))
+        docs = packed.docs
+        sources = self.format_sources(docs)
+        yield "sources", sources
+
+        tokens = []
+        async for token in self.answer_chain.astream({"context": packed.text, "input": query}):
+            if token:
+                tokens.append(token)
+                yield "token", token
+        self._cache_answer(user_id, collection_name, query_vector, version, "".join(tokens), docs, sources)
+
+    async def aretrieve(self, query: str, user_id: int, collection_name: str = "documents") -> List[Document]:
+        return await self._retriever(user_id, collection_name).ainvoke(query)
+
+    def _conversation_input(self, question: str, history: str, packed: PackedContext) -> dict:
+        return {"history": history or "(none)", "context": packed.text, "input": question}
+
+    async def aanswer_in_conversation(self, question: str, history: str, docs: List[Document]):
+        """
+        Answer a chat session turn from already retrieved ``docs``.
+
+        The semantic answer cache is skipped: the answer depends on the conversation,
+        and the session reuses retrievals across turns itself.
+        """
+        set_pipeline("chat")
+        packed = self.pack(docs)
+        answer = await self.conversation_chain.ainvoke(self._conversation_input(question, history, packed))
+        return answer, self.format_sources(packed.docs)
+
+    async def astream_answer_in_conversation(self, question: str, history: str, docs: List[Document]) -> AsyncIterator[Tuple[str, Any]]:
+        """``aanswer_in_conversation`` as ``(event, data)`` pairs, like ``astream_answer``."""
+        set_pipeline("chat")
+        packed = self.pack(docs)
+        yield "sources", self.format_sources(packed.docs)
+        async for token in self.conversation_chain.astream(self._conversation_input(question, history, packed)):
+            if token:
+                yield "token", token
 
-rag_service = RAGService()
+@lru_cache()
+def get_rag_service() -> RAGService:
+    return RAGService()
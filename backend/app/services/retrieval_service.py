@@ -0,0 +1,118 @@
+import asyncio
+import logging
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from app.core.config import settings
+from app.core.embeddings import get_embeddings
+from app.core.observability import stage
+from app.db.vector_store import VectorStore, vector_store as default_vector_store
+from app.services.keyword_index import KeywordIndex, is_keyword_query, keyword_index as default_keyword_index
+
+logger = logging.getLogger(__name__)
+
+RRF_K = 60  # standard reciprocal-rank-fusion damping constant
+
+
+def reciprocal_rank_fusion(*rankings: List[str]) -> Dict[str, float]:
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank + 1)
+    return scores
+
+
+class RetrievalService:
+    """
+    Hybrid retrieval over a user's chunks: Chroma similarity search fused with the
+    per-user BM25 index via reciprocal-rank fusion.
+
+    Short keyword-style queries that BM25 can answer on its own skip the query
+    embedding and the vector search entirely.
+    """
+    def __init__(self, vector_store: VectorStore = None, embeddings: Embeddings = None, keyword_index: KeywordIndex = None):
+        self.vector_store = vector_store or default_vector_store
+        self.embeddings = embeddings or get_embeddings()
+        self.keyword_index = keyword_index or default_keyword_index
+
+    def _where(self, user_id: int, document_id: Optional[int]) -> dict:
+        if document_id is None:
+            return {"user_id": user_id}
+        return {"$and": [{"user_id": user_id}, {"document_id": document_id}]}
+
+    def _dense(self, query: str, user_id: int, collection_name: str, k: int, document_id: Optional[int],
+               query_vector: Optional[List[float]] = None) -> Dict[str, Document]:
+        col = self.vector_store.user_collection(collection_name, user_id)
+        query_embedding = query_vector
+        if query_embedding is None:
+            with stage("embed"):
+                query_embedding = self.embeddings.embed_query(query)
+        result = col.query(
+            query_embeddings=[query_embedding],
+            n_results=k,
+            where=self._where(user_id, document_id),
+            include=["documents", "metadatas"]
+        )
+        return {
+            chunk_id: Document(page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(result["ids"][0], result["documents"][0], result["metadatas"][0])
+        }
+
+    def _fetch(self, chunk_ids: List[str], user_id: int, collection_name: str) -> Dict[str, Document]:
+        if not chunk_ids:
+            return {}
+        result = self.vector_store.user_collection(collection_name, user_id).get(ids=chunk_ids, include=["documents", "metadatas"])
+        return {
+            chunk_id: Document(page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(result["ids"], result["documents"], result["metadatas"])
+        }
+
+    def search(self, query: str, user_id: int, collection_name: str = "user_docs", k: int = 4, document_id: Optional[int] = None,
+               query_vector: Optional[List[float]] = None) -> List[Document]:
+        """
+        Top ``k`` chunks for ``query``, best first; each carries its fused score in ``metadata['score']``.
+
+        ``query_vector``, when the caller already embedded the query, is used for the dense search.
+        """
+        with stage("retrieve"):
+            return self._search(query, user_id, collection_name, k, document_id, query_vector)
+
+    def _search(self, query: str, user_id: int, collection_name: str, k: int, document_id: Optional[int],
+                query_vector: Optional[List[float]] = None) -> List[Document]:
+        candidates = k * settings.HYBRID_CANDIDATE_MULTIPLIER
+        keyword_hits = self.keyword_index.search(user_id, query, candidates, document_id=document_id)
+        keyword_ranking = [chunk_id for chunk_id, _ in keyword_hits]
+
+        if len(keyword_hits) >= k and is_keyword_query(query):
+            logger.debug("Keyword-only retrieval for '%s'", query)
+            docs = self._fetch(keyword_ranking[:k], user_id, collection_name)
+            ranked = [(chunk_id, score) for chunk_id, score in keyword_hits[:k]]
+        else:
+            docs = self._dense(query, user_id, collection_name, candidates, document_id, query_vector)
+            fused = reciprocal_rank_fusion(list(docs), keyword_ranking)
+            ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+            docs.update(self._fetch([chunk_id for chunk_id, _ in ranked if chunk_id not in docs], user_id, collection_name))
+
+        results = []
+        for chunk_id, score in ranked:
+            doc = docs.get(chunk_id)
+            if doc is None:
+                continue  # indexed chunk no longer in Chroma
+            doc.metadata["score"] = score
+            results.append(doc)
+        return results
+
+    async def asearch(self, query: str, user_id: int, collection_name: str = "user_docs", k: int = 4, document_id: Optional[int] = None,
+                      query_vector: Optional[List[float]] = None) -> List[Document]:
+        # to_thread carries the request id and pipeline over to the worker thread
+        return await asyncio.to_thread(
+            self.search, query, user_id, collection_name, k=k, document_id=document_id, query_vector=query_vector
+        )
+
+
+@lru_cache()
+def get_retrieval_service() -> RetrievalService:
+    return RetrievalService()
@@ -0,0 +1,160 @@
+"""
+Authenticated no-op request throughput: per-request auth cost before and after the user cache.
+
+Serves ``GET /noop`` behind two versions of the auth dependency, in-process through
+httpx's ASGI transport against a throwaway SQLite database:
+
+- ``before``: the previous dependency. It is a sync ``get_current_active_user``
+  (a threadpool hop), a ``User`` lookup on every request, and an Argon2
+  ``verify_password(hash, hash)`` on every request.
+- ``after``:  ``deps.get_current_active_user``. It verifies the JWT, answers from the
+  user cache after the first request and does no hashing.
+
+``--concurrency`` clients share ``--users`` tokens and send requests for
+``--seconds``. Reported: req/s, p50/p95/p99 latency and the user cache hit rate.
+
+Run from the backend directory:
+    python benchmarks/bench_auth.py --concurrency 1 10 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='bench_auth_')}/auth.db")
+
+import httpx  # noqa: E402
+from fastapi import Depends, FastAPI, HTTPException  # noqa: E402
+from jose import jwt  # noqa: E402
+from pydantic import ValidationError  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+
+from app import models, schemas  # noqa: E402
+from app.api import deps  # noqa: E402
+from app.core import security  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.core.user_cache import user_cache  # noqa: E402
+from app.db.base import Base  # noqa: E402
+from app.db.session import SessionLocal, async_engine, engine  # noqa: E402
+
+
+async def legacy_current_user(
+    db: AsyncSession = Depends(deps.get_db), token: str = Depends(deps.reusable_oauth2)
+) -> models.User:
+    try:
+        token_data = schemas.TokenPayload(**jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM]))
+    except (jwt.JWTError, ValidationError):
+        raise HTTPException(status_code=403, detail="Could not validate credentials")
+    user = await db.get(models.User, token_data.sub) if token_data.sub is not None else None
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    await db.commit()
+    return user
+
+
+def legacy_current_active_user(current_user: models.User = Depends(legacy_current_user)) -> models.User:
+    security.verify_password(current_user.hashed_password, current_user.hashed_password)
+    if not current_user.is_active:
+        raise HTTPException(status_code=400, detail="Inactive user")
+    return current_user
+
+
+def create_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/before/noop")
+    async def before(current_user=Depends(legacy_current_active_user)):
+        return {"id": current_user.id}
+
+    @app.get("/after/noop")
+    async def after(current_user=Depends(deps.get_current_active_user)):
+        return {"id": current_user.id}
+
+    return app
+
+
+def seed_users(count: int) -> List[str]:
+    Base.metadata.create_all(bind=engine)
+    hashed = security.get_password_hash("benchmark")
+    with SessionLocal() as db:
+        users = [models.User(email=f"auth{i}-{time.time_ns()}@example.com", hashed_password=hashed, is_active=True) for i in range(count)]
+        db.add_all(users)
+        db.commit()
+        return [security.create_access_token(user.id) for user in users]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))]
+
+
+async def drive(app: FastAPI, variant: str, tokens: List[str], concurrency: int, seconds: float) -> dict:
+    latencies: List[float] = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+    user_cache.clear()
+    hits, misses = user_cache.hits, user_cache.misses
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        async def worker(index: int):
+            nonlocal errors
+            i = index
+            while time.perf_counter() < deadline:
+                token = tokens[i % len(tokens)]
+                i += concurrency
+                start = time.perf_counter()
+                response = await client.get(f"/{variant}/noop", headers={"Authorization": f"Bearer {token}"})
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    lookups = (user_cache.hits - hits) + (user_cache.misses - misses)
+    return {
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "errors": errors,
+        "cache_hit_rate": (user_cache.hits - hits) / lookups if lookups else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--seconds", type=float, default=5.0, help="per variant and concurrency level")
+    args = parser.parse_args()
+
+    tokens = seed_users(args.users)
+    app = create_app()
+
+    async def run_all():
+        for concurrency in args.concurrency:
+            for variant in ("before", "after"):
+                result = await drive(app, variant, tokens, concurrency, args.seconds)
+                print(
+                    f"{variant:<7} {concurrency:>7} {result['rps']:>9.1f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+                    f"{result['p99_ms']:>8.2f} {result['errors']:>7} {result['cache_hit_rate']:>10.1%}",
+                    flush=True
+                )
+        await async_engine.dispose()
+
+    print(f"{'variant':<7} {'clients':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7} {'cache hits':>10}", flush=True)
+    # One event loop for every run: the async engine's pooled connections belong to it
+    asyncio.run(run_all())
+
+
+if __name__ == "__main__":
+    main()
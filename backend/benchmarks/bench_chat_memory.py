@@ -0,0 +1,209 @@
+"""
+Chat sessions: prompt tokens and LLM time per turn as a study session grows.
+
+Plays one long scripted conversation over the synthetic course from
+``bench_context.py`` (real BM25 ``KeywordIndex``, ingestion splitter). Every
+question is followed by two follow-ups that only make sense in context. Two variants:
+
+- ``before``: stateless ``/chat``, with the frontend resending the whole conversation
+  as the question, so retrieval and the prompt both get the full transcript
+- ``after``:  ``ChatMemory``. The follow-up is condensed into a standalone query, the
+  last retrieval is reused when that query barely changes, and the prompt quotes at most
+  CHAT_HISTORY_TOKENS of recent messages plus a CHAT_SUMMARY_TOKENS rolling summary.
+
+LLM calls use the app's ChatGroq setup against ``fake_providers.py`` with a prefill
+cost per prompt token, so longer prompts are slower as they would be upstream.
+Summaries run after the response in the app, so their calls are reported separately
+and not counted in the turn's time. The stand-in's "condensed query" is built from the
+prompt's words, so the reuse rate here shows the mechanism working, not a real model's rate.
+
+Run from the backend directory:
+    python benchmarks/bench_chat_memory.py --turns 60
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='bench_chat_memory_')}/chat.db")
+os.environ["ANSWER_CACHE_ENABLED"] = "false"  # every turn reaches the LLM in both variants
+
+from bench_context import build_index, make_course, retrieve  # noqa: E402
+from bench_e2e import free_port, percentile, wait_until_up  # noqa: E402
+
+FOLLOW_UPS = ["Can you explain that in more detail?", "Why does that matter for this unit?"]
+
+
+class BenchRetriever:
+    """Stands in for ``RetrievalService`` with the BM25 index alone."""
+    def __init__(self, index, chunks):
+        self.index, self.chunks = index, chunks
+        self.calls = 0
+
+    def search(self, query: str, user_id: int, collection_name: str = "user_docs", k: int = 4, document_id=None, query_vector=None):
+        self.calls += 1
+        return retrieve(self.index, self.chunks, query, k)
+
+    async def asearch(self, query: str, user_id: int, collection_name: str = "user_docs", k: int = 4, document_id=None, query_vector=None):
+        return self.search(query, user_id, collection_name, k)
+
+
+def rag_service(llm, retriever):
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+    from app.services.rag_service import RAGService
+
+    # The answer cache is off, so embeddings are never used: retrieval is BM25 only
+    return RAGService(retrieval=retriever, llm=llm, embeddings=DeterministicFakeEmbedding(size=8))
+
+
+def script(facts, turns: int) -> List[str]:
+    questions = []
+    for question, _, _ in facts:
+        questions.extend([question] + FOLLOW_UPS)
+    return (questions * (turns // len(questions) + 1))[:turns]
+
+
+async def run_before(llm, retriever, questions, counter):
+    from app.services.rag_service import CHAT_PROMPT
+
+    rag = rag_service(llm, retriever)
+    transcript: List[str] = []
+    tokens, times = [], []
+    for question in questions:
+        resent = "\n".join(transcript + [f"Student: {question}"])
+        start = time.perf_counter()
+        answer, _ = await rag.aask_question(resent, user_id=1, collection_name="user_docs")
+        times.append((time.perf_counter() - start) * 1000)
+        # aask_question doesn't expose its prompt: render the same one
+        context = rag.pack(retrieve(retriever.index, retriever.chunks, resent, 4)).text
+        tokens.append(counter.count(CHAT_PROMPT.format(context=context, input=resent)))
+        transcript += [f"Student: {question}", f"Assistant: {answer}"]
+    return {"tokens": tokens, "times": times, "retrievals": retriever.calls, "summaries": 0, "summary_ms": []}
+
+
+async def run_after(llm, retriever, questions, counter, documents: int):
+    from app import models
+    from app.db.init_db import init_db
+    from app.db.session import AsyncSessionLocal, engine
+    from app.services.chat_memory import CONDENSE_PROMPT, ChatMemory
+    from app.services.rag_service import CHAT_PROMPT, CONVERSATION_PROMPT
+
+    init_db(engine)
+    async with AsyncSessionLocal() as db:
+        user = models.User(email=f"chat-{time.time_ns()}@example.com", hashed_password="-")
+        db.add(user)
+        await db.flush()
+        db.add_all([
+            models.Document(id=i, owner_id=user.id, title=f"unit {i}", file_path=f"unit{i}.txt", file_type="txt")
+            for i in range(1, documents + 1)
+        ])
+        chat_session = models.ChatSession(owner_id=user.id)
+        db.add(chat_session)
+        await db.commit()
+        session_id = chat_session.id
+
+    memory = ChatMemory(llm=llm, counter=counter)
+    rag = rag_service(llm, retriever)
+
+    tokens, times, summary_ms = [], [], []
+    for question in questions:
+        start = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            chat_session = await db.get(models.ChatSession, session_id)
+            turn = await memory.aprepare(db, chat_session, question, rag, "user_docs")
+        if turn.docs is None:
+            # First turn: answered standalone, as the endpoint does
+            answer, sources = await rag.aask_question(question, user_id=1, collection_name="user_docs")
+        else:
+            answer, sources = await rag.aanswer_in_conversation(question, turn.history, turn.docs)
+        await memory.arecord(session_id, turn, answer, sources)
+        times.append((time.perf_counter() - start) * 1000)
+
+        if turn.docs is None:
+            context = rag.pack(retrieve(retriever.index, retriever.chunks, question, 4)).text
+            prompt = counter.count(CHAT_PROMPT.format(context=context, input=question))
+        else:
+            packed = rag.pack(turn.docs)
+            prompt = counter.count(CONVERSATION_PROMPT.format(history=turn.history or "(none)", context=packed.text, input=question))
+        if turn.history:
+            prompt += counter.count(CONDENSE_PROMPT.format(history=turn.history, question=question))
+        tokens.append(prompt)
+
+        start = time.perf_counter()
+        summaries = memory.summaries
+        await memory.asummarize(session_id)
+        if memory.summaries > summaries:
+            summary_ms.append((time.perf_counter() - start) * 1000)
+    return {"tokens": tokens, "times": times, "retrievals": retriever.calls, "summaries": memory.summaries, "summary_ms": summary_ms}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=45)
+    parser.add_argument("--documents", type=int, default=5)
+    parser.add_argument("--paragraphs", type=int, default=30, help="per document")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--first-token-ms", type=float, default=100.0)
+    parser.add_argument("--prompt-token-ms", type=float, default=0.2, help="fake provider prefill time per prompt token")
+    parser.add_argument("--token-ms", type=float, default=2.0)
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    args = parser.parse_args()
+
+    from langchain_groq import ChatGroq
+    from app.db.session import async_engine
+    from app.services.context_builder import get_token_counter
+
+    rng = random.Random(args.seed)
+    texts, facts = make_course(rng, args.documents, max(1, args.turns // 3), args.paragraphs)
+    questions = script(facts, args.turns)
+    counter = get_token_counter()
+
+    with tempfile.TemporaryDirectory(prefix="bench_chat_memory_") as directory:
+        index, chunks = build_index(texts, directory)
+        port = free_port()
+        fake = subprocess.Popen(
+            [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_providers.py"),
+             "--port", str(port), "--first-token-ms", str(args.first_token_ms),
+             "--prompt-token-ms", str(args.prompt_token_ms), "--token-ms", str(args.token_ms),
+             "--answer-tokens", str(args.answer_tokens)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_until_up(f"http://127.0.0.1:{port}/stats", fake)
+            llm = ChatGroq(temperature=0, groq_api_key="benchmark", base_url=f"http://127.0.0.1:{port}", model_name="openai/gpt-oss-120b")
+
+            async def run_all():
+                before = await run_before(llm, BenchRetriever(index, chunks), questions, counter)
+                after = await run_after(llm, BenchRetriever(index, chunks), questions, counter, args.documents)
+                await async_engine.dispose()
+                return {"before": before, "after": after}
+
+            # One event loop for every run: the async engine's pooled connections belong to it
+            results = asyncio.run(run_all())
+        finally:
+            fake.terminate()
+            fake.wait()
+
+    print(f"{args.turns} turns, {len(chunks)} chunks; tokens "
+          f"{'counted with tiktoken ' + counter.encoding_name if counter.exact else 'estimated (tiktoken encoding unavailable)'}")
+    marks = sorted({1, args.turns // 4, args.turns // 2, args.turns} - {0})
+    header = " ".join(f"{'turn ' + str(mark):>9}" for mark in marks)
+    print(f"{'variant':<7} {header} {'max tok':>8} {'turn p50 ms':>11} {'turn p95 ms':>11} {'retrievals':>10} {'summaries':>9} {'summary p50 ms':>14}")
+    for variant, result in results.items():
+        tokens = result["tokens"]
+        print(
+            f"{variant:<7} " + " ".join(f"{tokens[mark - 1]:>9}" for mark in marks) +
+            f" {max(tokens):>8} {percentile(result['times'], 0.5):>11.0f} {percentile(result['times'], 0.95):>11.0f}"
+            f" {result['retrievals']:>10} {result['summaries']:>9} {percentile(result['summary_ms'], 0.5) or 0:>14.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
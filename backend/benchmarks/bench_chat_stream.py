@@ -0,0 +1,165 @@
+"""
+Chat load test against a fake streaming LLM and a fake retriever.
+
+Compares the blocking path (``ask_question`` on a 40-thread pool, what a sync FastAPI
+endpoint gets) with the async streaming path (``astream_answer`` on one event loop)
+and reports time-to-first-token and completed chats/sec per concurrency level.
+
+Run from the backend directory:
+    python benchmarks/bench_chat_stream.py --concurrency 1 10 50 100 200
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Iterator, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The services build their API clients at construction time; no calls are made here.
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+# Every request asks the same question; measure the LLM path, not the answer cache
+os.environ["ANSWER_CACHE_ENABLED"] = "false"
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from app.services.rag_service import RAGService
+
+THREADPOOL_SIZE = 40  # anyio's default limit for sync endpoints
+
+
+class FakeStreamingLLM(BaseChatModel):
+    """Chat model with a fixed time-to-first-token and per-token delay."""
+    first_token_latency: float = 0.3
+    token_latency: float = 0.01
+    tokens: int = 60
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming"
+
+    def _text(self) -> str:
+        return "".join(f"token{i} " for i in range(self.tokens))
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.first_token_latency + self.token_latency * self.tokens)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._text()))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self.first_token_latency + self.token_latency * self.tokens)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._text()))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_latency)
+        for i in range(self.tokens):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=f"token{i} "))
+            time.sleep(self.token_latency)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_latency)
+        for i in range(self.tokens):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=f"token{i} "))
+            await asyncio.sleep(self.token_latency)
+
+
+class FakeEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        return [[0.0] for _ in texts]
+
+    def embed_query(self, text):
+        return [0.0]
+
+
+class FakeRetrieval:
+    """Stands in for RetrievalService; retrieval takes ``latency`` seconds."""
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.docs = [
+            Document(page_content=f"passage {i} " * 40, metadata={"source": f"doc{i}.pdf"})
+            for i in range(4)
+        ]
+
+    def search(self, query, user_id, collection_name, k=4, document_id=None, query_vector=None):
+        time.sleep(self.latency)
+        return self.docs
+
+    async def asearch(self, query, user_id, collection_name, k=4, document_id=None, query_vector=None):
+        await asyncio.sleep(self.latency)
+        return self.docs
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_blocking(service: RAGService, concurrency: int):
+    def one(_):
+        start = time.perf_counter()
+        service.ask_question("what is backpropagation?", user_id=1, collection_name="bench")
+        # the JSON endpoint shows nothing until the whole answer is ready
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADPOOL_SIZE) as pool:
+        ttfts = list(pool.map(one, range(concurrency)))
+    return ttfts, time.perf_counter() - start
+
+
+async def run_streaming(service: RAGService, concurrency: int):
+    async def one():
+        start = time.perf_counter()
+        ttft = None
+        async for event, _ in service.astream_answer("what is backpropagation?", user_id=1, collection_name="bench"):
+            if event == "token" and ttft is None:
+                ttft = time.perf_counter() - start
+        return ttft
+
+    start = time.perf_counter()
+    ttfts = await asyncio.gather(*(one() for _ in range(concurrency)))
+    return list(ttfts), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--first-token-ms", type=float, default=300.0)
+    parser.add_argument("--token-ms", type=float, default=10.0)
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--retrieval-ms", type=float, default=30.0)
+    args = parser.parse_args()
+
+    llm = FakeStreamingLLM(
+        first_token_latency=args.first_token_ms / 1000.0,
+        token_latency=args.token_ms / 1000.0,
+        tokens=args.tokens,
+    )
+    service = RAGService(
+        retrieval=FakeRetrieval(args.retrieval_ms / 1000.0),
+        llm=llm,
+        embeddings=FakeEmbeddings(),
+    )
+
+    print(f"{'mode':<10} {'conc':>5} {'ttft p50':>9} {'ttft p95':>9} {'wall s':>8} {'chats/s':>8}")
+    for concurrency in args.concurrency:
+        for mode in ("blocking", "streaming"):
+            if mode == "blocking":
+                ttfts, wall = run_blocking(service, concurrency)
+            else:
+                ttfts, wall = asyncio.run(run_streaming(service, concurrency))
+            print(
+                f"{mode:<10} {concurrency:>5} {statistics.median(ttfts) * 1000:>7.0f}ms "
+                f"{percentile(ttfts, 95) * 1000:>7.0f}ms {wall:>8.2f} {concurrency / wall:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
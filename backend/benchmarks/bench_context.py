@@ -0,0 +1,201 @@
+"""
+Prompt context packing: prompt tokens, LLM latency and answer coverage, before and after.
+
+Builds a synthetic course of lecture notes. The text is wrapped at 80 columns like
+PDF extraction, with a header on every page and a closing summary that repeats some
+paragraphs verbatim. Each question has one fact planted somewhere in the notes.
+The notes are split with the ingestion splitter (1000 chars, 200 overlap) and
+indexed in a real BM25 ``KeywordIndex``. For each question, the top chunks go into
+the chat prompt (k=4) and the quiz prompt (k=5), built two ways:
+
+- ``before``: the chunks joined as retrieved (the previous ``format_docs`` and
+  ``_retrieve_document_content``)
+- ``after``:  ``ContextBuilder``. Chunks are ordered by score, overlap is trimmed and
+  near-duplicates dropped, within CHAT_CONTEXT_TOKENS / QUIZ_CONTEXT_TOKENS.
+
+Coverage is the share of questions whose fact made it into the context. Prompt tokens
+are counted over the whole rendered prompt, with tiktoken or, when its encoding can't be
+downloaded, the four-characters-per-token estimate (the report says which). LLM latency
+uses the app's ChatGroq setup, run against ``fake_providers.py`` with a prefill cost per
+prompt token (``--prompt-token-ms``).
+
+Run from the backend directory:
+    python benchmarks/bench_context.py --questions 40
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+from typing import Dict, List, Tuple
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_e2e import VOCABULARY, free_port, percentile, wait_until_up  # noqa: E402
+
+SYLLABLES = "ka lo ven dri mas tor el quin ba rux sel om pra tev gul".split()
+
+
+def made_up_name(rng: random.Random) -> str:
+    return "".join(rng.choice(SYLLABLES) for _ in range(3)).capitalize()
+
+
+def make_course(rng: random.Random, documents: int, questions: int, paragraphs: int):
+    """Documents as text, and (question, fact, document index) triples."""
+    facts = []
+    for i in range(questions):
+        name = made_up_name(rng)
+        code = f"{rng.choice(VOCABULARY)}-{rng.randint(100, 999)}"
+        facts.append((f"What is the reference code of the {name} experiment?",
+                      f"The reference code of the {name} experiment is {code}.", i % documents))
+
+    texts = []
+    for doc_index in range(documents):
+        header = (f"Course notes, unit {doc_index + 1}. Prepared for enrolled students only; "
+                  f"please do not redistribute these pages outside the course.")
+        body = [
+            " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(50, 110))).capitalize() + "."
+            for _ in range(paragraphs)
+        ]
+        for question, fact, index in facts:
+            if index == doc_index:
+                position = rng.randrange(len(body))
+                body[position] = body[position][:-1] + ". " + fact
+        # Lecture notes often close with a summary that repeats key paragraphs verbatim
+        summary = rng.sample(body, k=min(len(body), max(2, paragraphs // 6)))
+        pages, page = [], [header]
+        for paragraph in body + ["Summary of this unit."] + summary:
+            page.append(textwrap.fill(paragraph, width=80))
+            if len(page) == 4:
+                pages.append("\n\n".join(page))
+                page = [header]
+        pages.append("\n\n".join(page))
+        texts.append("\n\n".join(pages))
+    return texts, facts
+
+
+def build_index(texts: List[str], directory: str):
+    from langchain_core.documents import Document
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    from app.services.keyword_index import KeywordIndex
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, separators=["\n\n", "\n", " ", ""])
+    index = KeywordIndex(directory)
+    chunks: Dict[str, Document] = {}
+    for document_id, text in enumerate(texts, start=1):
+        pieces = splitter.split_text(text)
+        ids = [f"{document_id}-{i}" for i in range(len(pieces))]
+        index.add_chunks(1, ids, [document_id] * len(pieces), pieces)
+        for i, (chunk_id, piece) in enumerate(zip(ids, pieces)):
+            chunks[chunk_id] = Document(page_content=piece, metadata={"document_id": document_id, "chunk_index": i})
+    return index, chunks
+
+
+def retrieve(index, chunks, query: str, k: int):
+    docs = []
+    for chunk_id, score in index.search(1, query, k):
+        doc = chunks[chunk_id].model_copy(deep=True)
+        doc.metadata["score"] = score
+        docs.append(doc)
+    return docs
+
+
+def normalise(text: str) -> str:
+    return " ".join(text.split())
+
+
+def render_prompts(facts, index, chunks) -> Dict[Tuple[str, str], List[Tuple[str, bool]]]:
+    """(pipeline, variant) -> [(rendered prompt, whether the fact is in its context)]"""
+    from app.core.config import settings
+    from app.services.context_builder import get_context_builder
+    from app.services.quiz_service import DOCUMENT_QUIZ_PROMPT
+    from app.services.rag_service import CHAT_PROMPT
+
+    builder = get_context_builder()
+    out: Dict[Tuple[str, str], List[Tuple[str, bool]]] = {}
+    for question, fact, _ in facts:
+        for pipeline, k, budget in (("chat", 4, settings.CHAT_CONTEXT_TOKENS), ("quiz", 5, settings.QUIZ_CONTEXT_TOKENS)):
+            docs = retrieve(index, chunks, question, k)
+            contexts = {
+                "before": "\n\n".join(doc.page_content for doc in docs),
+                "after": builder.build(docs, budget).text,
+            }
+            for variant, context in contexts.items():
+                if pipeline == "chat":
+                    prompt = CHAT_PROMPT.format(context=context, input=question)
+                else:
+                    prompt = DOCUMENT_QUIZ_PROMPT.format(context=context, topic=question, num_questions=5, avoid="")
+                out.setdefault((pipeline, variant), []).append((prompt, normalise(fact) in normalise(context)))
+    return out
+
+
+async def llm_latencies(base_url: str, prompts: List[str]) -> List[float]:
+    from langchain_groq import ChatGroq
+
+    llm = ChatGroq(temperature=0, groq_api_key="benchmark", base_url=base_url, model_name="openai/gpt-oss-120b")
+    latencies = []
+    for prompt in prompts:
+        start = time.perf_counter()
+        await llm.ainvoke(prompt)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--documents", type=int, default=5)
+    parser.add_argument("--paragraphs", type=int, default=30, help="per document")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--first-token-ms", type=float, default=100.0)
+    parser.add_argument("--prompt-token-ms", type=float, default=0.2, help="fake provider prefill time per prompt token")
+    parser.add_argument("--token-ms", type=float, default=2.0)
+    parser.add_argument("--answer-tokens", type=int, default=20)
+    args = parser.parse_args()
+
+    from app.services.context_builder import get_token_counter
+
+    rng = random.Random(args.seed)
+    texts, facts = make_course(rng, args.documents, args.questions, args.paragraphs)
+    counter = get_token_counter()
+    with tempfile.TemporaryDirectory(prefix="bench_context_") as directory:
+        index, chunks = build_index(texts, directory)
+        rendered = render_prompts(facts, index, chunks)
+
+        port = free_port()
+        fake = subprocess.Popen(
+            [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "fake_providers.py"),
+             "--port", str(port), "--first-token-ms", str(args.first_token_ms),
+             "--prompt-token-ms", str(args.prompt_token_ms), "--token-ms", str(args.token_ms),
+             "--answer-tokens", str(args.answer_tokens)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_until_up(f"http://127.0.0.1:{port}/stats", fake)
+            latencies = {
+                key: asyncio.run(llm_latencies(f"http://127.0.0.1:{port}", [prompt for prompt, _ in items]))
+                for key, items in rendered.items()
+            }
+        finally:
+            fake.terminate()
+            fake.wait()
+
+    print(f"{len(chunks)} chunks from {args.documents} documents, {args.questions} questions; "
+          f"tokens {'counted with tiktoken ' + counter.encoding_name if counter.exact else 'estimated (tiktoken encoding unavailable)'}")
+    print(f"{'pipeline':<8} {'variant':<7} {'coverage':>8} {'mean tokens':>11} {'p95 tokens':>10} {'LLM p50 ms':>10} {'LLM p95 ms':>10}")
+    for (pipeline, variant), items in sorted(rendered.items(), key=lambda item: (item[0][0], item[0][1] != "before")):
+        tokens = [counter.count(prompt) for prompt, _ in items]
+        coverage = sum(found for _, found in items) / len(items)
+        print(
+            f"{pipeline:<8} {variant:<7} {coverage:>8.1%} {sum(tokens) / len(tokens):>11.0f} {percentile(tokens, 0.95):>10.0f} "
+            f"{percentile(latencies[(pipeline, variant)], 0.5):>10.0f} {percentile(latencies[(pipeline, variant)], 0.95):>10.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Progress dashboard latency as a user's attempt history grows.
+
+For each ``--attempts`` size a fresh user is seeded with that many quiz attempts,
+spread over ``--quizzes`` quizzes, ``--topics`` topics and ``--documents`` documents.
+Their aggregates are built with ``progress.rebuild``, the same code as
+``manage.py rebuild-progress``. Requests go in-process through httpx's ASGI transport
+against a throwaway SQLite database:
+
+- ``before``: what a progress view needed until now. It pages through
+  ``GET /quizzes/attempts`` 100 at a time, as the client would, to aggregate the
+  scores itself, and loads ``GET /documents/``.
+- ``after``:  a single ``GET /dashboard/``.
+
+Run from the backend directory:
+    python benchmarks/bench_dashboard.py --attempts 1000 10000 50000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='bench_dashboard_')}/dashboard.db")
+
+import httpx  # noqa: E402
+
+from app import models  # noqa: E402
+from app.api.pagination import NEXT_CURSOR_HEADER  # noqa: E402
+from app.core import security  # noqa: E402
+from app.db.init_db import init_db  # noqa: E402
+from app.db.session import SessionLocal, async_engine, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.services import progress  # noqa: E402
+
+PAGE_SIZE = 100
+
+
+def seed_user(rng: random.Random, attempts: int, quizzes: int, topics: int, documents: int) -> str:
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        user = models.User(email=f"dashboard-{attempts}-{time.time_ns()}@example.com", hashed_password="-", is_active=True)
+        db.add(user)
+        db.flush()
+        docs = [
+            models.Document(title=f"unit {i}.pdf", file_path=f"unit{i}.pdf", file_type="application/pdf", owner_id=user.id)
+            for i in range(documents)
+        ]
+        db.add_all(docs)
+        db.flush()
+        quiz_rows = [
+            models.Quiz(
+                topic=f"topic {i % topics}", owner_id=user.id, document_id=docs[i % documents].id,
+                questions=[{"question": f"q{j}", "options": ["a", "b", "c", "d"], "correct_answer": "a"} for j in range(5)]
+            )
+            for i in range(quizzes)
+        ]
+        db.add_all(quiz_rows)
+        db.flush()
+        db.execute(models.QuizAttempt.__table__.insert(), [
+            {
+                "quiz_id": quiz_rows[i % quizzes].id,
+                "user_id": user.id,
+                "score": float(rng.randint(0, 5)),
+                "total_questions": 5,
+                "completed_at": now - timedelta(minutes=attempts - i),
+            }
+            for i in range(attempts)
+        ])
+        db.commit()
+        progress.rebuild(db, user.id)
+        return security.create_access_token(user.id)
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))]
+
+
+async def before(client: httpx.AsyncClient, headers: dict) -> int:
+    params, rows = {"limit": PAGE_SIZE}, []
+    while True:
+        response = await client.get("/api/v1/quizzes/attempts", params=params, headers=headers)
+        response.raise_for_status()
+        rows.extend(response.json())
+        if NEXT_CURSOR_HEADER not in response.headers:
+            break
+        params["cursor"] = response.headers[NEXT_CURSOR_HEADER]
+    (await client.get("/api/v1/documents/", headers=headers)).raise_for_status()
+    # The client-side aggregation the dashboard replaces
+    correct = sum(row["score"] for row in rows)
+    questions = sum(row["total_questions"] for row in rows)
+    _ = correct / questions if questions else None
+    return len(rows)
+
+
+async def after(client: httpx.AsyncClient, headers: dict) -> int:
+    response = await client.get("/api/v1/dashboard/", headers=headers)
+    response.raise_for_status()
+    return response.json()["progress"]["attempts"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--attempts", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--quizzes", type=int, default=200)
+    parser.add_argument("--topics", type=int, default=40)
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=5, help="timed requests per variant and size")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    init_db(engine)
+    tokens = {size: seed_user(rng, size, args.quizzes, args.topics, args.documents) for size in args.attempts}
+
+    async def run_all():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            for size, token in tokens.items():
+                headers = {"Authorization": f"Bearer {token}"}
+                for variant, fn in (("before", before), ("after", after)):
+                    await fn(client, headers)  # warm up
+                    timings = []
+                    for _ in range(args.repeat):
+                        start = time.perf_counter()
+                        seen = await fn(client, headers)
+                        timings.append((time.perf_counter() - start) * 1000)
+                    assert seen == size, f"{variant} saw {seen} attempts, expected {size}"
+                    print(f"{variant:<7} {size:>9} {percentile(timings, 50):>10.1f} {percentile(timings, 95):>10.1f}", flush=True)
+        await async_engine.dispose()
+
+    print(f"{'variant':<7} {'attempts':>9} {'p50 ms':>10} {'p95 ms':>10}", flush=True)
+    # One event loop for every run: the async engine's pooled connections belong to it
+    asyncio.run(run_all())
+
+
+if __name__ == "__main__":
+    main()
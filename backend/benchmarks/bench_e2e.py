@@ -0,0 +1,415 @@
+"""
+End-to-end load benchmark: the real app under uvicorn, with stand-in providers.
+
+Starts ``fake_providers.py`` (Gemini embeddings and Groq chat with fixed latency) and
+the app itself in a throwaway directory, pointed at the fakes with GEMINI_BASE_URL and
+GROQ_BASE_URL. Chroma runs embedded, as in development. Then, for each level of
+concurrent users (a fresh set of users per level), it measures:
+
+- upload: upload a unique text document and poll until it is ready
+- chat:   ``--chat-requests`` questions per user, one after another
+- quiz:   ``--quiz-requests`` document quizzes per user, one after another
+
+and reports p50/p95/p99 latency, throughput and the server's peak RSS per scenario
+and level. ``--output`` writes the report as JSON; ``--baseline`` compares against a
+stored report and exits 1 if any metric regressed by more than ``--tolerance``.
+
+Run from the backend directory:
+    python benchmarks/bench_e2e.py --users 1 10 100 --output e2e.json
+    python benchmarks/bench_e2e.py --users 1 10 100 --baseline e2e.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_providers import Latency, add_latency_arguments, latency_from_args
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("upload", "chat", "quiz")
+API = "/api/v1"
+
+VOCABULARY = (
+    "cell membrane protein enzyme reaction mitochondria chlorophyll photosynthesis gene chromosome "
+    "theorem proof integral derivative vector matrix eigenvalue limit series convergence "
+    "market price demand supply inflation tariff empire treaty revolution parliament "
+    "algorithm complexity network protocol memory compiler syntax grammar semantics"
+).split()
+
+# (metric, True if higher is worse)
+COMPARED_METRICS = [
+    ("p50_ms", True), ("p95_ms", True), ("p99_ms", True),
+    ("throughput_rps", False), ("peak_rss_mb", True), ("error_rate", True),
+]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60.0):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.05)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+class MemorySampler:
+    """Samples a process's resident set size (Linux ``/proc``) and keeps the peak."""
+    def __init__(self, pid: int, interval: float = 0.02):
+        self.path = f"/proc/{pid}/status"
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def available(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _rss_kb(self) -> int:
+        with open(self.path) as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+        return 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.peak_kb = max(self.peak_kb, self._rss_kb())
+            except OSError:
+                return
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if self.available:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    @property
+    def peak_mb(self) -> Optional[float]:
+        return round(self.peak_kb / 1024, 1) if self.peak_kb else None
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return round(ordered[max(0, math.ceil(q * len(ordered)) - 1)], 1)  # nearest rank
+
+
+def summarize(scenario: str, users: int, latencies_ms: List[float], errors: int, elapsed: float, peak_mb) -> dict:
+    total = len(latencies_ms) + errors
+    return {
+        "scenario": scenario,
+        "users": users,
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "p50_ms": percentile(latencies_ms, 0.50),
+        "p95_ms": percentile(latencies_ms, 0.95),
+        "p99_ms": percentile(latencies_ms, 0.99),
+        "throughput_rps": round(len(latencies_ms) / elapsed, 2) if elapsed else None,
+        "peak_rss_mb": peak_mb,
+    }
+
+
+def make_document(rng: random.Random, paragraphs: int) -> str:
+    return "\n\n".join(
+        " ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(60, 140))) + "."
+        for _ in range(paragraphs)
+    )
+
+
+class Harness:
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.args = args
+
+    async def create_users(self, level: int, count: int) -> List[dict]:
+        # Setup isn't measured, so keep it gentle enough not to exhaust the server's DB pool
+        semaphore = asyncio.Semaphore(8)
+
+        async def create(i: int) -> dict:
+            email = f"bench-{level}-{i}@example.com"
+            password = "bench-password"
+            async with semaphore:
+                response = await self.client.post(f"{API}/users/", json={"email": email, "password": password, "full_name": "Bench"})
+                response.raise_for_status()
+                response = await self.client.post(f"{API}/login/access-token", data={"username": email, "password": password})
+                response.raise_for_status()
+            return {"headers": {"Authorization": f"Bearer {response.json()['access_token']}"}, "documents": []}
+
+        return await asyncio.gather(*(create(i) for i in range(count)))
+
+    async def upload(self, user: dict, name: str, text: str) -> float:
+        """Upload ``text`` and wait for it to be ingested; returns the latency in ms."""
+        start = time.perf_counter()
+        response = await self.client.post(
+            f"{API}/documents/upload", headers=user["headers"],
+            files={"file": (name, text.encode("utf-8"), "text/plain")}
+        )
+        response.raise_for_status()
+        document_id = response.json()["id"]
+        while True:
+            response = await self.client.get(f"{API}/documents/{document_id}/status", headers=user["headers"])
+            response.raise_for_status()
+            status = response.json()
+            if status["status"] == "ready":
+                break
+            if status["status"] == "failed":
+                raise RuntimeError(f"ingestion failed: {status.get('error')}")
+            if time.perf_counter() - start > self.args.timeout:
+                raise TimeoutError(f"document {document_id} still {status['status']} after {self.args.timeout}s")
+            await asyncio.sleep(self.args.poll_ms / 1000)
+        user["documents"].append(document_id)
+        return (time.perf_counter() - start) * 1000
+
+    async def chat(self, user: dict, question: str) -> float:
+        start = time.perf_counter()
+        response = await self.client.post(f"{API}/chat/", headers=user["headers"], json={"question": question})
+        response.raise_for_status()
+        return (time.perf_counter() - start) * 1000
+
+    async def quiz(self, user: dict, topic: str) -> float:
+        if not user["documents"]:
+            raise RuntimeError("user has no ingested document to quiz on")
+        start = time.perf_counter()
+        response = await self.client.post(f"{API}/quizzes/generate", headers=user["headers"], json={
+            "topic": topic, "num_questions": self.args.quiz_questions, "document_id": user["documents"][-1]
+        })
+        response.raise_for_status()
+        return (time.perf_counter() - start) * 1000
+
+
+async def run_users(users: List[dict], requests_per_user: int, call) -> tuple:
+    """Every user runs ``call(user, user_index, request_index)`` back to back; users run concurrently."""
+    latencies, errors = [], []
+
+    async def run_user(index: int, user: dict):
+        for request_index in range(requests_per_user):
+            try:
+                latencies.append(await call(user, index, request_index))
+            except Exception as e:
+                errors.append(e)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run_user(index, user) for index, user in enumerate(users)))
+    elapsed = time.perf_counter() - start
+    if errors:
+        print(f"    {len(errors)} errors, first: {errors[0]!r}")
+    return latencies, len(errors), elapsed
+
+
+async def run_level(harness: Harness, level: int, server_pid: int, scenarios: List[str]) -> List[dict]:
+    args = harness.args
+    rng = random.Random(args.seed * 1000 + level)
+    users = await harness.create_users(level, level)
+    documents = [make_document(rng, args.doc_paragraphs) for _ in users]
+
+    async def upload(user, index, _):
+        return await harness.upload(user, f"notes-{level}-{index}.txt", documents[index])
+
+    async def chat(user, index, request_index):
+        words = random.Random(f"{args.seed}-{level}-{index}-{request_index}").sample(VOCABULARY, 3)
+        return await harness.chat(user, f"What do my notes say about {words[0]}, {words[1]} and {words[2]}?")
+
+    async def quiz(user, index, request_index):
+        words = random.Random(f"quiz-{args.seed}-{level}-{index}-{request_index}").sample(VOCABULARY, 2)
+        return await harness.quiz(user, f"{words[0]} and {words[1]}")
+
+    results = []
+    plan = [("upload", upload, 1), ("chat", chat, args.chat_requests), ("quiz", quiz, args.quiz_requests)]
+    for scenario, call, per_user in plan:
+        if scenario == "upload" and "upload" not in scenarios:
+            # Chat and quiz still need a document per user
+            await run_users(users, 1, upload)
+            continue
+        if scenario not in scenarios:
+            continue
+        with MemorySampler(server_pid) as memory:
+            latencies, errors, elapsed = await run_users(users, per_user, call)
+        result = summarize(scenario, level, latencies, errors, elapsed, memory.peak_mb)
+        results.append(result)
+        print(
+            f"  {scenario:<7}{level:>5} users  {result['requests']:>5} req  "
+            f"p50 {result['p50_ms'] or 0:>8.1f}  p95 {result['p95_ms'] or 0:>8.1f}  p99 {result['p99_ms'] or 0:>8.1f} ms  "
+            f"{result['throughput_rps'] or 0:>7.2f} req/s  peak {result['peak_rss_mb'] or 0:>7.1f} MB"
+        )
+    return results
+
+
+def app_env(data_dir: str, fake_url: str) -> Dict[str, str]:
+    env = {k: v for k, v in os.environ.items() if not k.endswith("_API_KEY")}
+    env.update({
+        "PYTHONPATH": BACKEND_DIR,
+        "DATABASE_URL": f"sqlite:///{data_dir}/bench.db",
+        "CHROMA_MODE": "embedded",
+        "CHROMA_PERSIST_DIR": f"{data_dir}/chroma",
+        "KEYWORD_INDEX_DIR": f"{data_dir}/keyword_index",
+        "EMBEDDING_CACHE_DIR": f"{data_dir}/embedding_cache",
+        "EMBEDDING_BACKEND": "gemini",
+        "GEMINI_API_KEY": "fake-key",
+        "GEMINI_BASE_URL": fake_url,
+        "GROQ_API_KEY": "fake-key",
+        "GROQ_BASE_URL": fake_url,
+        "LOG_LEVEL": "WARNING",
+    })
+    return env
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_all(args, server_pid: int, app_url: str) -> List[dict]:
+    limits = httpx.Limits(max_connections=max(args.users) * 2, max_keepalive_connections=max(args.users) * 2)
+    async with httpx.AsyncClient(base_url=app_url, timeout=args.timeout, limits=limits) as client:
+        harness = Harness(client, args)
+        results = []
+        for level in args.users:
+            print(f"{level} concurrent users")
+            results += await run_level(harness, level, server_pid, args.scenarios)
+        return results
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Metrics that got worse than the baseline by more than ``tolerance``."""
+    previous = {(r["scenario"], r["users"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\nAgainst baseline {baseline['meta'].get('git_commit')} ({baseline['meta'].get('created')}):")
+    for result in report["results"]:
+        before = previous.get((result["scenario"], result["users"]))
+        if before is None:
+            continue
+        for metric, higher_is_worse in COMPARED_METRICS:
+            old, new = before.get(metric), result.get(metric)
+            if old is None or new is None:
+                continue
+            if metric == "error_rate":
+                worse = new > old
+                change = f"{old:.2%} -> {new:.2%}"
+            else:
+                ratio = (new - old) / old if old else 0.0
+                worse = ratio > tolerance if higher_is_worse else ratio < -tolerance
+                change = f"{old} -> {new} ({ratio:+.1%})"
+            flag = "REGRESSION" if worse else ""
+            print(f"  {result['scenario']:<7}{result['users']:>5} users  {metric:<15} {change:<32} {flag}")
+            if worse:
+                regressions.append(f"{result['scenario']}@{result['users']} {metric} {change}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[1, 10, 100], help="concurrency levels")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--chat-requests", type=int, default=3, help="per user")
+    parser.add_argument("--quiz-requests", type=int, default=1, help="per user")
+    parser.add_argument("--quiz-questions", type=int, default=5)
+    parser.add_argument("--doc-paragraphs", type=int, default=40, help="size of each uploaded document")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=120.0, help="per request (and per ingestion), seconds")
+    parser.add_argument("--poll-ms", type=float, default=250.0, help="document status polling interval")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="compare against this JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    parser.add_argument("--server-log", help="append the app's and the fake providers' output here (default: discard)")
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+    latency: Latency = latency_from_args(args)
+
+    log = open(args.server_log, "a") if args.server_log else subprocess.DEVNULL
+    with tempfile.TemporaryDirectory(prefix="bench_e2e_") as data_dir:
+        fake_port, app_port = free_port(), free_port()
+        fake_url, app_url = f"http://127.0.0.1:{fake_port}", f"http://127.0.0.1:{app_port}"
+        fake = subprocess.Popen(
+            [sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "fake_providers.py"), "--port", str(fake_port),
+             "--embed-ms", str(latency.embed_ms), "--embed-per-text-ms", str(latency.embed_per_text_ms),
+             "--first-token-ms", str(latency.first_token_ms), "--prompt-token-ms", str(latency.prompt_token_ms),
+             "--token-ms", str(latency.token_ms),
+             "--answer-tokens", str(latency.answer_tokens)],
+            stdout=log, stderr=log
+        )
+        # The app runs from the data directory so uploads and other relative paths land there
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(app_port),
+             "--log-level", "warning"],
+            cwd=data_dir, env=app_env(data_dir, fake_url), stdout=log, stderr=log
+        )
+        try:
+            wait_until_up(f"{fake_url}/stats", fake)
+            wait_until_up(f"{app_url}/", server)
+            results = asyncio.run(run_all(args, server.pid, app_url))
+            provider_calls = httpx.get(f"{fake_url}/stats").json()
+        finally:
+            for process in (server, fake):
+                process.terminate()
+                process.wait(timeout=30)
+            if args.server_log:
+                log.close()
+
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "latency": vars(latency),
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+            "provider_calls": provider_calls,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\nFAIL: {len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            sys.exit(1)
+        print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
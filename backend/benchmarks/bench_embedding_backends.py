@@ -0,0 +1,85 @@
+"""
+Embedding backends head to head: Gemini (remote) vs. the local ONNX model.
+
+For each backend, embeds ``--chunks`` synthetic ~1000-character chunks (the
+ingestion chunk size) and reports chunks/sec, then times ``--queries`` single-query
+embeddings and reports p50/p95 latency. The embedding cache is bypassed. Backends
+that aren't available are skipped with the reason: Gemini needs GEMINI_API_KEY, and
+ONNX needs the model from ``python manage.py download-embedding-model``.
+
+Run from the backend directory:
+    python benchmarks/bench_embedding_backends.py --chunks 1000 --queries 50
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.embeddings import EMBEDDING_BACKENDS, build_embeddings
+
+WORDS = (
+    "cell membrane protein energy enzyme reaction theorem proof integral derivative vector matrix "
+    "market price demand supply history empire treaty war revolution language grammar syntax "
+    "algorithm complexity memory network protocol photosynthesis chlorophyll mitochondria gene"
+).split()
+
+
+def make_texts(count: int, chars: int, seed: int):
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(count):
+        words, length = [], 0
+        target = rng.randint(chars // 2, chars)  # splitter output varies in length
+        while length < target:
+            word = rng.choice(WORDS)
+            words.append(word)
+            length += len(word) + 1
+        texts.append(" ".join(words))
+    return texts
+
+
+def bench(backend: str, chunks: int, queries: int, chunk_chars: int):
+    try:
+        embeddings = build_embeddings(backend, cached=False)
+    except Exception as e:
+        print(f"{backend:<8} skipped: {e}")
+        return
+
+    embeddings.embed_query("warm up")  # first call pays for session / connection setup
+    texts = make_texts(chunks, chunk_chars, seed=1)
+    start = time.perf_counter()
+    vectors = embeddings.embed_documents(texts)
+    elapsed = time.perf_counter() - start
+
+    latencies = []
+    for query in make_texts(queries, 80, seed=2):
+        query_start = time.perf_counter()
+        embeddings.embed_query(query)
+        latencies.append((time.perf_counter() - query_start) * 1000)
+    latencies.sort()
+    p95 = latencies[int(0.95 * (len(latencies) - 1))]
+    print(
+        f"{backend:<8} dim={len(vectors[0]):<5} {chunks / elapsed:10.1f} chunks/s "
+        f"   query p50 {statistics.median(latencies):7.1f} ms   p95 {p95:7.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=EMBEDDING_BACKENDS, default=list(EMBEDDING_BACKENDS))
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--chunk-chars", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPUs, {args.chunks} chunks of up to {args.chunk_chars} chars, {args.queries} queries")
+    for backend in args.backends:
+        bench(backend, args.chunks, args.queries, args.chunk_chars)
+
+
+if __name__ == "__main__":
+    main()
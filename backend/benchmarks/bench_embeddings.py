@@ -0,0 +1,81 @@
+"""
+Embedding throughput benchmark against a local fake embedding client.
+
+Run from the backend directory:
+    python benchmarks/bench_embeddings.py --chunks 1000 --latency-ms 80
+"""
+import argparse
+import hashlib
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.gemini_embeddings import GoogleGenAIEmbeddings
+
+
+class FakeEmbeddingClient:
+    """Mimics ``genai.Client().models.embed_content`` with a fixed round-trip latency."""
+
+    def __init__(self, latency_s: float, per_text_s: float = 0.0, dim: int = 768):
+        self.latency_s = latency_s
+        self.per_text_s = per_text_s
+        self.dim = dim
+        self.calls = 0
+        self.models = self
+
+    def _vector(self, text: str):
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return [digest[i % len(digest)] / 255.0 for i in range(self.dim)]
+
+    def embed_content(self, model: str, contents):
+        if isinstance(contents, str):
+            contents = [contents]
+        self.calls += 1
+        time.sleep(self.latency_s + self.per_text_s * len(contents))
+        return SimpleNamespace(
+            embeddings=[SimpleNamespace(values=self._vector(text)) for text in contents]
+        )
+
+
+def run(batch_size: int, chunks: int, latency_s: float, per_text_s: float, concurrency: int):
+    client = FakeEmbeddingClient(latency_s, per_text_s)
+    embeddings = GoogleGenAIEmbeddings(
+        client=client,
+        batch_size=batch_size,
+        max_concurrency=concurrency,
+        max_retries=0,
+    )
+    texts = [f"chunk {i} " + "lorem ipsum " * 80 for i in range(chunks)]
+    start = time.perf_counter()
+    vectors = embeddings.embed_documents(texts)
+    elapsed = time.perf_counter() - start
+    assert len(vectors) == chunks
+    return chunks / elapsed, client.calls, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=80.0, help="fake round-trip latency per call")
+    parser.add_argument("--per-text-ms", type=float, default=0.5, help="fake server time per text in a batch")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16, 64, 100])
+    args = parser.parse_args()
+
+    print(f"{'batch':>6} {'calls':>6} {'seconds':>9} {'chunks/sec':>11}")
+    for batch_size in args.batch_sizes:
+        rate, calls, elapsed = run(
+            batch_size,
+            args.chunks,
+            args.latency_ms / 1000.0,
+            args.per_text_ms / 1000.0,
+            args.concurrency,
+        )
+        print(f"{batch_size:>6} {calls:>6} {elapsed:>9.2f} {rate:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
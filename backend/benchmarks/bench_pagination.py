@@ -0,0 +1,173 @@
+"""
+List endpoints over a large history: page latency by depth, before and after keyset pagination.
+
+Seeds a throwaway SQLite database with ``--attempts`` quiz attempts for one user (1M by
+default), plus ``--other-attempts`` for other users, and ``--quizzes`` quizzes with
+their full question JSON. Requests go in-process through httpx's ASGI transport.
+
+- ``before``: the previous endpoints, served from the benchmark. They use
+  ``offset/limit`` with no ORDER BY, and load every column. The composite index is
+  dropped for this run, as it didn't exist yet.
+- ``after``: ``GET /quizzes/attempts?cursor=`` and ``GET /quizzes/``. These are keyset
+  pages over ``(user_id, completed_at, id)``, and quiz summaries defer the questions.
+
+Attempt pages are fetched at increasing depths. The cursor for a depth is looked up
+once, untimed, as a client walking the pages would already hold it.
+
+Run from the backend directory:
+    python benchmarks/bench_pagination.py --attempts 1000000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='bench_pagination_')}/pagination.db")
+
+import httpx  # noqa: E402
+from fastapi import Depends  # noqa: E402
+from sqlalchemy import select, text  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+
+from app import models, schemas  # noqa: E402
+from app.api import deps  # noqa: E402
+from app.api.pagination import encode_cursor  # noqa: E402
+from app.core import security  # noqa: E402
+from app.db.init_db import init_db  # noqa: E402
+from app.db.session import SessionLocal, async_engine, engine  # noqa: E402
+from app.main import app  # noqa: E402
+
+PAGE_SIZE = 100
+ATTEMPT_INDEX = "ix_quizattempt_user_id_completed_at"
+QUESTION = {
+    "question": "Which of the following best describes the role of the rate-limiting step in a reaction mechanism?",
+    "options": ["It sets the overall rate", "It is always the first step", "It has the lowest activation energy", "It never involves intermediates"],
+    "correct_answer": "It sets the overall rate",
+}
+
+
+@app.get("/legacy/attempts", response_model=List[schemas.QuizAttempt])
+async def legacy_attempts(db: AsyncSession = Depends(deps.get_db), skip: int = 0, limit: int = 100,
+                          current_user=Depends(deps.get_current_active_user)):
+    attempts = await db.scalars(
+        select(models.QuizAttempt).where(models.QuizAttempt.user_id == current_user.id).offset(skip).limit(limit)
+    )
+    return attempts.all()
+
+
+@app.get("/legacy/quizzes", response_model=List[schemas.Quiz])
+async def legacy_quizzes(db: AsyncSession = Depends(deps.get_db), skip: int = 0, limit: int = 100,
+                         current_user=Depends(deps.get_current_active_user)):
+    quizzes = await db.scalars(select(models.Quiz).where(models.Quiz.owner_id == current_user.id).offset(skip).limit(limit))
+    return quizzes.all()
+
+
+def seed(attempts: int, other_attempts: int, quizzes: int, questions: int, batch: int = 50000) -> Tuple[str, int]:
+    init_db(engine)
+    start = time.perf_counter()
+    with SessionLocal() as db:
+        users = [models.User(email=f"pagination-{i}-{time.time_ns()}@example.com", hashed_password="-", is_active=True) for i in range(3)]
+        db.add_all(users)
+        db.flush()
+        target_id, other_ids = users[0].id, [users[1].id, users[2].id]
+        quiz_rows = [{"topic": f"topic {i}", "owner_id": target_id, "questions": [QUESTION] * questions} for i in range(quizzes)]
+        db.execute(models.Quiz.__table__.insert(), quiz_rows)
+        quiz_id = db.scalar(select(models.Quiz.id).limit(1))
+        base = datetime.utcnow() - timedelta(seconds=attempts + other_attempts)
+        total = attempts + other_attempts
+        for offset in range(0, total, batch):
+            rows = []
+            for i in range(offset, min(total, offset + batch)):
+                # Spread the other users' attempts evenly between the target's, as in a shared table
+                other = (i * other_attempts) // total != ((i + 1) * other_attempts) // total
+                owner = other_ids[i % 2] if other else target_id
+                rows.append({"quiz_id": quiz_id, "user_id": owner, "score": float(i % 6), "total_questions": 5,
+                             "completed_at": base + timedelta(seconds=i)})
+            db.execute(models.QuizAttempt.__table__.insert(), rows)
+        db.commit()
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    print(f"Seeded {attempts} + {other_attempts} attempts and {quizzes} quizzes in {time.perf_counter() - start:.1f}s", flush=True)
+    return security.create_access_token(target_id), target_id
+
+
+def cursor_at(user_id: int, depth: int) -> Optional[str]:
+    """The cursor a client holds after reading ``depth`` attempts."""
+    if depth == 0:
+        return None
+    with engine.connect() as conn:
+        row = conn.execute(
+            select(models.QuizAttempt.completed_at, models.QuizAttempt.id)
+            .where(models.QuizAttempt.user_id == user_id)
+            .order_by(models.QuizAttempt.completed_at.desc(), models.QuizAttempt.id.desc())
+            .offset(depth - 1).limit(1)
+        ).first()
+    return encode_cursor([row.completed_at, row.id])
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))]
+
+
+async def timed_get(client: httpx.AsyncClient, url: str, params: dict, headers: dict, repeat: int):
+    await client.get(url, params=params, headers=headers)  # warm up
+    timings, size = [], 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = await client.get(url, params=params, headers=headers)
+        timings.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+        size = len(response.content)
+    return percentile(timings, 50), percentile(timings, 95), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--attempts", type=int, default=1000000, help="for the user whose pages are read")
+    parser.add_argument("--other-attempts", type=int, default=200000)
+    parser.add_argument("--quizzes", type=int, default=2000)
+    parser.add_argument("--questions", type=int, default=10, help="per quiz")
+    parser.add_argument("--depths", type=int, nargs="+", default=None, help="attempts before the page read")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    depths = args.depths or sorted(
+        depth for depth in {0, 1000, 10000, 100000, args.attempts // 2, args.attempts - PAGE_SIZE} if 0 <= depth < args.attempts
+    )
+    token, user_id = seed(args.attempts, args.other_attempts, args.quizzes, args.questions)
+    headers = {"Authorization": f"Bearer {token}"}
+    cursors = {depth: cursor_at(user_id, depth) for depth in depths}
+    index = next(index for index in models.QuizAttempt.__table__.indexes if index.name == ATTEMPT_INDEX)
+
+    async def run_all():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            print(f"{'list':<9} {'variant':<7} {'depth':>9} {'p50 ms':>10} {'p95 ms':>10} {'bytes':>9}", flush=True)
+            # Fresh connections for the DDL: pooled ones from init_db can hold a stale schema
+            engine.dispose()
+            index.drop(bind=engine)
+            for depth in depths:
+                p50, p95, size = await timed_get(client, "/legacy/attempts", {"skip": depth, "limit": PAGE_SIZE}, headers, args.repeat)
+                print(f"{'attempts':<9} {'before':<7} {depth:>9} {p50:>10.1f} {p95:>10.1f} {size:>9}", flush=True)
+            index.create(bind=engine)
+            for depth in depths:
+                params = {"limit": PAGE_SIZE, **({"cursor": cursors[depth]} if cursors[depth] else {})}
+                p50, p95, size = await timed_get(client, "/api/v1/quizzes/attempts", params, headers, args.repeat)
+                print(f"{'attempts':<9} {'after':<7} {depth:>9} {p50:>10.1f} {p95:>10.1f} {size:>9}", flush=True)
+
+            for variant, url in (("before", "/legacy/quizzes"), ("after", "/api/v1/quizzes/")):
+                p50, p95, size = await timed_get(client, url, {"limit": PAGE_SIZE}, headers, args.repeat)
+                print(f"{'quizzes':<9} {variant:<7} {0:>9} {p50:>10.1f} {p95:>10.1f} {size:>9}", flush=True)
+        await async_engine.dispose()
+
+    # One event loop for every run: the async engine's pooled connections belong to it
+    asyncio.run(run_all())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Filtered search latency: one shared collection vs. per-user partitions.
+
+Seeds an in-process Chroma with ``--chunks-per-user`` random vectors for each user,
+growing the total from 10k to 1M chunks, and times one user's top-k query in both
+layouts. With per-user partitions the latency should stay flat as the total grows.
+
+Run from the backend directory:
+    python benchmarks/bench_partitioned_search.py --totals 10000 100000 1000000
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings as ChromaSettings
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BATCH = 5000
+
+
+def seed(client, total: int, per_user: int, dim: int, rng):
+    shared = client.get_or_create_collection("user_docs")
+    users = total // per_user
+    for user_id in range(users):
+        partition = client.get_or_create_collection(f"user_docs__u{user_id}")
+        for start in range(0, per_user, BATCH):
+            count = min(BATCH, per_user - start)
+            vectors = rng.standard_normal((count, dim)).astype(np.float32)
+            ids = [f"{user_id}:{start + i}" for i in range(count)]
+            metadatas = [{"user_id": user_id, "document_id": user_id * 10 + (start + i) % 10} for i in range(count)]
+            shared.add(ids=ids, embeddings=vectors.tolist(), metadatas=metadatas)
+            partition.add(ids=ids, embeddings=vectors.tolist(), metadatas=metadatas)
+    return users
+
+
+def time_queries(run, queries: int):
+    samples = []
+    for _ in range(queries):
+        start = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), sorted(samples)[int(0.95 * (len(samples) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--totals", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--chunks-per-user", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'total':>9} {'users':>6} {'layout':<22} {'p50 ms':>8} {'p95 ms':>8}")
+    for total in args.totals:
+        with tempfile.TemporaryDirectory(prefix="bench_partition_") as path:
+            client = chromadb.PersistentClient(path=path, settings=ChromaSettings(anonymized_telemetry=False))
+            users = seed(client, total, args.chunks_per_user, args.dim, rng)
+            user_id = users // 2
+            shared = client.get_collection("user_docs")
+            partition = client.get_collection(f"user_docs__u{user_id}")
+            query = rng.standard_normal(args.dim).astype(np.float32).tolist()
+
+            layouts = {
+                "shared + user filter": lambda: shared.query(
+                    query_embeddings=[query], n_results=args.k, where={"user_id": user_id}),
+                "shared + document": lambda: shared.query(
+                    query_embeddings=[query], n_results=args.k,
+                    where={"$and": [{"user_id": user_id}, {"document_id": user_id * 10}]}),
+                "partition": lambda: partition.query(
+                    query_embeddings=[query], n_results=args.k),
+                "partition + document": lambda: partition.query(
+                    query_embeddings=[query], n_results=args.k, where={"document_id": user_id * 10}),
+            }
+            for name, run in layouts.items():
+                p50, p95 = time_queries(run, args.queries)
+                print(f"{total:>9} {users:>6} {name:<22} {p50:>8.2f} {p95:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Document quiz generation: top-k retrieval vs. coverage mode.
+
+Runs ``agenerate_quiz`` (one prompt built from the top-k chunks) and
+``agenerate_coverage_quiz`` (one prompt per section, generated concurrently) against a
+fake LLM whose latency grows with prompt length, over documents of increasing size.
+Reports wall-clock time, the summed section latency a sequential loop would pay, and
+the fraction of the document's chunks behind the questions.
+
+The fake LLM sends each reply as one chunk, as a non-streaming model does. With
+``--check`` the script is a regression test. It exits non-zero unless both modes
+return ``--questions`` questions, and coverage mode asks every section for the same
+share and keeps at most that many from each.
+
+Run from the backend directory:
+    python benchmarks/bench_quiz_coverage.py --chunks 50 500 5000 --questions 10
+    python benchmarks/bench_quiz_coverage.py --chunks 50 --check
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import time
+from collections import Counter
+from typing import Any, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The services build their API clients at construction time; no calls are made here.
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("GROQ_API_KEY", "benchmark")
+
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from app.services.quiz_service import QuizService
+
+
+class FakeQuizLLM(BaseChatModel):
+    """Returns well-formed quiz JSON after a delay proportional to the prompt size."""
+    base_latency: float = 0.5
+    seconds_per_kchar: float = 0.05
+    total_latency: float = 0.0
+    requested: List[int] = []  # questions asked for, per call
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-quiz"
+
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        prompt = messages[-1].content
+        count = int(re.search(r"quiz with (\d+) multiple", prompt).group(1))
+        self.requested.append(count)
+        seed = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        return json.dumps([
+            {
+                "question": f"Question {seed}-{i}?",
+                "options": ["a", "b", "c", "d"],
+                "correct_answer": "a",
+            }
+            for i in range(count)
+        ])
+
+    def _latency(self, messages: List[BaseMessage]) -> float:
+        latency = self.base_latency + self.seconds_per_kchar * len(messages[-1].content) / 1000
+        self.total_latency += latency
+        return latency
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self._latency(messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._answer(messages)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        await asyncio.sleep(self._latency(messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._answer(messages)))])
+
+
+class FakeCollection:
+    def __init__(self, chunks: List[Document]):
+        self.chunks = chunks
+
+    def get(self, where=None, include=None):
+        return {
+            "ids": [str(i) for i in range(len(self.chunks))],
+            "documents": [chunk.page_content for chunk in self.chunks],
+            "metadatas": [chunk.metadata for chunk in self.chunks],
+        }
+
+
+class FakeVectorStore:
+    def __init__(self, chunks: List[Document]):
+        self.col = FakeCollection(chunks)
+
+    def user_collection(self, collection_name, user_id=None):
+        return self.col
+
+
+class FakeRetrieval:
+    def __init__(self, chunks: List[Document]):
+        self.chunks = chunks
+
+    def search(self, query, user_id, collection_name="user_docs", k=4, document_id=None):
+        return self.chunks[:k]
+
+
+def make_chunks(count: int) -> List[Document]:
+    text = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 16  # ~900 chars, like a real chunk
+    return [
+        Document(page_content=f"[{i}] {text}", metadata={"document_id": 1, "user_id": 1, "chunk_index": i})
+        for i in reversed(range(count))  # out of order, as Chroma may return them
+    ]
+
+
+def section_problems(generated: List[dict], requested: List[int], questions: int) -> List[str]:
+    """How a coverage quiz strays from the per-section split; each section's questions share a prompt seed."""
+    per_section = math.ceil(questions / len(requested))
+    by_section = Counter(question["question"].rsplit("-", 1)[0] for question in generated)
+    problems = []
+    if set(requested) != {per_section}:
+        problems.append(f"sections asked for {sorted(set(requested))} questions, expected {per_section}")
+    if max(by_section.values(), default=0) > per_section:
+        problems.append(f"a section gave {max(by_section.values())} questions, more than its {per_section}")
+    if len(by_section) != min(len(requested), questions):
+        problems.append(f"{len(by_section)} of {len(requested)} sections are represented")
+    return problems
+
+
+async def run(chunk_count: int, questions: int):
+    chunks = make_chunks(chunk_count)
+    results = []
+
+    llm = FakeQuizLLM()
+    service = QuizService(vector_store=FakeVectorStore(chunks), retrieval=FakeRetrieval(chunks), llm=llm)
+    start = time.perf_counter()
+    generated = await service.agenerate_quiz("overview", user_id=1, num_questions=questions, document_id=1)
+    results.append(("top-k (k=5)", time.perf_counter() - start, llm.total_latency, len(generated), min(5, chunk_count) / chunk_count, []))
+
+    llm = FakeQuizLLM()
+    service = QuizService(vector_store=FakeVectorStore(chunks), retrieval=FakeRetrieval(chunks), llm=llm)
+    start = time.perf_counter()
+    generated, coverage = await service.agenerate_coverage_quiz("overview", user_id=1, document_id=1, num_questions=questions)
+    results.append(("coverage", time.perf_counter() - start, llm.total_latency, len(generated), coverage,
+                    section_problems(generated, llm.requested, questions)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--check", action="store_true", help="exit 1 if a quiz comes back short or off its section split")
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'chunks':>7} {'mode':<12} {'wall s':>7} {'sum LLM s':>10} {'questions':>10} {'coverage':>9}")
+    for chunk_count in args.chunks:
+        for mode, wall, llm_seconds, generated, coverage, problems in asyncio.run(run(chunk_count, args.questions)):
+            print(f"{chunk_count:>7} {mode:<12} {wall:>7.2f} {llm_seconds:>10.2f} {generated:>10} {coverage:>9.1%}")
+            if generated != args.questions:
+                problems = [f"{generated} of {args.questions} questions"] + problems
+            failures += [f"{chunk_count} chunks, {mode}: {problem}" for problem in problems]
+
+    if not args.check:
+        return
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
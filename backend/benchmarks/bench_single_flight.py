@@ -0,0 +1,142 @@
+"""
+A class asking the same thing at once: upstream calls and latency with and without
+single-flight coalescing.
+
+Runs the real app under uvicorn against ``fake_providers.py``, as ``bench_e2e.py``
+does, once with ``SINGLE_FLIGHT_ENABLED=false`` and once with it on. Every user
+uploads the same handout. Then, for each burst, all ``--users`` users at once:
+
+- chat: ``POST /chat/`` with the same question about the handout
+- quiz: ``POST /quizzes/generate`` with the same topic on their copy of the handout
+
+It reports latency, and the LLM and embedding calls the fake providers received during
+the burst. With coalescing on, it also reports the ``saved_calls`` counters from the
+app's /metrics.
+
+Run from the backend directory:
+    python benchmarks/bench_single_flight.py --users 10 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+import httpx
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_e2e import BACKEND_DIR, Harness, app_env, free_port, make_document, percentile, wait_until_up  # noqa: E402
+from fake_providers import Latency, add_latency_arguments, latency_from_args  # noqa: E402
+
+QUESTION = "What do my notes say about photosynthesis and chlorophyll?"
+TOPIC = "photosynthesis and chlorophyll"
+SAVED_RE = re.compile(r"^app_(\w+)_single_flight_saved_calls\S* (\S+)$", re.MULTILINE)
+
+
+async def saved_calls(client: httpx.AsyncClient) -> Dict[str, float]:
+    metrics = (await client.get("/metrics")).text
+    return {name: float(value) for name, value in SAVED_RE.findall(metrics)}
+
+
+async def burst(harness: Harness, fake: httpx.AsyncClient, users: List[dict], call) -> dict:
+    before = (await fake.get("/stats")).json()
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(call(user) for user in users))
+    elapsed = time.perf_counter() - start
+    after = (await fake.get("/stats")).json()
+    return {
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "wall_s": elapsed,
+        "chat_calls": after["chat_calls"] - before["chat_calls"],
+        "embed_calls": after["embed_calls"] - before["embed_calls"],
+    }
+
+
+async def run_variant(args, app_url: str, fake_url: str, handout: str) -> List[tuple]:
+    limits = httpx.Limits(max_connections=max(args.users) * 2, max_keepalive_connections=max(args.users) * 2)
+    rows = []
+    async with httpx.AsyncClient(base_url=app_url, timeout=args.timeout, limits=limits) as client, \
+            httpx.AsyncClient(base_url=fake_url) as fake:
+        harness = Harness(client, args)
+        for level in args.users:
+            users = await harness.create_users(level, level)
+            # Setup isn't measured; a few at a time keeps ingestion from timing out
+            semaphore = asyncio.Semaphore(8)
+
+            async def upload(user):
+                async with semaphore:
+                    await harness.upload(user, "handout.txt", handout)
+
+            await asyncio.gather(*(upload(user) for user in users))
+            saved = await saved_calls(client)
+            rows.append(("chat", level, await burst(harness, fake, users, lambda user: harness.chat(user, QUESTION))))
+            rows.append(("quiz", level, await burst(harness, fake, users, lambda user: harness.quiz(user, TOPIC))))
+            now = await saved_calls(client)
+            rows.append(("saved", level, {name: now[name] - saved.get(name, 0.0) for name in now}))
+    return rows
+
+
+def run(args, latency: Latency, enabled: bool, handout: str) -> List[tuple]:
+    with tempfile.TemporaryDirectory(prefix="bench_single_flight_") as data_dir:
+        fake_port, app_port = free_port(), free_port()
+        fake_url, app_url = f"http://127.0.0.1:{fake_port}", f"http://127.0.0.1:{app_port}"
+        fake = subprocess.Popen(
+            [sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "fake_providers.py"), "--port", str(fake_port),
+             "--embed-ms", str(latency.embed_ms), "--embed-per-text-ms", str(latency.embed_per_text_ms),
+             "--first-token-ms", str(latency.first_token_ms), "--prompt-token-ms", str(latency.prompt_token_ms),
+             "--token-ms", str(latency.token_ms), "--answer-tokens", str(latency.answer_tokens)],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        env = app_env(data_dir, fake_url)
+        env["SINGLE_FLIGHT_ENABLED"] = "true" if enabled else "false"
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(app_port),
+             "--log-level", "warning"],
+            cwd=data_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            wait_until_up(f"{fake_url}/stats", fake)
+            wait_until_up(f"{app_url}/", server)
+            return asyncio.run(run_variant(args, app_url, fake_url, handout))
+        finally:
+            for process in (server, fake):
+                process.terminate()
+                process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[10, 50], help="users per burst")
+    parser.add_argument("--quiz-questions", type=int, default=5)
+    parser.add_argument("--doc-paragraphs", type=int, default=40, help="size of the handout")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=120.0, help="per request (and per ingestion), seconds")
+    parser.add_argument("--poll-ms", type=float, default=250.0, help="document status polling interval")
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+    latency = latency_from_args(args)
+    handout = make_document(random.Random(args.seed), args.doc_paragraphs)
+
+    print(f"{'variant':<8} {'burst':<6} {'users':>5} {'p50 ms':>9} {'p95 ms':>9} {'wall s':>7} {'LLM calls':>10} {'embed calls':>12}")
+    for enabled in (False, True):
+        variant = "on" if enabled else "off"
+        for burst_name, level, result in run(args, latency, enabled, handout):
+            if burst_name == "saved":
+                if enabled:
+                    print(f"{variant:<8} {'saved':<6} {level:>5} " + "  ".join(f"{name}: {value:.0f}" for name, value in sorted(result.items())))
+                continue
+            print(
+                f"{variant:<8} {burst_name:<6} {level:>5} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+                f"{result['wall_s']:>7.2f} {result['chat_calls']:>10} {result['embed_calls']:>12}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Application startup: import cost and time to first request.
+
+1. Runs ``python -X importtime -c "import app.main"`` in a clean interpreter and
+   summarises the slowest top-level packages.
+2. Starts uvicorn on a free port and measures the time from process spawn until
+   ``GET /`` answers.
+
+Both run without GROQ/GEMINI API keys and against a throwaway database, which
+also checks that the app can start without them.
+
+With ``--check`` the script is a regression test. It exits non-zero if
+``import app.main`` pulls in any of the heavy packages that are now loaded lazily,
+or if a timing exceeds its budget.
+
+Run from the backend directory:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --check --max-import-ms 2500 --max-first-request-ms 6000
+"""
+import argparse
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must only be imported when a service is first used, never by ``import app.main``
+LAZY_PACKAGES = [
+    "langchain", "langchain_core", "langchain_community", "langchain_groq", "langchain_text_splitters",
+    "chromadb", "google.genai", "onnxruntime", "numpy", "pypdf",
+]
+
+IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def clean_env(data_dir: str) -> dict:
+    env = {k: v for k, v in os.environ.items() if k not in ("GROQ_API_KEY", "GEMINI_API_KEY", "OPENAI_API_KEY")}
+    env.update({
+        "DATABASE_URL": f"sqlite:///{data_dir}/startup.db",
+        "CHROMA_PERSIST_DIR": f"{data_dir}/chroma",
+        "KEYWORD_INDEX_DIR": f"{data_dir}/keyword_index",
+        "EMBEDDING_CACHE_DIR": f"{data_dir}/embedding_cache",
+        "PYTHONDONTWRITEBYTECODE": "1",
+    })
+    return env
+
+
+def measure_imports(env: dict):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import app.main failed:\n{result.stderr[-2000:]}")
+
+    total_us, modules, by_package = 0, set(), defaultdict(int)
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = int(match.group(1)), int(match.group(2)), match.group(3), match.group(4)
+        modules.add(module)
+        by_package[module.split(".")[0]] += self_us
+        if len(indent) == 1:  # top-level import
+            total_us += cumulative_us
+    return total_us / 1000, modules, by_package
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_request(env: dict, timeout: float = 60.0) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {server.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"no response within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="report the best of N runs")
+    parser.add_argument("--top", type=int, default=10, help="packages to list by import time")
+    parser.add_argument("--check", action="store_true", help="exit 1 on a lazy-import or budget regression")
+    parser.add_argument("--max-import-ms", type=float, default=None)
+    parser.add_argument("--max-first-request-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_startup_") as data_dir:
+        env = clean_env(data_dir)
+        import_runs = [measure_imports(env) for _ in range(args.runs)]
+        first_request_ms = min(measure_first_request(env) for _ in range(args.runs))
+
+    import_ms, modules, by_package = min(import_runs, key=lambda run: run[0])
+    print(f"import app.main:        {import_ms:8.1f} ms  ({len(modules)} modules)")
+    print(f"time to first request:  {first_request_ms:8.1f} ms")
+    print(f"\nSlowest packages (self time, ms):")
+    for package, self_us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"  {package:<28} {self_us / 1000:8.1f}")
+
+    if not args.check:
+        return
+    failures = []
+    eager = sorted(package for package in LAZY_PACKAGES if package in modules)
+    if eager:
+        failures.append(f"imported at startup: {', '.join(eager)}")
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        failures.append(f"import took {import_ms:.0f} ms > {args.max_import_ms:.0f} ms")
+    if args.max_first_request_ms is not None and first_request_ms > args.max_first_request_ms:
+        failures.append(f"first request took {first_request_ms:.0f} ms > {args.max_first_request_ms:.0f} ms")
+    if failures:
+        print("\nFAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Upload path throughput benchmark.
+
+Streams generated files through ``app.core.storage.save_upload`` and reports MB/s and
+peak RSS. Each size runs in a fresh subprocess so peak RSS is not inherited from the
+previous run.
+
+Run from the backend directory:
+    python benchmarks/bench_upload.py --sizes-mb 10 100 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _make_file(path: str, size_mb: int):
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        for _ in range(size_mb):
+            f.write(block)
+
+
+def child(size_mb: int):
+    from fastapi import UploadFile
+    from app.core import storage
+
+    workdir = tempfile.mkdtemp(prefix="bench_upload_")
+    source = os.path.join(workdir, "source.pdf")
+    _make_file(source, size_mb)
+    os.chdir(workdir)
+    baseline_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    async def run():
+        with open(source, "rb") as f:
+            upload = UploadFile(file=f, filename="source.pdf")
+            return await storage.save_upload(upload, max_bytes=(size_mb + 1) * 1024 * 1024)
+
+    start = time.perf_counter()
+    stored = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    assert stored.size == size_mb * 1024 * 1024
+    print(json.dumps({
+        "size_mb": size_mb,
+        "seconds": elapsed,
+        "mb_per_sec": size_mb / elapsed,
+        "peak_rss_mb": peak_rss_kb / 1024,
+        "rss_growth_mb": (peak_rss_kb - baseline_rss_kb) / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes-mb", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    print(f"{'size MB':>8} {'seconds':>8} {'MB/s':>8} {'peak RSS MB':>12} {'RSS growth MB':>14}")
+    for size_mb in args.sizes_mb:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", str(size_mb)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        print(
+            f"{result['size_mb']:>8} {result['seconds']:>8.2f} {result['mb_per_sec']:>8.1f} "
+            f"{result['peak_rss_mb']:>12.1f} {result['rss_growth_mb']:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
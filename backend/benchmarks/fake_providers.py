@@ -0,0 +1,176 @@
+"""
+Deterministic local stand-ins for the Gemini embedding API and the Groq chat API.
+
+The app is pointed at this server with GEMINI_BASE_URL and GROQ_BASE_URL, so the real
+SDK clients, HTTP stack and parsing run unchanged; only the provider is fake.
+
+- ``POST /v1beta/models/<model>:batchEmbedContents`` returns hashed bag-of-words
+  vectors, so texts that share words are close and retrieval still means something.
+- ``POST /openai/v1/chat/completions`` (OpenAI-compatible, streaming or not) answers
+  quiz prompts with well-formed quiz JSON and anything else with a fixed-length
+  answer built from the prompt's words.
+
+Latency is fixed per call plus per item (text, prompt token, answer token), so runs
+are repeatable:
+
+    python benchmarks/fake_providers.py --port 9100 --embed-ms 40 --first-token-ms 300 --token-ms 10
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import re
+import time
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+QUIZ_RE = re.compile(r"quiz with (\d+) multiple choice questions")
+
+
+@dataclass
+class Latency:
+    embed_ms: float = 40.0  # per batchEmbedContents call
+    embed_per_text_ms: float = 0.2
+    first_token_ms: float = 300.0
+    prompt_token_ms: float = 0.0  # prefill: added to the time to first token per prompt token
+    token_ms: float = 10.0
+    answer_tokens: int = 60
+    dim: int = 768
+
+
+def embed(text: str, dim: int):
+    vector = [0.0] * dim
+    for word in WORD_RE.findall(text.lower()):
+        digest = hashlib.md5(word.encode("utf-8")).digest()
+        index = int.from_bytes(digest[:4], "little") % dim
+        vector[index] += 1.0 if digest[4] & 1 else -1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def quiz_reply(prompt: str, count: int) -> str:
+    words = WORD_RE.findall(prompt.lower()) or ["topic"]
+    seed = int(hashlib.md5(prompt.encode("utf-8")).hexdigest()[:8], 16)
+    questions = []
+    for i in range(count):
+        term = words[(seed + i * 7919) % len(words)]
+        options = [f"{term} option {i}-{j}" for j in range(4)]
+        questions.append({
+            "question": f"Question {seed % 1000}-{i}: what is true of {term}?",
+            "options": options,
+            "correct_answer": options[(seed + i) % 4],
+        })
+    return json.dumps(questions)
+
+
+def chat_reply(prompt: str, tokens: int) -> str:
+    words = WORD_RE.findall(prompt.lower()) or ["answer"]
+    return " ".join(words[(i * 31) % len(words)] for i in range(tokens))
+
+
+def pieces(text: str, tokens: int):
+    """Split ``text`` into roughly ``tokens`` stream chunks."""
+    size = max(1, math.ceil(len(text) / max(1, tokens)))
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+def create_app(latency: Latency) -> FastAPI:
+    app = FastAPI(title="Fake Gemini / Groq")
+    counters = {"embed_calls": 0, "embedded_texts": 0, "chat_calls": 0}
+
+    @app.post("/{version}/models/{target:path}")
+    async def batch_embed_contents(version: str, target: str, request: Request):
+        body = await request.json()
+        texts = [
+            " ".join(part.get("text", "") for part in item.get("content", {}).get("parts", []))
+            for item in body.get("requests", [])
+        ]
+        counters["embed_calls"] += 1
+        counters["embedded_texts"] += len(texts)
+        await asyncio.sleep((latency.embed_ms + latency.embed_per_text_ms * len(texts)) / 1000)
+        return {"embeddings": [{"values": embed(text, latency.dim)} for text in texts]}
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        counters["chat_calls"] += 1
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+        match = QUIZ_RE.search(prompt)
+        text = quiz_reply(prompt, int(match.group(1))) if match else chat_reply(prompt, latency.answer_tokens)
+        model = body.get("model", "fake")
+        completion_id = f"chatcmpl-{hashlib.md5(prompt.encode('utf-8')).hexdigest()[:12]}"
+        created = int(time.time())
+        chunks = pieces(text, latency.answer_tokens)
+        prompt_tokens = len(prompt) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(chunks), "total_tokens": prompt_tokens + len(chunks)}
+        first_token_ms = latency.first_token_ms + latency.prompt_token_ms * prompt_tokens
+
+        if not body.get("stream"):
+            await asyncio.sleep((first_token_ms + latency.token_ms * len(chunks)) / 1000)
+            return JSONResponse({
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        async def stream():
+            await asyncio.sleep(first_token_ms / 1000)
+            for i, piece in enumerate(chunks):
+                if i:
+                    await asyncio.sleep(latency.token_ms / 1000)
+                delta = {"role": "assistant", "content": piece} if i == 0 else {"content": piece}
+                chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                         "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            final = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "x_groq": {"usage": usage}}
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    def stats():
+        return counters
+
+    return app
+
+
+def add_latency_arguments(parser: argparse.ArgumentParser):
+    defaults = Latency()
+    parser.add_argument("--embed-ms", type=float, default=defaults.embed_ms, help="per embedding call")
+    parser.add_argument("--embed-per-text-ms", type=float, default=defaults.embed_per_text_ms)
+    parser.add_argument("--first-token-ms", type=float, default=defaults.first_token_ms)
+    parser.add_argument("--prompt-token-ms", type=float, default=defaults.prompt_token_ms, help="prefill time per prompt token")
+    parser.add_argument("--token-ms", type=float, default=defaults.token_ms)
+    parser.add_argument("--answer-tokens", type=int, default=defaults.answer_tokens)
+
+
+def latency_from_args(args) -> Latency:
+    return Latency(
+        embed_ms=args.embed_ms,
+        embed_per_text_ms=args.embed_per_text_ms,
+        first_token_ms=args.first_token_ms,
+        prompt_token_ms=args.prompt_token_ms,
+        token_ms=args.token_ms,
+        answer_tokens=args.answer_tokens,
+    )
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    add_latency_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(latency_from_args(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
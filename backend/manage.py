@@ -0,0 +1,214 @@
+"""
+Maintenance commands for the vector store, search indexes, progress aggregates and users.
+
+Usage (from the backend directory):
+    python manage.py partition [--collection user_docs] [--keep-shared]
+    python manage.py reindex-keywords [--collection user_docs]
+    python manage.py download-embedding-model
+    python manage.py reindex --from gemini --to onnx [--collection user_docs] [--delete-source]
+    python manage.py rebuild-progress [--user-id 1]
+    python manage.py make-superuser someone@example.com [--revoke]
+"""
+import argparse
+import os
+import re
+import shutil
+import sys
+import time
+
+# Ensure we can import app modules
+sys.path.append(os.getcwd())
+
+from app.core.config import settings
+from app.core.embeddings import EMBEDDING_BACKENDS, build_embeddings
+from app.db.vector_store import vector_store
+
+
+def _iter_pages(col, page_size: int, include):
+    offset = 0
+    while True:
+        page = col.get(include=include, limit=page_size, offset=offset)
+        if not page["ids"]:
+            return
+        yield page
+        offset += page_size
+
+
+def partition(collection_name: str, keep_shared: bool, page_size: int = 500):
+    """Move chunks from a shared collection into per-user partitions."""
+    if vector_store.partitioning != "user":
+        print("VECTOR_PARTITIONING is not 'user'; nothing to do.")
+        return
+    shared_name = vector_store.namespaced(collection_name)
+    names = {col.name for col in vector_store.list_collections()}
+    if shared_name not in names:
+        print(f"No shared collection '{shared_name}' found.")
+        return
+
+    shared = vector_store.collection(shared_name)
+    vector_store.use_partitions()
+    moved = 0
+    for page in _iter_pages(shared, page_size, ["embeddings", "documents", "metadatas"]):
+        by_user = {}
+        for i, metadata in enumerate(page["metadatas"]):
+            by_user.setdefault((metadata or {}).get("user_id"), []).append(i)
+        for user_id, rows in by_user.items():
+            if user_id is None:
+                print(f"Skipping {len(rows)} chunks without a user_id")
+                continue
+            target = vector_store.user_collection(collection_name, user_id)
+            target.upsert(
+                ids=[page["ids"][i] for i in rows],
+                embeddings=[page["embeddings"][i] for i in rows],
+                documents=[page["documents"][i] for i in rows],
+                metadatas=[page["metadatas"][i] for i in rows],
+            )
+            moved += len(rows)
+        print(f"Moved {moved} chunks...")
+
+    if not keep_shared:
+        vector_store.delete_collection(shared_name)
+        print(f"Deleted shared collection '{shared_name}'.")
+    print(f"Done: {moved} chunks partitioned by user.")
+
+
+def reindex_keywords(collection_name: str):
+    """Backfill every user's BM25 index from the chunks stored in Chroma."""
+    from app import models
+    from app.db.session import SessionLocal
+    from app.services.ingestion_service import get_ingestion_service
+
+    ingestion_service = get_ingestion_service()
+
+    db = SessionLocal()
+    try:
+        user_ids = [user_id for (user_id,) in db.query(models.User.id).all()]
+    finally:
+        db.close()
+    for user_id in user_ids:
+        indexed = ingestion_service.rebuild_keyword_index(user_id, collection_name)
+        print(f"User {user_id}: indexed {indexed} chunks")
+
+
+def rebuild_progress(user_id: int = None):
+    """Recompute the study-progress aggregates from the quiz attempts, e.g. for attempts made before they existed."""
+    from app.db.init_db import init_db
+    from app.db.session import SessionLocal, engine
+    from app.services import progress
+
+    init_db(engine)
+    with SessionLocal() as db:
+        read = progress.rebuild(db, user_id)
+    print(f"Rebuilt progress from {read} quiz attempts")
+
+
+def make_superuser(email: str, revoke: bool = False):
+    """Grant (or revoke) superuser rights; signup never grants them."""
+    from app import models
+    from app.db.init_db import init_db
+    from app.db.session import SessionLocal, engine
+
+    init_db(engine)
+    with SessionLocal() as db:
+        user = db.query(models.User).filter(models.User.email == email).first()
+        if user is None:
+            sys.exit(f"No user with email {email}")
+        user.is_superuser = not revoke
+        db.commit()
+    # Running servers see the change once their cached entry expires (USER_CACHE_TTL_SECONDS)
+    print(f"{email} is {'no longer ' if revoke else ''}a superuser")
+
+
+def download_embedding_model(repo_id: str, target_dir: str):
+    """Fetch the ONNX export and tokenizer of a sentence-transformers model from the Hugging Face Hub."""
+    from huggingface_hub import hf_hub_download
+
+    os.makedirs(target_dir, exist_ok=True)
+    for filename, target in (("onnx/model.onnx", "model.onnx"), ("tokenizer.json", "tokenizer.json")):
+        path = hf_hub_download(repo_id, filename)
+        shutil.copyfile(path, os.path.join(target_dir, target))
+        print(f"Saved {repo_id}/{filename} to {os.path.join(target_dir, target)}")
+
+
+def reindex(collection_name: str, source_backend: str, target_backend: str, delete_source: bool, page_size: int = 200):
+    """Re-embed every chunk stored under one embedding backend into another backend's namespace."""
+    if source_backend == target_backend:
+        print("Source and target backend are the same; nothing to do.")
+        return
+    embeddings = build_embeddings(target_backend)
+    source_base = vector_store.namespaced(collection_name, source_backend)
+    target_base = vector_store.namespaced(collection_name, target_backend)
+    # The shared collection and its per-user partitions
+    pattern = re.compile(rf"^{re.escape(source_base)}(__u\d+)?$")
+    sources = sorted(col.name for col in vector_store.list_collections() if pattern.match(col.name))
+    if not sources:
+        print(f"No '{source_base}' collections found.")
+        return
+
+    total, start = 0, time.perf_counter()
+    for source_name in sources:
+        target_name = target_base + source_name[len(source_base):]
+        source = vector_store.collection(source_name)
+        target = vector_store.collection(target_name)
+        copied = 0
+        for page in _iter_pages(source, page_size, ["documents", "metadatas"]):
+            target.upsert(
+                ids=page["ids"],
+                embeddings=embeddings.embed_documents(page["documents"]),
+                documents=page["documents"],
+                metadatas=page["metadatas"],
+            )
+            copied += len(page["ids"])
+        total += copied
+        print(f"{source_name} -> {target_name}: {copied} chunks ({total / (time.perf_counter() - start):.1f} chunks/s)")
+        if delete_source:
+            vector_store.delete_collection(source_name)
+
+    print(f"Done: re-embedded {total} chunks with '{target_backend}'. Set EMBEDDING_BACKEND={target_backend} to serve from them.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    partition_cmd = commands.add_parser("partition", help="split a shared collection into per-user collections")
+    partition_cmd.add_argument("--collection", default="user_docs")
+    partition_cmd.add_argument("--keep-shared", action="store_true", help="don't delete the shared collection afterwards")
+
+    reindex_cmd = commands.add_parser("reindex-keywords", help="rebuild the per-user BM25 indexes from Chroma")
+    reindex_cmd.add_argument("--collection", default="user_docs")
+
+    download_cmd = commands.add_parser("download-embedding-model", help="fetch the ONNX embedding model")
+    download_cmd.add_argument("--model", default=settings.ONNX_EMBEDDING_MODEL, help="Hugging Face repo id")
+    download_cmd.add_argument("--dir", default=settings.ONNX_EMBEDDING_MODEL_DIR)
+
+    reindex_cmd = commands.add_parser("reindex", help="re-embed stored chunks with another embedding backend")
+    reindex_cmd.add_argument("--from", dest="source", choices=EMBEDDING_BACKENDS, default="gemini")
+    reindex_cmd.add_argument("--to", dest="target", choices=EMBEDDING_BACKENDS, default=settings.EMBEDDING_BACKEND)
+    reindex_cmd.add_argument("--collection", default="user_docs")
+    reindex_cmd.add_argument("--delete-source", action="store_true", help="drop the source collections afterwards")
+
+    progress_cmd = commands.add_parser("rebuild-progress", help="recompute study-progress aggregates from quiz attempts")
+    progress_cmd.add_argument("--user-id", type=int, default=None, help="only this user (default: everyone)")
+
+    superuser_cmd = commands.add_parser("make-superuser", help="let a user manage other users")
+    superuser_cmd.add_argument("email")
+    superuser_cmd.add_argument("--revoke", action="store_true", help="take the rights away instead")
+
+    args = parser.parse_args()
+    if args.command == "partition":
+        partition(args.collection, args.keep_shared)
+    elif args.command == "reindex-keywords":
+        reindex_keywords(args.collection)
+    elif args.command == "download-embedding-model":
+        download_embedding_model(args.model, args.dir)
+    elif args.command == "reindex":
+        reindex(args.collection, args.source, args.target, args.delete_source)
+    elif args.command == "rebuild-progress":
+        rebuild_progress(args.user_id)
+    elif args.command == "make-superuser":
+        make_superuser(args.email, args.revoke)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,20 @@
-import chromadb
-from app.core.config import settings
 import sys
 import os
 
 # Ensure we can import app modules
 sys.path.append(os.getcwd())
 
+from app.core.config import settings
+from app.db.vector_store import vector_store
+
 def verify_chroma():
-    print("Connecting to local ChromaDB at ./chroma_db ...")
+    if vector_store.mode == "http":
+        print(f"Connecting to ChromaDB server at {vector_store.host}:{vector_store.port} ...")
+    else:
+        print(f"Connecting to local ChromaDB at {vector_store.path} ...")
     try:
-        client = chromadb.PersistentClient(path="./chroma_db")
+        collections = vector_store.list_collections()
         print("Connected successfully.")
-        
-        collections = client.list_collections()
         print(f"Found {len(collections)} collections.")
         
         for col in collections:
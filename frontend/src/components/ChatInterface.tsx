@@ -12,6 +12,7 @@ const ChatInterface: React.FC = () => {
     const [messages, setMessages] = useState<Message[]>([]);
     const [input, setInput] = useState('');
     const [loading, setLoading] = useState(false);
+    const [sessionId, setSessionId] = useState<number | null>(null);
     const messagesEndRef = useRef<HTMLDivElement>(null);
 
     const scrollToBottom = () => {
@@ -32,7 +33,14 @@ const ChatInterface: React.FC = () => {
         setLoading(true);
 
         try {
-            const response = await client.post('/chat', { question: input });
+            // The server keeps the conversation, so follow-ups can refer to earlier answers
+            let currentSessionId = sessionId;
+            if (currentSessionId === null) {
+                const session = await client.post('/chat/sessions', {});
+                currentSessionId = session.data.id;
+                setSessionId(currentSessionId);
+            }
+            const response = await client.post('/chat', { question: input, session_id: currentSessionId });
             const assistantMessage: Message = { role: 'assistant', content: response.data.answer };
             setMessages(prev => [...prev, assistantMessage]);
         } catch (error) {